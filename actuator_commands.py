@@ -0,0 +1,310 @@
+"""
+Canal de Comandos a Actuadores con Confirmación (ACK)
+Proyecto de grado
+
+Cierra el lazo de control: cada decisión de encender/apagar una bomba
+(automática o manual) genera un comando en iot_comando_actuador.
+
+Ciclo de vida de un comando:
+    PENDIENTE  -> creado, en cola para la bomba
+    ENVIADO    -> publicado por MQTT o entregado por long-poll HTTP
+    CONFIRMADO -> el dispositivo confirmó la ejecución (ACK)
+    FALLIDO    -> el dispositivo respondió con error
+    EXPIRADO   -> sin ACK antes de fecha_expiracion (COMMAND_ACK_TIMEOUT_S)
+
+Entrega al dispositivo:
+- MQTT (si COMMAND_MQTT_BROKER está configurado): tópico comando/<bomba_id>
+- HTTP long-poll: GET /api/control/commands/poll?bomba_id=N&wait=20
+  El dispositivo confirma con POST /api/control/commands/<id>/ack
+
+latencia_ms mide desde la decisión hasta el ACK (actuación). El resultado se
+refleja en iot_log_control_automatico.estado_ejecucion:
+PENDIENTE -> EXITOSO / FALLIDO / TIMEOUT.
+"""
+
+import json
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from database import db, ActuatorCommand, AutomaticControlLog
+from db_monitor import percentile
+
+try:
+    import paho.mqtt.client as mqtt
+    MQTT_AVAILABLE = True
+except ImportError:
+    mqtt = None
+    MQTT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+COMMANDS = ('INICIAR', 'DETENER')
+OPEN_STATES = ('PENDIENTE', 'ENVIADO')
+FINAL_STATES = ('CONFIRMADO', 'FALLIDO', 'EXPIRADO')
+
+# estado del comando -> iot_log_control_automatico.estado_ejecucion
+LOG_EXECUTION_STATES = {
+    'CONFIRMADO': 'EXITOSO',
+    'FALLIDO': 'FALLIDO',
+    'EXPIRADO': 'TIMEOUT'
+}
+
+# Otros procesos (varios workers) no despiertan la Condition local:
+# el long-poll vuelve a consultar la base cada POLL_INTERVAL segundos
+POLL_INTERVAL = 1.0
+
+
+class CommandDispatcher:
+    """Cola de comandos por bomba con entrega MQTT/HTTP y seguimiento de ACK"""
+
+    def __init__(self):
+        self.ack_timeout_s = 30
+        self.max_wait_s = 25
+        self.topic_prefix = 'comando'
+        self.qos = 1
+        self.client = None
+        self._new_command = threading.Condition()
+
+    def init_app(self, app):
+        """Lee la configuración y conecta el publicador MQTT si está configurado"""
+        self.ack_timeout_s = app.config.get('COMMAND_ACK_TIMEOUT_S', self.ack_timeout_s)
+        self.max_wait_s = app.config.get('COMMAND_POLL_MAX_WAIT_S', self.max_wait_s)
+        self.topic_prefix = app.config.get('COMMAND_TOPIC_PREFIX', self.topic_prefix)
+
+        broker = app.config.get('COMMAND_MQTT_BROKER')
+        if not broker:
+            return
+        if not MQTT_AVAILABLE:
+            logger.warning("COMMAND_MQTT_BROKER configurado pero paho-mqtt no está instalado; solo long-poll HTTP")
+            return
+
+        # paho-mqtt 2.x exige la versión del API de callbacks
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id='servidor-comandos')
+        else:
+            self.client = mqtt.Client(client_id='servidor-comandos')
+        self.client.reconnect_delay_set(min_delay=1, max_delay=60)
+        self.client.connect_async(broker, app.config.get('COMMAND_MQTT_PORT', 1883), keepalive=30)
+        self.client.loop_start()
+
+    # ------------------------------------------------------------------
+    # Emisión
+    # ------------------------------------------------------------------
+
+    def issue(self, bomba_id, comando, origen='AUTO', estacion_id=None, log_entry=None, decided_at=None):
+        """
+        Encola un comando para una bomba y lo publica por MQTT si hay broker
+
+        Args:
+            bomba_id (int): Bomba destino
+            comando (str): INICIAR o DETENER
+            origen (str): AUTO o MANUAL
+            estacion_id (int): Estación de la bomba
+            log_entry (AutomaticControlLog): Registro de la decisión (queda en PENDIENTE)
+            decided_at (datetime): Momento de la decisión (por defecto ahora)
+
+        Returns:
+            ActuatorCommand: Comando creado
+        """
+        if comando not in COMMANDS:
+            raise ValueError(f'Comando debe ser uno de {COMMANDS}')
+
+        decided_at = decided_at or datetime.now()
+        command = ActuatorCommand(
+            estacion_id=estacion_id,
+            bomba_id=bomba_id,
+            comando=comando,
+            origen=origen,
+            estado='PENDIENTE',
+            intentos=0,
+            fecha_decision=decided_at,
+            fecha_expiracion=decided_at + timedelta(seconds=self.ack_timeout_s)
+        )
+        if log_entry is not None:
+            if log_entry.id is None:
+                db.session.add(log_entry)
+                db.session.flush()
+            command.log_control_id = log_entry.id
+            log_entry.estado_ejecucion = 'PENDIENTE'
+
+        db.session.add(command)
+        db.session.commit()
+
+        if self.client is not None:
+            self.publish(command)
+
+        with self._new_command:
+            self._new_command.notify_all()
+        return command
+
+    def publish(self, command):
+        """Publica el comando en comando/<bomba_id>; si falla queda para long-poll"""
+        payload = json.dumps(self.device_payload(command))
+        info = self.client.publish(f'{self.topic_prefix}/{command.bomba_id}', payload, qos=self.qos)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            logger.warning(f"No se pudo publicar comando {command.id} (rc={info.rc}); queda para long-poll")
+            return False
+
+        command.estado = 'ENVIADO'
+        command.canal = 'MQTT'
+        command.fecha_envio = datetime.now()
+        command.intentos = (command.intentos or 0) + 1
+        db.session.commit()
+        return True
+
+    @staticmethod
+    def device_payload(command):
+        """Mensaje mínimo que recibe el dispositivo"""
+        return {
+            'id': command.id,
+            'bomba_id': command.bomba_id,
+            'comando': command.comando,
+            'expira': command.fecha_expiracion.isoformat()
+        }
+
+    # ------------------------------------------------------------------
+    # Entrega por long-poll HTTP
+    # ------------------------------------------------------------------
+
+    def poll(self, bomba_id, wait=0):
+        """
+        Comandos pendientes de una bomba; espera hasta `wait` segundos si no hay
+
+        Los comandos devueltos pasan a ENVIADO (canal HTTP). Un comando ENVIADO
+        por MQTT y aún sin ACK se vuelve a entregar por HTTP.
+        """
+        # nan/inf nunca vencen el plazo: se tratan como sin espera
+        if not math.isfinite(wait):
+            wait = 0
+        deadline = time.monotonic() + min(max(wait, 0), self.max_wait_s)
+
+        while True:
+            self.expire_overdue()
+            commands = ActuatorCommand.query.filter(
+                ActuatorCommand.bomba_id == bomba_id,
+                ActuatorCommand.estado.in_(OPEN_STATES)
+            ).order_by(ActuatorCommand.id).all()
+
+            if commands:
+                now = datetime.now()
+                for command in commands:
+                    command.estado = 'ENVIADO'
+                    command.canal = 'HTTP'
+                    command.fecha_envio = now
+                    command.intentos = (command.intentos or 0) + 1
+                db.session.commit()
+                return commands
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+
+            # Liberar la conexión mientras se espera
+            db.session.rollback()
+            with self._new_command:
+                self._new_command.wait(min(remaining, POLL_INTERVAL))
+
+    # ------------------------------------------------------------------
+    # Confirmación y expiración
+    # ------------------------------------------------------------------
+
+    def acknowledge(self, command_id, success=True, error=None):
+        """
+        Registra el ACK del dispositivo y calcula la latencia decisión→actuación
+
+        Returns:
+            ActuatorCommand: Comando actualizado, o None si no existe.
+            Un ACK repetido o tardío (comando ya cerrado) no modifica el comando.
+        """
+        command = db.session.get(ActuatorCommand, command_id)
+        if command is None:
+            return None
+        if command.estado in FINAL_STATES:
+            return command
+
+        now = datetime.now()
+        command.estado = 'CONFIRMADO' if success else 'FALLIDO'
+        command.fecha_confirmacion = now
+        command.latencia_ms = int((now - command.fecha_decision).total_seconds() * 1000)
+        command.mensaje_error = None if success else (error or 'Error reportado por el dispositivo')
+
+        if command.log_control_id is not None:
+            log_entry = db.session.get(AutomaticControlLog, command.log_control_id)
+            if log_entry is not None:
+                log_entry.estado_ejecucion = LOG_EXECUTION_STATES[command.estado]
+                log_entry.mensaje_error = command.mensaje_error
+
+        db.session.commit()
+        return command
+
+    def expire_overdue(self, now=None):
+        """Marca EXPIRADO los comandos sin ACK vencidos; devuelve cuántos"""
+        now = now or datetime.now()
+        overdue = db.session.query(ActuatorCommand.id, ActuatorCommand.log_control_id).filter(
+            ActuatorCommand.estado.in_(OPEN_STATES),
+            ActuatorCommand.fecha_expiracion < now
+        ).all()
+        if not overdue:
+            return 0
+
+        command_ids = [row.id for row in overdue]
+        log_ids = [row.log_control_id for row in overdue if row.log_control_id is not None]
+
+        db.session.execute(
+            update(ActuatorCommand)
+            .where(ActuatorCommand.id.in_(command_ids), ActuatorCommand.estado.in_(OPEN_STATES))
+            .values(estado='EXPIRADO', mensaje_error='Sin confirmación del actuador')
+        )
+        if log_ids:
+            db.session.execute(
+                update(AutomaticControlLog)
+                .where(AutomaticControlLog.id.in_(log_ids))
+                .values(estado_ejecucion='TIMEOUT', mensaje_error='Sin confirmación del actuador')
+            )
+        db.session.commit()
+
+        logger.warning(f"{len(command_ids)} comandos expirados sin ACK: {command_ids}")
+        return len(command_ids)
+
+    # ------------------------------------------------------------------
+    # Estadísticas
+    # ------------------------------------------------------------------
+
+    def latency_stats(self, bomba_id=None, hours=24):
+        """Percentiles de latencia decisión→ACK y conteo por estado"""
+        self.expire_overdue()
+        since = datetime.now() - timedelta(hours=hours)
+        query = db.session.query(ActuatorCommand.estado, ActuatorCommand.latencia_ms).filter(
+            ActuatorCommand.fecha_decision >= since
+        )
+        if bomba_id is not None:
+            query = query.filter(ActuatorCommand.bomba_id == bomba_id)
+
+        states = {}
+        latencies = []
+        for estado, latencia_ms in query.all():
+            states[estado] = states.get(estado, 0) + 1
+            if estado == 'CONFIRMADO' and latencia_ms is not None:
+                latencies.append(latencia_ms)
+
+        total = sum(states.values())
+        return {
+            'horas': hours,
+            'bomba_id': bomba_id,
+            'total': total,
+            'por_estado': states,
+            'tasa_confirmacion': round(states.get('CONFIRMADO', 0) / total, 4) if total else None,
+            'latencia_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies) if latencies else 0
+            }
+        }
+
+
+# Instancia global del despachador de comandos
+command_dispatcher = CommandDispatcher()
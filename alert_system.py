@@ -12,7 +12,8 @@ import requests
 import json
 from datetime import datetime
 from twilio.rest import Client
-from database import db, SystemAlert, AlertThreshold, NotificationContact
+from database import db, SystemAlert
+import repository
 
 # Agregar path para importar BrevoEmailHelper del sistema PPA
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -24,6 +25,11 @@ except ImportError:
     BREVO_AVAILABLE = False
     print("⚠️ BrevoEmailHelper no disponible, alertas por email desactivadas")
 
+# iot_alerta_sistema.severidad es ENUM('CRITICO', 'ALTO', 'MEDIO', 'BAJO');
+# los canales y preferencias de contacto siguen usando los códigos en inglés
+SEVERITY_ALIASES = {'CRITICAL': 'CRITICO', 'HIGH': 'ALTO', 'MEDIUM': 'MEDIO', 'LOW': 'BAJO'}
+SEVERITY_CODES = {v: k for k, v in SEVERITY_ALIASES.items()}
+
 
 class AlertManager:
     """Gestor centralizado de alertas del sistema"""
@@ -53,26 +59,28 @@ class AlertManager:
         if not self.whatsapp_available:
             print("⚠️ WhatsApp API no configurada, alertas por WhatsApp desactivadas")
     
-    def create_alert(self, alert_type, severity, station_id, message, auto_notify=True):
+    def create_alert(self, alert_type, severity, station_id=None, message='', auto_notify=True,
+                     estacion_id=None):
         """
         Crear nueva alerta en el sistema
         
         Args:
             alert_type (str): Tipo de alerta (WATER_LEVEL, TEMPERATURE, PRESSURE, etc.)
-            severity (str): Nivel de severidad (LOW, MEDIUM, HIGH, CRITICAL)
+            severity (str): Nivel de severidad (BAJO, MEDIO, ALTO, CRITICO o su equivalente en inglés)
             station_id (int): ID de la estación
             message (str): Mensaje descriptivo
             auto_notify (bool): Enviar notificaciones automáticamente
+            estacion_id (int): Alias de station_id usado por los endpoints en español
         
         Returns:
             SystemAlert: Objeto de alerta creado
         """
         alert = SystemAlert(
-            alert_type=alert_type,
-            severity=severity,
-            station_id=station_id,
-            message=message,
-            created_at=datetime.now()
+            tipo_alerta=alert_type,
+            severidad=SEVERITY_ALIASES.get(severity, severity),
+            estacion_id=station_id if station_id is not None else estacion_id,
+            descripcion=message,
+            fecha_hora=datetime.now()
         )
         
         db.session.add(alert)
@@ -91,14 +99,14 @@ class AlertManager:
             alert (SystemAlert): Objeto de alerta a notificar
         """
         # Obtener contactos que deben ser notificados
-        contacts = self.get_notification_recipients(alert.station_id, alert.severity)
+        contacts = self.get_notification_recipients(alert.estacion_id, alert.severidad)
         
         if not contacts:
-            print(f"⚠️ No hay contactos configurados para estación {alert.station_id}")
+            print(f"⚠️ No hay contactos configurados para estación {alert.estacion_id}")
             return
         
         # Determinar canales según severidad
-        channels = self.get_channels_for_severity(alert.severity)
+        channels = self.get_channels_for_severity(alert.severidad)
         
         notified_via = []
         
@@ -120,31 +128,20 @@ class AlertManager:
                             notified_via.append('SMS')
         
         # Actualizar registro de alerta
-        alert.notified_via = ','.join(notified_via)
+        alert.canales_notificacion = ','.join(notified_via)
+        alert.notificacion_enviada = bool(notified_via)
         db.session.commit()
         
         print(f"✅ Alerta {alert.id} notificada vía: {', '.join(notified_via)}")
     
     def get_notification_recipients(self, station_id, severity):
         """Obtener contactos que deben recibir notificaciones"""
-        query = NotificationContact.query.filter_by(
-            activo=True
-        )
-        
         # Filtrar según preferencias de severidad
-        if severity == 'CRITICAL':
-            query = query.filter_by(recibir_critico=True)
-        elif severity == 'HIGH':
-            query = query.filter_by(recibir_alto=True)
-        elif severity == 'MEDIUM':
-            query = query.filter_by(recibir_medio=True)
-        elif severity == 'LOW':
-            query = query.filter_by(recibir_bajo=True)
-        
-        return query.all()
+        return repository.notification_recipients(SEVERITY_CODES.get(severity, severity))
     
     def get_channels_for_severity(self, severity):
         """Determinar canales de notificación según severidad"""
+        severity = SEVERITY_CODES.get(severity, severity)
         if severity == 'CRITICAL':
             return ['WHATSAPP', 'EMAIL', 'SMS']
         elif severity == 'HIGH':
@@ -184,22 +181,22 @@ class AlertManager:
                 'LOW': '✓'
             }
             
-            color = severity_colors.get(alert.severity, '#6b7280')
-            icon = severity_icons.get(alert.severity, '•')
+            color = severity_colors.get(SEVERITY_CODES.get(alert.severidad, alert.severidad), '#6b7280')
+            icon = severity_icons.get(SEVERITY_CODES.get(alert.severidad, alert.severidad), '•')
             
             html_content = f"""
             <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
                 <div style="background: {color}; color: white; padding: 20px; border-radius: 8px 8px 0 0;">
-                    <h2 style="margin: 0;">{icon} ALERTA {alert.severity}</h2>
+                    <h2 style="margin: 0;">{icon} ALERTA {alert.severidad}</h2>
                 </div>
                 <div style="background: #f8f9fa; padding: 20px; border: 1px solid #e5e7eb; border-top: none; border-radius: 0 0 8px 8px;">
-                    <p><strong>Tipo:</strong> {alert.alert_type}</p>
-                    <p><strong>Estación:</strong> {alert.station_id}</p>
-                    <p><strong>Fecha:</strong> {alert.created_at.strftime('%d/%m/%Y %H:%M:%S')}</p>
+                    <p><strong>Tipo:</strong> {alert.tipo_alerta}</p>
+                    <p><strong>Estación:</strong> {alert.estacion_id}</p>
+                    <p><strong>Fecha:</strong> {alert.fecha_hora.strftime('%d/%m/%Y %H:%M:%S')}</p>
                     <hr style="border: none; border-top: 1px solid #e5e7eb;">
                     <p><strong>Mensaje:</strong></p>
                     <p style="background: white; padding: 15px; border-radius: 6px; border-left: 4px solid {color};">
-                        {alert.message}
+                        {alert.descripcion}
                     </p>
                     <hr style="border: none; border-top: 1px solid #e5e7eb;">
                     <p style="font-size: 12px; color: #6b7280;">
@@ -212,7 +209,7 @@ class AlertManager:
             
             result = enviar_email_brevo(
                 destinatario=email,
-                asunto=f"[{alert.severity}] {alert.alert_type} - Estación {alert.station_id}",
+                asunto=f"[{alert.severidad}] {alert.tipo_alerta} - Estación {alert.estacion_id}",
                 contenido_html=html_content
             )
             
@@ -245,16 +242,16 @@ class AlertManager:
                 'LOW': '✅'
             }
             
-            emoji = severity_emoji.get(alert.severity, '📢')
+            emoji = severity_emoji.get(SEVERITY_CODES.get(alert.severidad, alert.severidad), '📢')
             
-            message = f"""{emoji} *ALERTA {alert.severity}*
+            message = f"""{emoji} *ALERTA {alert.severidad}*
 
-*Tipo:* {alert.alert_type}
-*Estación:* {alert.station_id}
-*Fecha:* {alert.created_at.strftime('%d/%m/%Y %H:%M:%S')}
+*Tipo:* {alert.tipo_alerta}
+*Estación:* {alert.estacion_id}
+*Fecha:* {alert.fecha_hora.strftime('%d/%m/%Y %H:%M:%S')}
 
 *Mensaje:*
-{alert.message}
+{alert.descripcion}
 
 _Sistema de Monitoreo PPA_"""
             
@@ -299,7 +296,7 @@ _Sistema de Monitoreo PPA_"""
             return False
         
         try:
-            message = f"[{alert.severity}] {alert.alert_type} - Estación {alert.station_id}: {alert.message[:100]}"
+            message = f"[{alert.severidad}] {alert.tipo_alerta} - Estación {alert.estacion_id}: {alert.descripcion[:100]}"
             
             self.twilio_client.messages.create(
                 body=message,
@@ -325,10 +322,7 @@ _Sistema de Monitoreo PPA_"""
         Returns:
             dict: Información de violación de umbral o None
         """
-        thresholds = AlertThreshold.query.filter_by(
-            nombre_parametro=parameter_name,
-            activo=True
-        ).all()
+        thresholds = repository.thresholds_for_parameter(parameter_name)
         
         for threshold in thresholds:
             # Verificar límite inferior
@@ -364,10 +358,10 @@ _Sistema de Monitoreo PPA_"""
         """
         alert = SystemAlert.query.get(alert_id)
         
-        if alert and not alert.resolved:
-            alert.resolved = True
-            alert.resolved_at = datetime.now()
-            alert.resolved_by = resolved_by
+        if alert and not alert.esta_resuelto:
+            alert.esta_resuelto = True
+            alert.fecha_resolucion = datetime.now()
+            alert.resuelto_por = resolved_by
             db.session.commit()
             return True
         
@@ -384,14 +378,14 @@ def test_alert_system():
     
     test_alert = alert_manager.create_alert(
         alert_type='TEST_SYSTEM',
-        severity='MEDIUM',
+        severity='MEDIO',
         station_id=1,
         message='Prueba del sistema de alertas multi-canal. Si recibes esto, el sistema funciona correctamente.',
         auto_notify=True
     )
     
     print(f"\n✅ Alerta de prueba creada: ID {test_alert.id}")
-    print(f"   Notificada vía: {test_alert.notified_via}")
+    print(f"   Notificada vía: {test_alert.canales_notificacion}")
 
 
 if __name__ == '__main__':
@@ -11,20 +11,41 @@ Nuevos endpoints para:
 Fecha: 20 de febrero de 2026
 """
 
-from flask import Blueprint, request, jsonify
+import math
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
 from sqlalchemy import func, desc
 from database import (
     db, MeteorologicalData, PumpTelemetry, SystemAlert,
     AlertThreshold, AutomaticControlLog, MonitoringStation,
-    NotificationContact
+    NotificationContact, ActuatorCommand, GateStatus, WaterLevel
 )
 from alert_system import alert_manager
-from auto_control import AutomaticController, run_automatic_control_cycle
+from auto_control import AutomaticController, run_automatic_control_cycle, timing_percentiles, PUMP_RUNNING_STATES
+from actuator_commands import command_dispatcher
+from pagination import keyset_page, page_limit, InvalidCursor
+from serialization import ModelSerializer, json_response, InvalidFields
+import repository
+from segment_store import segment_store
+from latest_values import latest_values
 
 # Crear blueprint para nuevos endpoints
 api_extended = Blueprint('api_extended', __name__, url_prefix='/api')
 
+# Serializadores de listados: solo columnas, sin objetos ORM ni to_dict()
+meteorology_serializer = ModelSerializer(
+    MeteorologicalData, defaults={'precipitacion_mm': 0.0, 'velocidad_viento_kmh': 0.0}
+)
+pump_telemetry_serializer = ModelSerializer(
+    PumpTelemetry, defaults={'caudal_m3h': 0.0, 'presion_entrada_bar': 0.0, 'presion_salida_bar': 0.0,
+                             'consumo_energia_kw': 0.0, 'horas_operacion': 0.0}
+)
+alert_serializer = ModelSerializer(SystemAlert)
+command_serializer = ModelSerializer(ActuatorCommand)
+station_serializer = ModelSerializer(MonitoringStation)
+# Columnas que fields= siempre incluye en series de tiempo (cursor de paginación)
+TIME_SERIES_FIELDS = ('id', 'fecha_hora')
+
 
 # =====================================================================
 # ENDPOINTS - METEOROLOGÍA
@@ -72,6 +93,10 @@ def receive_meteorological_data():
         
         db.session.add(met_data)
         db.session.commit()
+        if segment_store.enabled:
+            segment_store.append_record(met_data)
+        if latest_values.shared is not None:
+            latest_values.update_record(met_data)
         
         # Verificar umbrales (ej: precipitación alta)
         if data.get('precipitacion_mm', 0) > 0:
@@ -101,46 +126,71 @@ def receive_meteorological_data():
 
 @api_extended.route('/meteorology/latest', methods=['GET'])
 def get_latest_meteorological_data():
-    """Obtener último registro meteorológico por estación"""
+    """Obtener último registro meteorológico por estación (fields= para elegir columnas)"""
     station_id = request.args.get('station_id', type=int)
     
     if not station_id:
         return jsonify({'error': 'station_id required'}), 400
     
-    latest = MeteorologicalData.query.filter_by(
-        estacion_id=station_id
+    try:
+        serializer = meteorology_serializer.project(request.args.get('fields'), always=TIME_SERIES_FIELDS)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    latest = serializer.query().filter(
+        MeteorologicalData.estacion_id == station_id
     ).order_by(desc(MeteorologicalData.fecha_hora)).first()
     
     if not latest:
         return jsonify({'error': 'No data found'}), 404
     
-    return jsonify({
+    return json_response({
         'success': True,
-        'data': latest.to_dict()
-    }), 200
+        'data': serializer.dicts([latest])[0]
+    })
 
 
 @api_extended.route('/meteorology/history', methods=['GET'])
 def get_meteorological_history():
-    """Obtener histórico de datos meteorológicos"""
+    """
+    Obtener histórico de datos meteorológicos (paginado con limit/after, columnas con fields=)
+
+    source=segments lee del almacén columnar (segment_store.py) en lugar de la tabla
+    """
     station_id = request.args.get('station_id', type=int)
     hours = request.args.get('hours', 24, type=int)
+    limit = page_limit(request.args.get('limit', type=int), default=1000, maximum=5000)
     
     if not station_id:
         return jsonify({'error': 'station_id required'}), 400
     
     time_threshold = datetime.now() - timedelta(hours=hours)
     
-    data = MeteorologicalData.query.filter(
-        MeteorologicalData.estacion_id == station_id,
-        MeteorologicalData.fecha_hora >= time_threshold
-    ).order_by(MeteorologicalData.fecha_hora.asc()).all()
+    from_segments = request.args.get('source') == 'segments'
+    if from_segments and not segment_store.enabled:
+        return jsonify({'error': 'Segment store disabled (SEGMENT_STORE_ENABLED)'}), 400
     
-    return jsonify({
+    try:
+        serializer = meteorology_serializer.project(request.args.get('fields'), always=TIME_SERIES_FIELDS)
+        if from_segments:
+            data, next_cursor = segment_store.page(serializer, station_id, time_threshold,
+                                                   after=request.args.get('after'), limit=limit)
+        else:
+            query = serializer.query().filter(
+                MeteorologicalData.estacion_id == station_id,
+                MeteorologicalData.fecha_hora >= time_threshold
+            )
+            data, next_cursor = keyset_page(query, MeteorologicalData, after=request.args.get('after'), limit=limit)
+    except (InvalidCursor, InvalidFields) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return json_response({
         'success': True,
         'count': len(data),
-        'data': [d.to_dict() for d in data]
-    }), 200
+        'data': serializer.dicts(data),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
 
 
 # =====================================================================
@@ -189,6 +239,10 @@ def receive_pump_telemetry():
         
         db.session.add(telemetry)
         db.session.commit()
+        if segment_store.enabled:
+            segment_store.append_record(telemetry)
+        if latest_values.shared is not None:
+            latest_values.update_record(telemetry)
         
         # Verificar umbrales críticos
         checks = [
@@ -225,23 +279,28 @@ def receive_pump_telemetry():
 
 @api_extended.route('/pump/status', methods=['GET'])
 def get_pump_status():
-    """Obtener estado actual de bomba"""
+    """Obtener estado actual de bomba (fields= para elegir columnas)"""
     pump_id = request.args.get('pump_id', type=int)
     
     if not pump_id:
         return jsonify({'error': 'pump_id required'}), 400
     
-    latest = PumpTelemetry.query.filter_by(
-        bomba_id=pump_id
+    try:
+        serializer = pump_telemetry_serializer.project(request.args.get('fields'), always=TIME_SERIES_FIELDS)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    latest = serializer.query().filter(
+        PumpTelemetry.bomba_id == pump_id
     ).order_by(desc(PumpTelemetry.fecha_hora)).first()
     
     if not latest:
         return jsonify({'error': 'No data found'}), 404
     
-    return jsonify({
+    return json_response({
         'success': True,
-        'data': latest.to_dict()
-    }), 200
+        'data': serializer.dicts([latest])[0]
+    })
 
 
 # =====================================================================
@@ -279,23 +338,33 @@ def create_manual_alert():
 
 @api_extended.route('/alerts/active', methods=['GET'])
 def get_active_alerts():
-    """Obtener alertas activas (no resueltas)"""
+    """Obtener alertas activas (no resueltas), más recientes primero, paginadas con limit/after"""
     station_id = request.args.get('station_id', type=int)
+    limit = page_limit(request.args.get('limit', type=int), default=100, maximum=1000)
+    
+    try:
+        serializer = alert_serializer.project(request.args.get('fields'), always=TIME_SERIES_FIELDS)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     
-    query = SystemAlert.query.filter_by(esta_resuelto=False)
+    query = serializer.query().filter(SystemAlert.esta_resuelto == False)
     
     if station_id:
-        query = query.filter_by(estacion_id=station_id)
+        query = query.filter(SystemAlert.estacion_id == station_id)
     
-    alerts = query.order_by(
-        SystemAlert.fecha_hora.desc()
-    ).all()
+    try:
+        alerts, next_cursor = keyset_page(query, SystemAlert, after=request.args.get('after'),
+                                          limit=limit, descending=True)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({
+    return json_response({
         'success': True,
         'count': len(alerts),
-        'alerts': [a.to_dict() for a in alerts]
-    }), 200
+        'alerts': serializer.dicts(alerts),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
 
 
 @api_extended.route('/alerts/<int:alert_id>/resolve', methods=['PUT'])
@@ -375,27 +444,106 @@ def manual_pump_control():
         
         # Registrar override manual
         log_entry = AutomaticControlLog(
+            estacion_id=data.get('estacion_id', data['bomba_id']),
             bomba_id=data['bomba_id'],
             accion='MANUAL_OVERRIDE',
             razon=f"Manual {data['action']} by {data.get('user', 'Unknown')}",
             fecha_hora=datetime.now()
         )
-        db.session.add(log_entry)
-        db.session.commit()
         
-        # TODO: Enviar comando real al hardware
+        # Encolar comando para el actuador (queda pendiente de ACK)
+        command = command_dispatcher.issue(
+            data['bomba_id'], data['action'], origen='MANUAL',
+            estacion_id=log_entry.estacion_id, log_entry=log_entry
+        )
         
         return jsonify({
             'success': True,
-            'message': f'Manual {data["action"]} command sent',
+            'message': f'Manual {data["action"]} command queued',
             'bomba_id': data['bomba_id'],
-            'action': data['action']
+            'action': data['action'],
+            'command': command.to_dict()
         }), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@api_extended.route('/control/commands/poll', methods=['GET'])
+def poll_actuator_commands():
+    """Long-poll del dispositivo: comandos pendientes para su bomba"""
+    bomba_id = request.args.get('bomba_id', type=int)
+    if not bomba_id:
+        return jsonify({'error': 'bomba_id required'}), 400
+    
+    wait = request.args.get('wait', 0, type=float)
+    if not math.isfinite(wait):
+        return jsonify({'error': 'wait debe ser un número finito'}), 400
+    commands = command_dispatcher.poll(bomba_id, wait=wait)
+    
+    return jsonify({
+        'bomba_id': bomba_id,
+        'commands': [command_dispatcher.device_payload(command) for command in commands]
+    })
+
+
+@api_extended.route('/control/commands/<int:command_id>/ack', methods=['POST'])
+def acknowledge_actuator_command(command_id):
+    """Confirmación del dispositivo: comando ejecutado (o fallido)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        command = command_dispatcher.acknowledge(
+            command_id,
+            success=data.get('success', True),
+            error=data.get('error')
+        )
+        
+        if command is None:
+            return jsonify({'error': 'Command not found'}), 404
+        
+        return jsonify({'success': True, 'command': command.to_dict()}), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@api_extended.route('/control/commands', methods=['GET'])
+def get_actuator_commands():
+    """Historial de comandos de una bomba"""
+    bomba_id = request.args.get('bomba_id', type=int)
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    
+    try:
+        serializer = command_serializer.project(request.args.get('fields'))
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    command_dispatcher.expire_overdue()
+    query = serializer.query()
+    if bomba_id:
+        query = query.filter(ActuatorCommand.bomba_id == bomba_id)
+    commands = query.order_by(desc(ActuatorCommand.id)).limit(limit).all()
+    
+    return json_response({
+        'success': True,
+        'count': len(commands),
+        'commands': serializer.dicts(commands)
+    })
+
+
+@api_extended.route('/control/commands/latency', methods=['GET'])
+def get_actuator_latency():
+    """Percentiles de latencia decisión→actuación (ACK)"""
+    bomba_id = request.args.get('bomba_id', type=int)
+    hours = request.args.get('hours', 24, type=int)
+    
+    return jsonify({
+        'success': True,
+        **command_dispatcher.latency_stats(bomba_id=bomba_id, hours=hours)
+    })
+
+
 @api_extended.route('/control/status', methods=['GET'])
 def get_control_status():
     """Obtener estado del sistema de control"""
@@ -404,31 +552,43 @@ def get_control_status():
     if not station_id:
         return jsonify({'error': 'station_id required'}), 400
     
+    # Solo lectura: la estación se crea al activar el control (POST /control/auto)
     station = MonitoringStation.query.get(station_id)
     
-    if not station:
-        station = MonitoringStation(
-            id=station_id,
-            nombre=f'Estacion {station_id}',
-            tipo_estacion='BOMBEO'
-        )
-        db.session.add(station)
-        db.session.commit()
-    
     # Último log de control
-    latest_log = AutomaticControlLog.query.filter_by(
-        bomba_id=station_id
-    ).order_by(desc(AutomaticControlLog.fecha_hora)).first()
+    latest_log = repository.latest_control_log(station_id)
     
     return jsonify({
         'success': True,
-        'estacion_id': station.id,
-        'nombre': station.nombre,
-        'control_automatico_habilitado': station.control_automatico_habilitado,
+        'estacion_id': station_id,
+        'nombre': station.nombre if station else f'Estacion {station_id}',
+        'control_automatico_habilitado': bool(station and station.control_automatico_habilitado),
+        'registrada': station is not None,
         'ultimo_log': latest_log.to_dict() if latest_log else None
     })
 
 
+@api_extended.route('/control/timings', methods=['GET'])
+def get_control_timings():
+    """Percentiles de latencia del control automático por estación y fase"""
+    station_id = request.args.get('station_id', type=int)
+    hours = request.args.get('hours', 24, type=int)
+    
+    stations = timing_percentiles(hours=hours, station_id=station_id)
+    deadline_ms = current_app.config.get('CONTROL_CYCLE_DEADLINE_MS', 60000)
+    cycle_p95 = sum(station['total_ms']['p95'] for station in stations.values())
+    
+    return jsonify({
+        'success': True,
+        'horas': hours,
+        'plazo_ciclo_ms': deadline_ms,
+        # Cota del ciclo completo: las estaciones se evalúan en serie
+        'ciclo_p95_estimado_ms': round(cycle_p95, 3),
+        'dentro_del_plazo': cycle_p95 <= deadline_ms,
+        'estaciones': {str(station): values for station, values in stations.items()}
+    })
+
+
 @api_extended.route('/control/run-cycle', methods=['POST'])
 def run_control_cycle():
     """Ejecutar ciclo de control automático manualmente"""
@@ -507,18 +667,115 @@ def get_stations():
     """Listar todas las estaciones"""
     active_only = request.args.get('active_only', 'true').lower() == 'true'
     
-    query = MonitoringStation.query
+    query = station_serializer.query()
     
     if active_only:
-        query = query.filter_by(activo=True)
+        query = query.filter(MonitoringStation.activo == True)
     
     stations = query.all()
     
-    return jsonify({
+    return json_response({
         'success': True,
         'count': len(stations),
-        'stations': [s.to_dict() for s in stations]
-    }), 200
+        'stations': station_serializer.dicts(stations)
+    })
+
+
+# =====================================================================
+# ENDPOINTS - FLOTA
+# =====================================================================
+
+def latest_rows(model, key_column, columns, keys):
+    """
+    Último registro por clave con un solo join contra MAX(fecha_hora) agrupado
+    
+    Returns:
+        dict: clave -> fila (si hay empates en fecha_hora gana el id mayor)
+    """
+    latest = db.session.query(
+        key_column.label('clave'),
+        func.max(model.fecha_hora).label('ultima_fecha')
+    ).filter(key_column.in_(keys)).group_by(key_column).subquery()
+    
+    rows = db.session.query(key_column, *columns).join(
+        latest,
+        (key_column == latest.c.clave) & (model.fecha_hora == latest.c.ultima_fecha)
+    ).order_by(model.id).all()
+    
+    return {row[0]: row for row in rows}
+
+
+@api_extended.route('/fleet/status', methods=['GET'])
+def get_fleet_status():
+    """Estado actual de todas las estaciones con un número fijo de consultas"""
+    active_only = request.args.get('active_only', 'true').lower() == 'true'
+    
+    query = MonitoringStation.query
+    if active_only:
+        query = query.filter_by(activo=True)
+    stations = query.order_by(MonitoringStation.id).all()
+    
+    if not stations:
+        return jsonify({'success': True, 'count': 0, 'stations': []}), 200
+    
+    ids = [station.id for station in stations]
+    
+    gates = latest_rows(GateStatus, GateStatus.estacion_id, [
+        GateStatus.apertura_porcentaje, GateStatus.caudal_m3s, GateStatus.estado, GateStatus.fecha_hora
+    ], ids)
+    levels = latest_rows(WaterLevel, WaterLevel.estacion_id, [
+        WaterLevel.nivel_m, WaterLevel.fecha_hora
+    ], ids)
+    # Convención del control automático: bomba_id = id de la estación
+    pumps = latest_rows(PumpTelemetry, PumpTelemetry.bomba_id, [
+        PumpTelemetry.estado, PumpTelemetry.caudal_m3h, PumpTelemetry.fecha_hora
+    ], ids)
+    
+    alert_counts = {}
+    for station_id, severity, count in db.session.query(
+        SystemAlert.estacion_id, SystemAlert.severidad, func.count(SystemAlert.id)
+    ).filter(
+        SystemAlert.esta_resuelto == False,
+        SystemAlert.estacion_id.in_(ids)
+    ).group_by(SystemAlert.estacion_id, SystemAlert.severidad).all():
+        alert_counts.setdefault(station_id, {})[severity] = count
+    
+    def as_float(value):
+        return float(value) if value is not None else None
+    
+    def as_iso(value):
+        return value.isoformat() if value else None
+    
+    result = []
+    for station in stations:
+        gate = gates.get(station.id)
+        level = levels.get(station.id)
+        pump = pumps.get(station.id)
+        alerts = alert_counts.get(station.id, {})
+        updates = [row[-1] for row in (gate, level, pump) if row is not None and row[-1] is not None]
+        
+        result.append({
+            'estacion_id': station.id,
+            'nombre': station.nombre,
+            'activo': station.activo,
+            'control_automatico_habilitado': station.control_automatico_habilitado,
+            'nivel_m': as_float(level[1]) if level else None,
+            'apertura_porcentaje': as_float(gate[1]) if gate else None,
+            'caudal_m3s': as_float(gate[2]) if gate else None,
+            'estado_compuerta': gate[3] if gate else None,
+            'estado_bomba': pump[1] if pump else None,
+            'bomba_en_marcha': bool(pump and (pump[1] or '').upper() in PUMP_RUNNING_STATES),
+            'caudal_bomba_m3h': as_float(pump[2]) if pump else None,
+            'alertas_activas': sum(alerts.values()),
+            'alertas_por_severidad': alerts,
+            'ultima_actualizacion': as_iso(max(updates)) if updates else None
+        })
+    
+    return json_response({
+        'success': True,
+        'count': len(result),
+        'stations': result
+    })
 
 
 # Exportar blueprint
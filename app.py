@@ -1,15 +1,47 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import os
-from database import db, GateStatus, WaterLevel, PumpingStation, FlowSummary, MeteorologicalData
+from database import db, PumpingStation, FlowSummary
+from db_monitor import db_monitor
+from metrics import request_metrics
+from query_guard import query_guard
+from actuator_commands import command_dispatcher
+from ingestion import store_gate_readings, store_binary_rows
+from binary_protocol import decode_frame
+from http_transport import GzipRequestMiddleware
+from serialization import ModelSerializer, json_response
+from compression import response_compressor
+from signal_compression import ingest_compressor
+from segment_store import segment_store
+from latest_values import latest_values, current
+import repository
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
 import json
 
 app = Flask(__name__)
 CORS(app)
 app.config.from_pyfile('config.py')
 db.init_app(app)
+db_monitor.init_app(app, db)
+# db_monitor mide cada consulta una sola vez; métricas y guardia se suscriben
+request_metrics.init_app(app, db_monitor)
+query_guard.init_app(app, db_monitor)
+command_dispatcher.init_app(app)
+# Respuestas JSON/estáticos comprimidos (gzip/Brotli) según Accept-Encoding
+response_compressor.init_app(app)
+# Compresión por señal en la ingesta (banda muerta + puerta oscilante), opcional
+ingest_compressor.init_app(app)
+# Copia columnar de las series para históricos largos, opcional
+segment_store.init_app(app)
+# Últimos valores en memoria compartida entre workers, opcional
+latest_values.init_app(app)
+# Cuerpos de petición comprimidos (Content-Encoding: gzip) de los simuladores
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app, max_size=app.config.get('MAX_DECOMPRESSED_BYTES', 16 * 1024 * 1024))
+
+# Gateway de campo: SQLite en modo WAL con escritor único
+if app.config.get('DB_MODE') == 'sqlite':
+    from sqlite_local import init_sqlite_local
+    init_sqlite_local(app, db)
 
 # Registrar endpoints extendidos
 try:
@@ -18,68 +50,69 @@ try:
 except Exception as e:
     print(f"Advertencia: No se pudieron registrar endpoints extendidos: {e}")
 
+# Listado de estaciones por columnas (sin to_dict por fila)
+pumping_station_serializer = ModelSerializer(PumpingStation)
+
 @app.route('/api/data', methods=['POST'])
 def receive_data():
     try:
         data = request.get_json() or {}
 
-        # Aceptar payloads en español (simulador) e ingles (clientes antiguos)
-        station_id = data.get('estacion_id') or data.get('station_id') or data.get('gate_id')
-        numero_compuerta = data.get('numero_compuerta') or data.get('gate_number') or 1
-        apertura = data.get('apertura_porcentaje')
-        if apertura is None:
-            apertura = data.get('position_percent')
+        # Normalizar payload (español/inglés) y guardar compuerta + nivel
+        store_gate_readings([data])
 
-        nivel = data.get('nivel_m')
-        if nivel is None:
-            nivel = data.get('level_m')
+        return jsonify({'message': 'Data received successfully'}), 200
 
-        caudal = data.get('caudal_m3s')
-        if caudal is None:
-            caudal = data.get('flow_m3s')
+    except (ValueError, TypeError, AttributeError, KeyError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        fecha_raw = data.get('fecha_hora') or data.get('timestamp')
-        if fecha_raw:
-            fecha_hora = datetime.fromisoformat(str(fecha_raw).replace('Z', '+00:00'))
-        else:
-            fecha_hora = datetime.now()
-
-        if station_id is None or apertura is None or nivel is None:
-            return jsonify({'error': 'Missing required fields'}), 400
-
-        estado = data.get('estado')
-        if not estado:
-            estado = 'MOVING' if 0 < float(apertura) < 100 else 'OPEN' if float(apertura) == 100 else 'CLOSE'
-
-        dispositivo = data.get('dispositivo_origen') or data.get('source_device') or 'unknown'
-
-        # Guardar en base de datos
-        gate_status = GateStatus(
-            estacion_id=int(station_id),
-            numero_compuerta=int(numero_compuerta),
-            estado=estado,
-            apertura_porcentaje=apertura,
-            caudal_m3s=caudal,
-            valor_sensor_posicion=apertura,
-            fecha_hora=fecha_hora,
-            dispositivo_origen=dispositivo
-        )
-
-        water_level = WaterLevel(
-            estacion_id=int(station_id),
-            nivel_m=nivel,
-            volumen_m3=data.get('volumen_m3'),
-            tendencia=data.get('tendencia'),
-            fecha_hora=fecha_hora,
-            dispositivo_origen=dispositivo
-        )
-        
-        db.session.add(gate_status)
-        db.session.add(water_level)
-        db.session.commit()
-        
-        return jsonify({'message': 'Data received successfully'}), 200
-        
+@app.route('/api/data/batch', methods=['POST'])
+def receive_data_batch():
+    """Recibe un lote de lecturas de compuerta/nivel (clientes store-and-forward)"""
+    try:
+        data = request.get_json() or {}
+        records = data.get('records') if isinstance(data, dict) else data
+
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'Se requiere una lista no vacía en "records"'}), 400
+        max_batch = app.config.get('INGEST_MAX_BATCH', 5000)
+        if len(records) > max_batch:
+            return jsonify({'error': f'Lote demasiado grande (máximo {max_batch})'}), 413
+        if not all(isinstance(record, dict) for record in records):
+            return jsonify({'error': 'Cada registro debe ser un objeto JSON'}), 400
+
+        # Todo el lote se valida antes de escribir: o entra completo o se rechaza
+        count = store_gate_readings(records)
+
+        return jsonify({'message': 'Batch received successfully', 'count': count}), 200
+
+    except (ValueError, TypeError, AttributeError, KeyError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/bin', methods=['POST'])
+def receive_data_binary():
+    """Recibe una trama binaria compacta (ESP32, ver binary_protocol.py)"""
+    try:
+        body = request.get_data(cache=False)
+        schema_id, rows = decode_frame(body)
+
+        if not rows:
+            return jsonify({'error': 'Trama sin registros'}), 400
+        max_batch = app.config.get('INGEST_MAX_BATCH', 5000)
+        if len(rows) > max_batch:
+            return jsonify({'error': f'Lote demasiado grande (máximo {max_batch})'}), 413
+
+        count = store_binary_rows(schema_id, rows)
+
+        return jsonify({'message': 'Binary frame received', 'schema': schema_id, 'count': count}), 200
+
+    except ValueError as e:
+        # ProtocolError es subclase de ValueError
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -132,15 +165,28 @@ def get_dashboard_data():
     try:
         station_id = request.args.get('station_id', 1, type=int)
         hours = request.args.get('hours', 24, type=int)
+        # Cursor incremental: último 'seq' recibido (id de iot_nivel_agua)
+        since = request.args.get('since', type=int)
         
-        # Obtener datos para el dashboard
-        # (Implementar consultas según necesidades)
+        start_time = datetime.utcnow() - timedelta(hours=hours)
+        historical = get_historical_data(station_id, hours, since=since)
+        # Los ids no siguen el orden de fecha_hora (datos diferidos): el cursor es el máximo
+        cursor = max((point['seq'] for point in historical), default=since)
         
-        return jsonify({
+        response = {
             'current_status': get_current_status(station_id),
-            'historical_data': get_historical_data(station_id, hours),
-            'daily_summary': get_daily_summary(station_id)
-        }), 200
+            'historical_data': historical,
+            'cursor': cursor,
+            'window_start': start_time.isoformat()
+        }
+        
+        if since is not None:
+            # Solo los puntos nuevos: el cliente los agrega y recorta antes de window_start
+            response['delta'] = True
+        else:
+            response['daily_summary'] = get_daily_summary(station_id)
+        
+        return json_response(response)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -149,10 +195,11 @@ def get_current_status(station_id):
     """Obtiene el estado actual de una estación"""
     try:
         # Obtener último estado de compuerta
-        latest_gate = GateStatus.query.filter_by(estacion_id=station_id).order_by(desc(GateStatus.fecha_hora)).first()
+        # (de la tabla de últimos valores si está activa; si no, base + caché del proceso)
+        latest_gate = current('iot_estado_compuerta', station_id, repository.latest_gate_status)
         
         # Obtener último nivel de agua
-        latest_water = WaterLevel.query.filter_by(estacion_id=station_id).order_by(desc(WaterLevel.fecha_hora)).first()
+        latest_water = current('iot_nivel_agua', station_id, repository.latest_water_level)
         
         if not latest_gate or not latest_water:
             return {
@@ -180,25 +227,32 @@ def get_current_status(station_id):
             'last_update': None
         }
 
-def get_historical_data(station_id, hours=24):
-    """Obtiene datos históricos de las últimas N horas"""
+def get_historical_data(station_id, hours=24, since=None):
+    """
+    Obtiene datos históricos de las últimas N horas
+    
+    Con `since` (id de iot_nivel_agua) devuelve solo las lecturas de nivel
+    registradas después del cursor, combinadas con la compuerta vigente.
+    """
     try:
         # Calcular timestamp de inicio
         start_time = datetime.utcnow() - timedelta(hours=hours)
 
-        water_levels = db.session.query(WaterLevel).filter(
-            WaterLevel.estacion_id == station_id,
-            WaterLevel.fecha_hora >= start_time
-        ).order_by(WaterLevel.fecha_hora).all()
+        water_levels = repository.water_levels_since(station_id, start_time, after_id=since)
 
-        gate_statuses = db.session.query(GateStatus).filter(
-            GateStatus.estacion_id == station_id,
-            GateStatus.fecha_hora >= start_time
-        ).order_by(GateStatus.fecha_hora).all()
+        last_gate = None
+        if since is None:
+            gate_statuses = repository.gate_statuses_between(station_id, start_time)
+        elif water_levels:
+            # Incremental: compuertas del tramo nuevo y la vigente al inicio del tramo
+            first_time = water_levels[0].fecha_hora
+            gate_statuses = repository.gate_statuses_between(station_id, first_time, water_levels[-1].fecha_hora)
+            last_gate = repository.gate_status_before(station_id, first_time)
+        else:
+            return []
 
         # Combinar nivel y caudal usando el ultimo registro de compuerta disponible
         gate_index = 0
-        last_gate = None
         combined = []
         for level in water_levels:
             while gate_index < len(gate_statuses) and gate_statuses[gate_index].fecha_hora <= level.fecha_hora:
@@ -206,6 +260,7 @@ def get_historical_data(station_id, hours=24):
                 gate_index += 1
 
             combined.append({
+                'seq': level.id,
                 'timestamp': level.fecha_hora.isoformat(),
                 'level_m': float(level.nivel_m) if level.nivel_m else 0.0,
                 'flow_m3s': float(last_gate.caudal_m3s) if last_gate and last_gate.caudal_m3s else 0.0,
@@ -226,11 +281,7 @@ def get_daily_summary(station_id):
         end_of_day = datetime.combine(today, datetime.max.time())
 
         def build_meteorology_summary():
-            meteo_records = MeteorologicalData.query.filter(
-                MeteorologicalData.estacion_id == station_id,
-                MeteorologicalData.fecha_hora >= start_of_day,
-                MeteorologicalData.fecha_hora <= end_of_day
-            ).all()
+            meteo_records = repository.meteorology_between(station_id, start_of_day, end_of_day)
 
             if not meteo_records:
                 return {
@@ -285,11 +336,7 @@ def get_daily_summary(station_id):
         
         # Si no existe, calcular en tiempo real
         # Calcular estadísticas del día
-        daily_records = GateStatus.query.filter(
-            GateStatus.estacion_id == station_id,
-            GateStatus.fecha_hora >= start_of_day,
-            GateStatus.fecha_hora <= end_of_day
-        ).all()
+        daily_records = repository.gate_statuses_between(station_id, start_of_day, end_of_day)
         
         if not daily_records:
             return {
@@ -306,13 +353,8 @@ def get_daily_summary(station_id):
         # Encontrar pico de caudal
         peak_flow = max(float(r.caudal_m3s or 0) for r in daily_records)
         
-        # Calcular horas de compuerta abierta (aproximado)
-        gate_records = GateStatus.query.filter(
-            GateStatus.estacion_id == station_id,
-            GateStatus.fecha_hora >= start_of_day,
-            GateStatus.fecha_hora <= end_of_day,
-            GateStatus.apertura_porcentaje > 0
-        ).count()
+        # Calcular horas de compuerta abierta (aproximado, sobre los mismos registros del día)
+        gate_records = sum(1 for r in daily_records if r.apertura_porcentaje and r.apertura_porcentaje > 0)
         
         open_hours = gate_records * 0.1  # Estimación basada en frecuencia de registros
         
@@ -343,10 +385,10 @@ def get_daily_summary(station_id):
 def get_stations():
     """Obtiene lista de estaciones disponibles"""
     try:
-        stations = PumpingStation.query.all()
-        return jsonify({
-            'stations': [station.to_dict() for station in stations]
-        }), 200
+        stations = pumping_station_serializer.query().all()
+        return json_response({
+            'stations': pumping_station_serializer.dicts(stations)
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -396,6 +438,19 @@ def get_latest_meteorology():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/health/db', methods=['GET'])
+def get_db_health():
+    """Uso del pool de conexiones, latencia de checkout y consultas lentas"""
+    try:
+        return jsonify(db_monitor.get_stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Latencia, códigos de estado, tamaños y tiempo en BD por ruta (formato Prometheus)"""
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/init-db', methods=['POST'])
 def init_database():
     """Inicializa la base de datos y crea las tablas"""
@@ -439,48 +494,48 @@ def init_database():
 @app.route('/docs/index.html')
 def serve_docs_index():
     """Servir página principal de documentación"""
-    return send_file('docs/index.html')
+    return response_compressor.send_asset('index.html', 'docs')
 
 @app.route('/docs/<path:filename>')
 def serve_docs_static(filename):
     """Servir archivos estáticos de documentación"""
-    return send_from_directory('docs', filename)
+    return response_compressor.send_asset(filename, 'docs')
 
 @app.route('/')
 def serve_root():
     """Redirigir root a página de inicio"""
-    return send_file('inicio.html')
+    return response_compressor.send_asset('inicio.html')
 
 @app.route('/index.html')
 def serve_bombeo():
     """Servir dashboard de bombeo"""
-    return send_file('index.html')
+    return response_compressor.send_asset('index.html')
 
 @app.route('/meteorologia')
 @app.route('/meteorologia.html')
 def serve_meteorology():
     """Servir dashboard meteorológico"""
-    return send_file('meteorologia.html')
+    return response_compressor.send_asset('meteorologia.html')
 
 @app.route('/styles.css')
 def serve_styles():
     """Servir archivo CSS"""
-    return send_file('styles.css')
+    return response_compressor.send_asset('styles.css')
 
 @app.route('/script.js')
 def serve_script():
     """Servir archivo JavaScript"""
-    return send_file('script.js')
+    return response_compressor.send_asset('script.js')
 
 @app.route('/dashboard_extended.js')
 def serve_dashboard_extended():
     """Servir archivo JavaScript del dashboard extendido"""
-    return send_file('dashboard_extended.js')
+    return response_compressor.send_asset('dashboard_extended.js')
 
 @app.route('/tooltip-system.js')
 def serve_tooltip_system():
     """Servir archivo JavaScript del sistema de tooltips"""
-    return send_file('tooltip-system.js')
+    return response_compressor.send_asset('tooltip-system.js')
 
 if __name__ == '__main__':
     with app.app_context():
@@ -12,26 +12,107 @@ Fecha: 20 de febrero de 2026
 """
 
 import os
+import time
+import logging
+import contextlib
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
-from database import (
-    db, PumpTelemetry, WaterLevel, MeteorologicalData,
-    MonitoringStation, AutomaticControlLog, AlertThreshold
-)
+from sqlalchemy import insert
+from database import db, MonitoringStation, AutomaticControlLog, ControlTiming
 from alert_system import alert_manager
+from actuator_commands import command_dispatcher
+from decision_kernel import decide, tariff_for_hour
+import repository
+from latest_values import current
+
+logger = logging.getLogger(__name__)
+
+# Valores de iot_telemetria_bomba.estado que indican bomba en marcha
+PUMP_RUNNING_STATES = {'ENCENDIDO', 'ENCENDIDA', 'ON', 'RUNNING'}
+
+# Fases medidas en cada evaluación (columnas <fase>_ms de iot_tiempo_control)
+TIMING_PHASES = (
+    'nivel', 'lluvia_2h', 'lluvia_24h', 'estado_bomba', 'umbrales',
+    'decision', 'persistencia', 'alerta'
+)
+
+
+class PhaseTimer:
+    """Cronómetro por fases de una evaluación del controlador (ms)"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+    
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+    
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+    
+    def as_row(self, station_id, action):
+        """Fila para iot_tiempo_control"""
+        row = {
+            'estacion_id': station_id,
+            'accion': action,
+            'total_ms': round(self.elapsed_ms(), 3),
+            'fecha_hora': datetime.now()
+        }
+        for name in TIMING_PHASES:
+            value = self.phases.get(name)
+            row[f'{name}_ms'] = round(value, 3) if value is not None else None
+        return row
+
+
+def load_thresholds():
+    """Umbrales activos de control (iot_umbral_alerta es global, sin estación)"""
+    thresholds_list = repository.active_thresholds()
+    
+    thresholds = {}
+    for th in thresholds_list:
+        param = th.nombre_parametro.lower()
+        
+        if 'nivel_agua' in param or 'water_level' in param:
+            if th.valor_minimo:
+                thresholds['min_water_level'] = float(th.valor_minimo)
+            if th.valor_maximo:
+                thresholds['max_water_level'] = float(th.valor_maximo)
+        
+        elif 'presion_entrada' in param or 'pressure' in param:
+            if th.valor_minimo:
+                thresholds['min_inlet_pressure'] = float(th.valor_minimo)
+        
+        elif 'precipitacion' in param or 'rain' in param:
+            if th.valor_maximo:
+                thresholds['max_rain_2h_for_pumping'] = float(th.valor_maximo)
+    
+    return thresholds
 
 
 class AutomaticController:
     """Controlador automático de bombas"""
     
-    def __init__(self, pump_id):
+    def __init__(self, pump_id, station=None, thresholds=None):
+        """
+        Args:
+            pump_id (int): ID de la estación/bomba
+            station (MonitoringStation): Estación ya cargada (evita otra consulta)
+            thresholds (dict): Umbrales ya cargados (son globales, se leen una vez por ciclo)
+        """
         self.pump_id = pump_id
-        self.station = MonitoringStation.query.get(pump_id)
+        self.station = station if station is not None else MonitoringStation.query.get(pump_id)
+        self.thresholds = thresholds
+        self.timer = PhaseTimer()
         
         if not self.station:
             raise ValueError(f"Estación {pump_id} no encontrada")
         
-        if not self.station.auto_control_enabled:
+        if not self.station.control_automatico_habilitado:
             raise ValueError(f"Control automático desactivado para estación {pump_id}")
     
     def evaluate_and_act(self):
@@ -42,53 +123,68 @@ class AutomaticController:
             dict: Resultado de la evaluación y acción tomada
         """
         print(f"\n🤖 Evaluando control automático para bomba {self.pump_id}...")
-        
-        # 1. Obtener datos actuales
-        water_level = self.get_current_water_level()
-        rainfall_2h = self.get_recent_rainfall(hours=2)
-        rainfall_24h = self.get_recent_rainfall(hours=24)
+        timer = self.timer = PhaseTimer()
+        
+        # 1. Obtener datos actuales (una fase por consulta)
+        with timer.phase('nivel'):
+            water_level = self.get_current_water_level()
+        with timer.phase('lluvia_2h'):
+            rainfall_2h = self.get_recent_rainfall(hours=2)
+        with timer.phase('lluvia_24h'):
+            rainfall_24h = self.get_recent_rainfall(hours=24)
         current_tariff = self.get_current_energy_tariff()
-        pump_status = self.get_current_pump_status()
-        inlet_pressure = self.get_current_pressure()
+        # Estado y presión salen del mismo registro de telemetría (una sola consulta)
+        with timer.phase('estado_bomba'):
+            pump_status = self.get_current_pump_status()
+        inlet_pressure = pump_status['inlet_pressure_bar']
         
         # 2. Obtener umbrales configurados
-        thresholds = self.get_thresholds()
+        with timer.phase('umbrales'):
+            thresholds = self.thresholds if self.thresholds is not None else self.get_thresholds()
         
         # 3. Aplicar lógica de decisión
-        decision = self.decision_logic(
-            water_level=water_level,
-            rainfall_2h=rainfall_2h,
-            rainfall_24h=rainfall_24h,
-            tariff=current_tariff,
-            pump_running=pump_status['is_running'],
-            inlet_pressure=inlet_pressure,
-            thresholds=thresholds
-        )
+        with timer.phase('decision'):
+            decision = self.decision_logic(
+                water_level=water_level,
+                rainfall_2h=rainfall_2h,
+                rainfall_24h=rainfall_24h,
+                tariff=current_tariff,
+                pump_running=pump_status['is_running'],
+                inlet_pressure=inlet_pressure,
+                thresholds=thresholds
+            )
+        
+        # Tiempo desde el inicio de la evaluación hasta la decisión
+        decision_ms = int(round(timer.elapsed_ms()))
         
-        # 4. Ejecutar acción si es necesaria
+        # 4. Ejecutar acción si es necesaria (el comando queda pendiente de ACK)
         if decision['should_run'] and not pump_status['is_running']:
-            self.start_pump(
+            command = self.start_pump(
                 reason=decision['reason'],
                 water_level=water_level,
                 rainfall=rainfall_2h,
-                tariff=current_tariff
+                tariff=current_tariff,
+                decision_ms=decision_ms
             )
             result = {
                 'action': 'START',
                 'reason': decision['reason'],
+                'command_id': command.id,
                 'success': True
             }
         
         elif not decision['should_run'] and pump_status['is_running']:
-            self.stop_pump(
+            command = self.stop_pump(
                 reason=decision['reason'],
                 water_level=water_level,
                 rainfall=rainfall_2h,
-                tariff=current_tariff
+                tariff=current_tariff,
+                decision_ms=decision_ms
             )
             result = {
                 'action': 'STOP',
                 'reason': decision['reason'],
+                'command_id': command.id,
                 'success': True
             }
         
@@ -99,6 +195,8 @@ class AutomaticController:
                 'success': True
             }
         
+        result['timings_ms'] = {name: round(value, 3) for name, value in timer.phases.items()}
+        result['timings_ms']['total'] = round(timer.elapsed_ms(), 3)
         return result
     
     def decision_logic(self, water_level, rainfall_2h, rainfall_24h, tariff, 
@@ -106,23 +204,13 @@ class AutomaticController:
         """
         Lógica de decisión para activar/desactivar bomba
         
-        Reglas:
-        1. ENCENDER si:
-           - Nivel agua < 50% del umbral mínimo
-           - Lluvia últimas 2h < 5mm
-           - Presión entrada > mínimo requerido
-           - Tarifa NO es PEAK
-        
-        2. APAGAR si:
-           - Nivel agua > umbral máximo
-           - Lluvia últimas 2h > 30mm
-           - Presión entrada < mínimo
-           - Es tarifa PEAK y nivel > 70%
+        Las reglas están en decision_kernel.decide() (funciones puras, sin base
+        de datos) para poder reproducirlas sobre el histórico.
         
         Args:
             water_level (float): Nivel actual de agua en metros
             rainfall_2h (float): Precipitación últimas 2 horas
-            rainfall_24h (float): Precipitación últimas 24 horas
+            rainfall_24h (float): Precipitación últimas 24 horas (no usada por las reglas)
             tariff (str): Tarifa energética actual (PEAK/VALLEY/STANDARD)
             pump_running (bool): Estado actual de la bomba
             inlet_pressure (float): Presión de entrada en bar
@@ -131,86 +219,21 @@ class AutomaticController:
         Returns:
             dict: Decisión y razón
         """
-        # Umbrales por defecto
-        min_water_level = thresholds.get('min_water_level', 0.5)
-        max_water_level = thresholds.get('max_water_level', 3.0)
-        min_pressure = thresholds.get('min_inlet_pressure', 2.0)
-        max_rain_2h = thresholds.get('max_rain_2h_for_pumping', 30.0)
-        
-        # REGLA 1: Nivel crítico bajo
-        if water_level is not None and water_level < (min_water_level * 0.5):
-            # Nivel crítico, encender bomba incluso con lluvia moderada
-            if rainfall_2h < 15.0:  # Menos de 15mm
-                if inlet_pressure >= min_pressure:
-                    return {
-                        'should_run': True,
-                        'reason': f'Nivel crítico ({water_level:.2f}m < {min_water_level*0.5:.2f}m)'
-                    }
-                else:
-                    return {
-                        'should_run': False,
-                        'reason': f'Presión insuficiente ({inlet_pressure:.2f} bar < {min_pressure} bar)'
-                    }
-        
-        # REGLA 2: Lluvia fuerte reciente
-        if rainfall_2h > max_rain_2h:
-            return {
-                'should_run': False,
-                'reason': f'Lluvia fuerte reciente ({rainfall_2h:.1f}mm en 2h)'
-            }
-        
-        # REGLA 3: Nivel máximo alcanzado
-        if water_level is not None and water_level > max_water_level:
-            return {
-                'should_run': False,
-                'reason': f'Nivel máximo alcanzado ({water_level:.2f}m > {max_water_level:.2f}m)'
-            }
-        
-        # REGLA 4: Optimización por tarifa energética
-        if tariff == 'PEAK':
-            # Solo bombear en tarifa pico si es urgente
-            if water_level is not None and water_level < (min_water_level * 0.7):
-                return {
-                    'should_run': True,
-                    'reason': f'Nivel bajo en tarifa pico ({water_level:.2f}m < {min_water_level*0.7:.2f}m)'
-                }
-            else:
-                return {
-                    'should_run': False,
-                    'reason': f'Tarifa PICO - esperar tarifa valle (nivel actual: {water_level:.2f}m)'
-                }
-        
-        # REGLA 5: Condiciones normales de operación
-        if water_level is not None and water_level < min_water_level:
-            if rainfall_2h < 5.0:  # Lluvia mínima
-                if inlet_pressure >= min_pressure:
-                    return {
-                        'should_run': True,
-                        'reason': f'Nivel bajo ({water_level:.2f}m < {min_water_level:.2f}m), condiciones óptimas'
-                    }
-        
-        # REGLA 6: Mantener estado actual si condiciones aceptables
-        if water_level is not None:
-            if min_water_level <= water_level <= max_water_level:
-                return {
-                    'should_run': pump_running,
-                    'reason': f'Nivel aceptable ({water_level:.2f}m), mantener estado'
-                }
-        
-        # Por defecto: apagar
-        return {
-            'should_run': False,
-            'reason': 'Condiciones no requieren bombeo'
-        }
+        return decide(
+            water_level=water_level,
+            rainfall_2h=rainfall_2h,
+            tariff=tariff,
+            pump_running=pump_running,
+            inlet_pressure=inlet_pressure,
+            thresholds=thresholds
+        )
     
     def get_current_water_level(self):
         """Obtener nivel de agua más reciente"""
-        latest = WaterLevel.query.filter_by(
-            location_id=self.pump_id
-        ).order_by(desc(WaterLevel.timestamp)).first()
+        latest = current('iot_nivel_agua', self.pump_id, repository.latest_water_level)
         
-        if latest:
-            return float(latest.level_m)
+        if latest and latest.nivel_m is not None:
+            return float(latest.nivel_m)
         return None
     
     def get_recent_rainfall(self, hours=2):
@@ -224,15 +247,7 @@ class AutomaticController:
             float: Precipitación acumulada en mm
         """
         time_threshold = datetime.now() - timedelta(hours=hours)
-        
-        result = db.session.query(
-            func.sum(MeteorologicalData.precipitation_mm)
-        ).filter(
-            MeteorologicalData.station_id == self.pump_id,
-            MeteorologicalData.timestamp >= time_threshold
-        ).scalar()
-        
-        return float(result) if result else 0.0
+        return repository.rainfall_total(self.pump_id, time_threshold)
     
     def get_current_energy_tariff(self):
         """
@@ -241,77 +256,36 @@ class AutomaticController:
         Returns:
             str: PEAK, VALLEY, o STANDARD
         """
-        current_hour = datetime.now().hour
-        
-        # Definición de tarifas (Colombia ejemplo)
-        if 0 <= current_hour < 6:
-            return 'VALLEY'
-        elif 6 <= current_hour < 10:
-            return 'PEAK'
-        elif 10 <= current_hour < 18:
-            return 'STANDARD'
-        elif 18 <= current_hour < 22:
-            return 'PEAK'
-        else:  # 22-24
-            return 'VALLEY'
+        return tariff_for_hour(datetime.now().hour)
     
     def get_current_pump_status(self):
         """Obtener estado actual de la bomba"""
-        latest = PumpTelemetry.query.filter_by(
-            pump_id=self.pump_id
-        ).order_by(desc(PumpTelemetry.timestamp)).first()
+        latest = current('iot_telemetria_bomba', self.pump_id, repository.latest_pump_telemetry)
         
         if latest:
             return {
-                'is_running': latest.is_running,
-                'flow_rate_m3h': float(latest.flow_rate_m3h) if latest.flow_rate_m3h else 0.0,
-                'power_consumption': float(latest.power_consumption_kwh) if latest.power_consumption_kwh else 0.0
+                'is_running': (latest.estado or '').upper() in PUMP_RUNNING_STATES,
+                'flow_rate_m3h': float(latest.caudal_m3h) if latest.caudal_m3h else 0.0,
+                'power_consumption': float(latest.consumo_energia_kw) if latest.consumo_energia_kw else 0.0,
+                'inlet_pressure_bar': float(latest.presion_entrada_bar) if latest.presion_entrada_bar else 0.0
             }
         
         return {
             'is_running': False,
             'flow_rate_m3h': 0.0,
-            'power_consumption': 0.0
+            'power_consumption': 0.0,
+            'inlet_pressure_bar': 0.0
         }
     
     def get_current_pressure(self):
-        """Obtener presión de entrada actual"""
-        latest = PumpTelemetry.query.filter_by(
-            pump_id=self.pump_id
-        ).order_by(desc(PumpTelemetry.timestamp)).first()
-        
-        if latest and latest.inlet_pressure_bar:
-            return float(latest.inlet_pressure_bar)
-        return 0.0
+        """Obtener presión de entrada actual (usar get_current_pump_status si también se necesita el estado)"""
+        return self.get_current_pump_status()['inlet_pressure_bar']
     
     def get_thresholds(self):
-        """Obtener umbrales configurados para esta estación"""
-        thresholds_list = AlertThreshold.query.filter_by(
-            station_id=self.pump_id,
-            is_active=True
-        ).all()
-        
-        thresholds = {}
-        for th in thresholds_list:
-            param = th.parameter_name
-            
-            if 'water_level' in param.lower():
-                if th.min_value:
-                    thresholds['min_water_level'] = float(th.min_value)
-                if th.max_value:
-                    thresholds['max_water_level'] = float(th.max_value)
-            
-            elif 'pressure' in param.lower():
-                if th.min_value:
-                    thresholds['min_inlet_pressure'] = float(th.min_value)
-            
-            elif 'precipitation' in param.lower() or 'rain' in param.lower():
-                if th.max_value:
-                    thresholds['max_rain_2h_for_pumping'] = float(th.max_value)
-        
-        return thresholds
+        """Obtener umbrales configurados (iot_umbral_alerta es global, sin estación)"""
+        return load_thresholds()
     
-    def start_pump(self, reason, water_level, rainfall, tariff):
+    def start_pump(self, reason, water_level, rainfall, tariff, decision_ms=None):
         """
         Activar bomba y registrar acción
         
@@ -320,33 +294,46 @@ class AutomaticController:
             water_level (float): Nivel de agua actual
             rainfall (float): Precipitación reciente
             tariff (str): Tarifa energética
+            decision_ms (int): Tiempo de evaluación hasta la decisión
+        
+        Returns:
+            ActuatorCommand: Comando INICIAR en cola (pendiente de ACK)
         """
         # Registrar en log de control automático
-        log_entry = AutomaticControlLog(
-            pump_id=self.pump_id,
-            action='START',
-            reason=reason,
-            water_level_m=water_level,
-            precipitation_mm=rainfall,
-            energy_tariff=tariff,
-            timestamp=datetime.now()
-        )
-        db.session.add(log_entry)
-        db.session.commit()
+        with self.timer.phase('persistencia'):
+            log_entry = AutomaticControlLog(
+                estacion_id=self.pump_id,
+                bomba_id=self.pump_id,
+                accion='START',
+                razon=reason,
+                nivel_agua_m=water_level,
+                precipitacion_mm=rainfall,
+                periodo_tarifa=tariff,
+                tiempo_decision_ms=decision_ms,
+                fecha_hora=datetime.now()
+            )
+            db.session.add(log_entry)
+        
+            # Encolar comando para el actuador (registra log y comando en una transacción)
+            command = command_dispatcher.issue(
+                self.pump_id, 'INICIAR', origen='AUTO',
+                estacion_id=self.pump_id, log_entry=log_entry
+            )
         
         # Generar alerta informativa
-        alert_manager.create_alert(
-            alert_type='AUTO_CONTROL_START',
-            severity='LOW',
-            station_id=self.pump_id,
-            message=f"Bomba iniciada automáticamente. Razón: {reason}",
-            auto_notify=True
-        )
+        with self.timer.phase('alerta'):
+            alert_manager.create_alert(
+                alert_type='AUTO_CONTROL_START',
+                severity='BAJO',
+                station_id=self.pump_id,
+                message=f"Bomba iniciada automáticamente. Razón: {reason}",
+                auto_notify=True
+            )
         
-        # TODO: Enviar comando real al hardware (MQTT/HTTP)
-        print(f"✅ BOMBA {self.pump_id} INICIADA - {reason}")
+        print(f"✅ BOMBA {self.pump_id} INICIADA - {reason} (comando {command.id})")
+        return command
     
-    def stop_pump(self, reason, water_level, rainfall, tariff):
+    def stop_pump(self, reason, water_level, rainfall, tariff, decision_ms=None):
         """
         Apagar bomba y registrar acción
         
@@ -355,31 +342,44 @@ class AutomaticController:
             water_level (float): Nivel de agua actual
             rainfall (float): Precipitación reciente
             tariff (str): Tarifa energética
+            decision_ms (int): Tiempo de evaluación hasta la decisión
+        
+        Returns:
+            ActuatorCommand: Comando DETENER en cola (pendiente de ACK)
         """
         # Registrar en log
-        log_entry = AutomaticControlLog(
-            pump_id=self.pump_id,
-            action='STOP',
-            reason=reason,
-            water_level_m=water_level,
-            precipitation_mm=rainfall,
-            energy_tariff=tariff,
-            timestamp=datetime.now()
-        )
-        db.session.add(log_entry)
-        db.session.commit()
+        with self.timer.phase('persistencia'):
+            log_entry = AutomaticControlLog(
+                estacion_id=self.pump_id,
+                bomba_id=self.pump_id,
+                accion='STOP',
+                razon=reason,
+                nivel_agua_m=water_level,
+                precipitacion_mm=rainfall,
+                periodo_tarifa=tariff,
+                tiempo_decision_ms=decision_ms,
+                fecha_hora=datetime.now()
+            )
+            db.session.add(log_entry)
+        
+            # Encolar comando para el actuador (registra log y comando en una transacción)
+            command = command_dispatcher.issue(
+                self.pump_id, 'DETENER', origen='AUTO',
+                estacion_id=self.pump_id, log_entry=log_entry
+            )
         
         # Generar alerta informativa
-        alert_manager.create_alert(
-            alert_type='AUTO_CONTROL_STOP',
-            severity='LOW',
-            station_id=self.pump_id,
-            message=f"Bomba detenida automáticamente. Razón: {reason}",
-            auto_notify=True
-        )
+        with self.timer.phase('alerta'):
+            alert_manager.create_alert(
+                alert_type='AUTO_CONTROL_STOP',
+                severity='BAJO',
+                station_id=self.pump_id,
+                message=f"Bomba detenida automáticamente. Razón: {reason}",
+                auto_notify=True
+            )
         
-        # TODO: Enviar comando real al hardware (MQTT/HTTP)
-        print(f"⏸️  BOMBA {self.pump_id} DETENIDA - {reason}")
+        print(f"⏸️  BOMBA {self.pump_id} DETENIDA - {reason} (comando {command.id})")
+        return command
 
 
 def run_automatic_control_cycle():
@@ -394,28 +394,33 @@ def run_automatic_control_cycle():
     print("="*60)
     
     # Obtener estaciones con control automático activado
-    stations = MonitoringStation.query.filter_by(
-        auto_control_enabled=True,
-        is_active=True
-    ).all()
+    stations = repository.auto_control_stations()
     
     if not stations:
         print("⚠️  No hay estaciones con control automático habilitado")
-        return
+        return []
+    
+    # Cerrar comandos de ciclos anteriores que no recibieron ACK
+    command_dispatcher.expire_overdue()
     
     results = []
+    timing_rows = []
+    cycle_timer = PhaseTimer()
+    # Umbrales globales: una consulta por ciclo, no una por estación
+    thresholds = load_thresholds()
     
     for station in stations:
         try:
-            controller = AutomaticController(station.id)
+            controller = AutomaticController(station.id, station=station, thresholds=thresholds)
             result = controller.evaluate_and_act()
+            timing_rows.append(controller.timer.as_row(station.id, result['action']))
             results.append({
                 'station_id': station.id,
-                'station_name': station.station_name,
+                'station_name': station.nombre,
                 'result': result
             })
             
-            print(f"\n📍 {station.station_name}:")
+            print(f"\n📍 {station.nombre}:")
             print(f"   Acción: {result['action']}")
             print(f"   Razón: {result['reason']}")
         
@@ -423,17 +428,93 @@ def run_automatic_control_cycle():
             print(f"\n❌ Error en estación {station.id}: {str(e)}")
             results.append({
                 'station_id': station.id,
-                'station_name': station.station_name,
+                'station_name': station.nombre,
                 'result': {'action': 'ERROR', 'reason': str(e), 'success': False}
             })
     
+    record_timings(timing_rows)
+    
+    cycle_ms = cycle_timer.elapsed_ms()
+    deadline_ms = get_cycle_deadline_ms()
+    if cycle_ms > deadline_ms:
+        logger.warning(f"Ciclo de control excedió el plazo: {cycle_ms:.0f} ms > {deadline_ms} ms "
+                       f"({len(stations)} estaciones)")
+    
     print("\n" + "="*60)
-    print(f"✅ Ciclo completado - {len(results)} estaciones procesadas")
+    print(f"✅ Ciclo completado - {len(results)} estaciones procesadas en {cycle_ms:.0f} ms")
     print("="*60 + "\n")
     
     return results
 
 
+def get_cycle_deadline_ms():
+    """Plazo del ciclo completo (CONTROL_CYCLE_DEADLINE_MS en config.py)"""
+    try:
+        from flask import current_app
+        return current_app.config.get('CONTROL_CYCLE_DEADLINE_MS', 60000)
+    except RuntimeError:
+        return 60000
+
+
+def record_timings(rows):
+    """Guarda los tiempos por fase del ciclo en una sola inserción"""
+    if not rows:
+        return
+    try:
+        db.session.execute(insert(ControlTiming), rows)
+        db.session.commit()
+    except Exception as e:
+        # El perfilado nunca debe interrumpir el control
+        db.session.rollback()
+        logger.warning(f"No se pudieron guardar los tiempos de control: {e}")
+
+
+def timing_percentiles(hours=24, station_id=None):
+    """
+    Percentiles de latencia del controlador por estación y por fase
+    
+    Args:
+        hours (int): Ventana hacia atrás
+        station_id (int): Filtrar una estación (por defecto todas)
+    
+    Returns:
+        dict: {estacion_id: {'evaluaciones', 'total_ms': {p50,p95,p99,max}, 'fases': {...}}}
+    """
+    from db_monitor import percentile
+    
+    columns = [getattr(ControlTiming, f'{name}_ms') for name in TIMING_PHASES]
+    query = db.session.query(ControlTiming.estacion_id, ControlTiming.total_ms, *columns).filter(
+        ControlTiming.fecha_hora >= datetime.now() - timedelta(hours=hours)
+    )
+    if station_id is not None:
+        query = query.filter(ControlTiming.estacion_id == station_id)
+    
+    samples = {}
+    for row in query.all():
+        station = samples.setdefault(row[0], {'total': [], **{name: [] for name in TIMING_PHASES}})
+        station['total'].append(float(row[1]))
+        for name, value in zip(TIMING_PHASES, row[2:]):
+            if value is not None:
+                station[name].append(float(value))
+    
+    def summary(values):
+        return {
+            'p50': round(percentile(values, 50), 3),
+            'p95': round(percentile(values, 95), 3),
+            'p99': round(percentile(values, 99), 3),
+            'max': round(max(values), 3) if values else 0.0
+        }
+    
+    return {
+        station: {
+            'evaluaciones': len(values['total']),
+            'total_ms': summary(values['total']),
+            'fases': {name: summary(values[name]) for name in TIMING_PHASES if values[name]}
+        }
+        for station, values in sorted(samples.items())
+    }
+
+
 if __name__ == '__main__':
     # Prueba del sistema de control automático
     run_automatic_control_cycle()
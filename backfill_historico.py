@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Generador de Históricos por Lotes (Backfill) - Río León
+Proyecto de grado
+
+Genera series históricas completas por estación con NumPy y las escribe en bloque:
+- Lluvia, nivel del río, posición de compuerta, caudal y meteorología
+  (mismos patrones de Urabá que initialize_chigorodo_data.py)
+- Determinista: misma semilla + mismo rango de fechas = mismos datos
+- Salidas:
+    db       INSERT con executemany en bloques (SQLite o MySQL)
+    db --load-data   LOAD DATA LOCAL INFILE (MySQL, lo más rápido)
+    csv      un archivo por tabla
+    parquet  un archivo por tabla (requiere pandas + pyarrow)
+
+Uso:
+    python backfill_historico.py --days 45 --stations 2
+    python backfill_historico.py --days 1095 --stations 20 --output csv --dir backfill/
+    python backfill_historico.py --days 365 --db-uri sqlite:///bench.db --create-tables
+"""
+
+import os
+import csv
+import time
+import tempfile
+import argparse
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from config_chigorodo import ChigodoHydrologicalModel
+from database import db, GateStatus, WaterLevel, MeteorologicalData
+
+logger = logging.getLogger(__name__)
+
+# Precipitación base mensual (mm/día promedio, Urabá)
+MONTHLY_RAINFALL = np.array([0, 45, 35, 65, 185, 220, 145, 85, 95, 195, 245, 185, 105], dtype=np.float64)
+
+# Factor horario de lluvia tropical (índice = hora)
+HOURLY_RAIN_FACTOR = np.array(
+    [0.8, 0.8, 0.8, 0.4, 0.4, 0.4, 0.4, 0.6, 0.6, 0.6, 0.6, 1.2,
+     1.2, 1.2, 2.5, 2.5, 2.5, 2.5, 2.5, 1.8, 1.8, 1.8, 1.8, 0.8], dtype=np.float64
+)
+
+# Parámetros hidráulicos por estación (se repiten cíclicamente)
+STATION_PARAMS = [
+    {'weir_width': 12.0, 'cd_coefficient': 0.62, 'base_level': 2.4, 'permeability': 1.2},
+    {'weir_width': 10.0, 'cd_coefficient': 0.58, 'base_level': 2.0, 'permeability': 0.9},
+]
+
+BACKFILL_TABLES = {
+    'compuerta': GateStatus,
+    'nivel': WaterLevel,
+    'meteo': MeteorologicalData,
+}
+
+
+def seasonal_lookup():
+    """Factor estacional por mes (índice 1-12)"""
+    model = ChigodoHydrologicalModel()
+    return np.array([1.0] + [model.get_seasonal_factor(m) for m in range(1, 13)])
+
+
+def daily_lookup():
+    """Factor de variación diaria por hora (índice 0-23)"""
+    model = ChigodoHydrologicalModel()
+    return np.array([model.get_daily_variation_factor(h) for h in range(24)])
+
+
+def exponential_smooth(values, alpha, horizon=None):
+    """
+    Suavizado exponencial y[t] = alpha*y[t-1] + (1-alpha)*x[t] vectorizado
+
+    Se implementa como convolución con un núcleo exponencial truncado
+    (horizon muestras), sin bucles de Python.
+    """
+    if horizon is None:
+        horizon = max(1, int(np.ceil(np.log(1e-4) / np.log(alpha)))) if alpha > 0 else 1
+    kernel = (1 - alpha) * alpha ** np.arange(horizon)
+    return np.convolve(values, kernel)[:len(values)]
+
+
+def generate_station_series(station_id, start, end, interval_s, seed):
+    """
+    Genera la serie completa de una estación
+
+    Returns:
+        dict: Arreglos NumPy alineados por muestra
+    """
+    rng = np.random.default_rng([seed, station_id])
+    params = STATION_PARAMS[(station_id - 1) % len(STATION_PARAMS)]
+
+    n = int((end - start).total_seconds() // interval_s)
+    times = np.datetime64(start, 's') + np.arange(n) * np.timedelta64(int(interval_s), 's')
+    epoch = times.astype('int64').astype(np.float64)
+    hours = ((times - times.astype('datetime64[D]')).astype('int64') // 3600).astype(np.int64)
+    months = (times.astype('datetime64[M]').astype('int64') % 12 + 1).astype(np.int64)
+
+    seasonal = seasonal_lookup()[months]
+    daily = daily_lookup()[hours]
+
+    # Lluvia (mm/h): base mensual x factor horario x variabilidad climática x intensidad
+    climate = rng.uniform(0.7, 1.4, n)
+    roll = rng.random(n)
+    intensity = np.select(
+        [roll < 0.05, roll < 0.20],
+        [rng.uniform(3.0, 5.0, n), rng.uniform(1.5, 2.5, n)],
+        default=rng.uniform(0.8, 1.2, n)
+    )
+    rainfall = MONTHLY_RAINFALL[months] * HOURLY_RAIN_FACTOR[hours] * climate * intensity / 24
+    # Días sin lluvia
+    rainfall = np.where(rng.random(n) < 0.55 / seasonal, 0.0, rainfall)
+
+    # Nivel del río: respuesta suavizada a la lluvia efectiva (tiempo de concentración ~4.5 h)
+    alpha_river = np.exp(-interval_s / (4.5 * 3600))
+    effective_rain = rainfall * 0.65 * 0.45
+    rain_response = exponential_smooth(effective_rain, alpha_river)
+    tidal = np.sin(epoch / (12.5 * 3600)) * 0.05
+    daily_cycle = np.sin(hours / 24 * 2 * np.pi) * 0.15
+    river_level = (params['base_level'] + rain_response * 0.35) * seasonal * (0.85 + 0.15 * daily)
+    river_level = np.clip(river_level + daily_cycle + tidal + rng.normal(0, 0.01, n), 0.2, 7.5)
+
+    # Compuerta: objetivo por nivel y lluvia, con inercia del sistema
+    target = np.select(
+        [river_level > 6.0, river_level > 4.5, river_level < 1.0, river_level < 2.0],
+        [95.0, 80.0, 10.0, 25.0],
+        default=45.0
+    )
+    target = np.where(rainfall > 15, np.minimum(90, target + 12),
+                      np.where(rainfall > 8, np.minimum(75, target + 6), target))
+    target = np.where(seasonal < 0.7, np.maximum(20, target - 8),
+                      np.where(seasonal > 1.3, np.minimum(85, target + 10), target))
+    smoothed_gate = exponential_smooth(target, 0.7)
+    smoothed_gate[:min(n, 20)] = target[:min(n, 20)]
+    gate = np.clip(smoothed_gate + rng.uniform(-2, 2, n), 0, 100)
+
+    # Caudal (vertedero simplificado del río León)
+    flow = np.maximum(0.01, river_level * params['weir_width'] * 1.2 * params['cd_coefficient'] * 0.92 + tidal)
+
+    # Estado de compuerta y tendencia del nivel
+    # El movimiento se detecta sobre la señal suavizada (sin el ruido operacional)
+    gate_delta = np.diff(smoothed_gate, prepend=smoothed_gate[:1])
+    gate_state = np.where(gate >= 95, 'OPEN', np.where(
+        gate <= 5, 'CLOSE', np.where(np.abs(gate_delta) > 1.0, 'MOVING', np.where(gate > 50, 'OPEN', 'CLOSE'))
+    ))
+    level_delta = np.diff(river_level, prepend=river_level[:1])
+    trend = np.where(level_delta > 0.01, 'SUBIENDO', np.where(level_delta < -0.01, 'BAJANDO', 'ESTABLE'))
+
+    # Meteorología
+    temperature = 27.0 + 4.0 * np.sin((hours - 9) / 24 * 2 * np.pi) - np.minimum(rainfall, 20) * 0.12 \
+        + rng.normal(0, 0.4, n)
+    humidity = np.clip(72 + rainfall * 1.5 - (temperature - 27) * 2.5 + rng.normal(0, 2, n), 40, 100)
+    pressure = 1011.0 + np.sin(epoch / 43200 * np.pi) * 1.5 + rng.normal(0, 0.5, n)
+    wind = np.abs(8 + np.minimum(rainfall, 30) * 0.4 + rng.normal(0, 2.5, n))
+    wind_direction = rng.integers(0, 360, n)
+    solar = np.where((hours >= 6) & (hours <= 18),
+                     np.maximum(0, np.sin((hours - 6) / 12 * np.pi)) * 900 / (1 + rainfall * 0.2), 0.0)
+    precipitation = rainfall * interval_s / 3600
+
+    return {
+        'estacion_id': station_id,
+        'fecha_hora': times,
+        'nivel_m': np.round(river_level, 3),
+        'apertura_porcentaje': np.round(gate, 2),
+        'caudal_m3s': np.round(flow, 4),
+        'estado': gate_state,
+        'tendencia': trend,
+        'temperatura_c': np.round(temperature, 2),
+        'humedad_porcentaje': np.round(humidity, 2),
+        'precipitacion_mm': np.round(precipitation, 2),
+        'presion_atmosferica_hpa': np.round(pressure, 2),
+        'velocidad_viento_kmh': np.round(wind, 2),
+        'direccion_viento_grados': wind_direction,
+        'radiacion_solar_wm2': np.round(solar, 2),
+    }
+
+
+def table_columns(series):
+    """
+    Convierte una serie en columnas por tabla (listas de Python listas para executemany)
+
+    Returns:
+        dict: nombre_tabla -> (lista de columnas, lista de listas de valores)
+    """
+    n = len(series['fecha_hora'])
+    station_id = series['estacion_id']
+    fechas = series['fecha_hora'].astype('datetime64[us]').tolist()
+    stations = [station_id] * n
+
+    return {
+        'compuerta': (
+            ['estacion_id', 'numero_compuerta', 'estado', 'apertura_porcentaje', 'caudal_m3s',
+             'valor_sensor_posicion', 'fecha_hora', 'dispositivo_origen'],
+            [stations, [1] * n, series['estado'].tolist(), series['apertura_porcentaje'].tolist(),
+             series['caudal_m3s'].tolist(), series['apertura_porcentaje'].tolist(), fechas,
+             [f'backfill_compuerta_{station_id}'] * n]
+        ),
+        'nivel': (
+            ['estacion_id', 'nivel_m', 'tendencia', 'fecha_hora', 'dispositivo_origen'],
+            [stations, series['nivel_m'].tolist(), series['tendencia'].tolist(), fechas,
+             [f'backfill_nivel_{station_id}'] * n]
+        ),
+        'meteo': (
+            ['estacion_id', 'temperatura_c', 'humedad_porcentaje', 'precipitacion_mm',
+             'presion_atmosferica_hpa', 'velocidad_viento_kmh', 'direccion_viento_grados',
+             'radiacion_solar_wm2', 'fecha_hora', 'dispositivo_origen'],
+            [stations, series['temperatura_c'].tolist(), series['humedad_porcentaje'].tolist(),
+             series['precipitacion_mm'].tolist(), series['presion_atmosferica_hpa'].tolist(),
+             series['velocidad_viento_kmh'].tolist(), series['direccion_viento_grados'].tolist(),
+             series['radiacion_solar_wm2'].tolist(), fechas, [f'backfill_meteo_{station_id}'] * n]
+        ),
+    }
+
+
+# =====================================================================
+# ESCRITORES
+# =====================================================================
+
+def write_executemany(conn, table, columns, values, chunk_size=10000):
+    """INSERT en bloques con executemany"""
+    rows = list(zip(*values))
+    insert = table.insert()
+    for offset in range(0, len(rows), chunk_size):
+        chunk = [dict(zip(columns, row)) for row in rows[offset:offset + chunk_size]]
+        conn.execute(insert, chunk)
+    return len(rows)
+
+
+def write_csv(path, columns, values, append=False):
+    """Escribe (o agrega) filas a un CSV con encabezado"""
+    exists = append and os.path.exists(path)
+    with open(path, 'a' if append else 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if not exists:
+            writer.writerow(columns)
+        writer.writerows(zip(*values))
+    return len(values[0])
+
+
+def write_load_data(conn, table, columns, values):
+    """LOAD DATA LOCAL INFILE desde un CSV temporal (MySQL)"""
+    fd, path = tempfile.mkstemp(prefix=f'{table.name}_', suffix='.csv')
+    os.close(fd)
+    try:
+        write_csv(path, columns, values)
+        conn.execute(text(
+            f"LOAD DATA LOCAL INFILE :path INTO TABLE {table.name} "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            f"LINES TERMINATED BY '\\r\\n' IGNORE 1 LINES ({', '.join(columns)})"
+        ), {'path': path})
+    finally:
+        os.remove(path)
+    return len(values[0])
+
+
+def run_backfill(start, end, stations, interval_s=600, seed=42, output='db', out_dir='backfill',
+                 db_uri=None, load_data=False, create_tables=False, tables=None, chunk_size=10000):
+    """
+    Genera y escribe el histórico de todas las estaciones
+
+    Returns:
+        dict: Filas escritas por tabla y tiempos de generación/escritura
+    """
+    tables = tables or list(BACKFILL_TABLES)
+    summary = {name: 0 for name in tables}
+    generate_s = write_s = 0.0
+
+    engine = None
+    if output == 'db':
+        if db_uri is None:
+            import config
+            db_uri = config.SQLALCHEMY_DATABASE_URI
+        connect_args = {'local_infile': True} if load_data else {}
+        engine = create_engine(db_uri, connect_args=connect_args)
+        if create_tables:
+            db.metadata.create_all(engine, tables=[BACKFILL_TABLES[name].__table__ for name in tables])
+    else:
+        os.makedirs(out_dir, exist_ok=True)
+
+    frames = {name: [] for name in tables}
+
+    try:
+        for station_id in range(1, stations + 1):
+            t0 = time.perf_counter()
+            series = generate_station_series(station_id, start, end, interval_s, seed)
+            columns_by_table = table_columns(series)
+            generate_s += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for name in tables:
+                columns, values = columns_by_table[name]
+                table = BACKFILL_TABLES[name].__table__
+
+                if output == 'db':
+                    with engine.begin() as conn:
+                        if load_data:
+                            summary[name] += write_load_data(conn, table, columns, values)
+                        else:
+                            summary[name] += write_executemany(conn, table, columns, values, chunk_size)
+                elif output == 'csv':
+                    path = os.path.join(out_dir, f'{table.name}.csv')
+                    summary[name] += write_csv(path, columns, values, append=station_id > 1)
+                else:
+                    frames[name].append((columns, values))
+                    summary[name] += len(values[0])
+            write_s += time.perf_counter() - t0
+            logger.info(f"  Estación {station_id}: {len(series['fecha_hora']):,} muestras")
+
+        if output == 'parquet':
+            t0 = time.perf_counter()
+            write_parquet(frames, out_dir)
+            write_s += time.perf_counter() - t0
+    finally:
+        if engine is not None:
+            engine.dispose()
+
+    return {'rows': summary, 'generate_s': round(generate_s, 3), 'write_s': round(write_s, 3)}
+
+
+def write_parquet(frames, out_dir):
+    """Un archivo Parquet por tabla (requiere pandas + pyarrow)"""
+    try:
+        import pandas as pd
+    except ImportError:
+        raise RuntimeError('La salida parquet requiere pandas y pyarrow instalados')
+
+    for name, parts in frames.items():
+        if not parts:
+            continue
+        columns = parts[0][0]
+        df = pd.concat([pd.DataFrame(dict(zip(columns, values))) for _, values in parts], ignore_index=True)
+        df.to_parquet(os.path.join(out_dir, f'{BACKFILL_TABLES[name].__tablename__}.parquet'), index=False)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Generador de históricos por lotes (río León)')
+    parser.add_argument('--days', type=int, default=45, help='Días de histórico')
+    parser.add_argument('--end', help='Fecha final YYYY-MM-DD (por defecto hoy a las 00:00)')
+    parser.add_argument('--stations', type=int, default=2, help='Número de estaciones')
+    parser.add_argument('--interval', type=int, default=600, help='Segundos entre muestras')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla (datos reproducibles)')
+    parser.add_argument('--output', choices=['db', 'csv', 'parquet'], default='db')
+    parser.add_argument('--dir', default='backfill', help='Carpeta de salida csv/parquet')
+    parser.add_argument('--db-uri', help='URI de base de datos (por defecto config.py)')
+    parser.add_argument('--load-data', action='store_true', help='Usar LOAD DATA LOCAL INFILE (MySQL)')
+    parser.add_argument('--create-tables', action='store_true', help='Crear tablas si no existen')
+    parser.add_argument('--tables', default='compuerta,nivel,meteo', help='Tablas a generar')
+    parser.add_argument('--chunk', type=int, default=10000, help='Filas por executemany')
+    args = parser.parse_args()
+
+    end = datetime.strptime(args.end, '%Y-%m-%d') if args.end else \
+        datetime.combine(datetime.now().date(), datetime.min.time())
+    start = end - timedelta(days=args.days)
+    tables = [name.strip() for name in args.tables.split(',') if name.strip()]
+
+    print(f"🔄 Backfill {start.date()} → {end.date()} | {args.stations} estaciones | "
+          f"cada {args.interval}s | semilla {args.seed} | salida {args.output}")
+
+    started = time.perf_counter()
+    result = run_backfill(
+        start, end, args.stations, interval_s=args.interval, seed=args.seed, output=args.output,
+        out_dir=args.dir, db_uri=args.db_uri, load_data=args.load_data,
+        create_tables=args.create_tables, tables=tables, chunk_size=args.chunk
+    )
+    elapsed = time.perf_counter() - started
+
+    total = sum(result['rows'].values())
+    print(f"✅ {total:,} filas en {elapsed:.2f}s ({total / elapsed:,.0f} filas/s) "
+          f"- generación {result['generate_s']}s, escritura {result['write_s']}s")
+    for name, count in result['rows'].items():
+        print(f"   {BACKFILL_TABLES[name].__tablename__}: {count:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Benchmark del Sistema - Ingesta, Consultas y Control Automático
+Proyecto de grado
+
+Mide las rutas críticas del servidor sobre una base sembrada con datos
+deterministas (backfill_historico.py, misma semilla = mismos valores):
+- /api/data: lecturas individuales vs /api/data/batch
+- /api/dashboard: latencia para ventanas de 1h, 24h y 30 días
+- run_automatic_control_cycle: duración según número de estaciones
+- alert_manager.check_thresholds: costo por llamada
+- Serialización de listados: ORM + to_dict() + json vs columnas + orjson
+
+Por defecto usa SQLite en un archivo temporal (no toca la base real). Con
+--backend mysql usa la conexión de config.py (una instancia MySQL local de
+pruebas, nunca la de producción).
+
+Los resultados se guardan en JSON para comparar entre versiones:
+    python benchmark_sistema.py --output bench_v1.json
+    python benchmark_sistema.py --output bench_v2.json --baseline bench_v1.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from io import StringIO
+from datetime import datetime, timedelta
+
+
+# Umbrales de alerta de init_database_mysql_es.sql (iot_umbral_alerta)
+SEED_THRESHOLDS = [
+    ('nivel_agua', 0.5, 3.0, 'ALTO'),
+    ('precipitacion', 0.0, 50.0, 'MEDIO'),
+    ('temperatura_motor_c', 0.0, 85.0, 'CRITICO'),
+    ('presion_entrada_bar', 2.0, 5.0, 'ALTO'),
+    ('velocidad_viento_kmh', 0.0, 60.0, 'MEDIO'),
+]
+
+# Métricas comparadas con --baseline: (ruta en el JSON, True si mayor es mejor)
+REGRESSION_METRICS = [
+    (('ingest', 'single', 'records_per_s'), True),
+    (('ingest', 'batch', 'records_per_s'), True),
+    (('dashboard', '1h', 'p95_ms'), False),
+    (('dashboard', '24h', 'p95_ms'), False),
+    (('dashboard', '720h', 'p95_ms'), False),
+    (('check_thresholds', 'mean_us'), False),
+    (('serialization', 'fast', 'p95_ms'), False),
+]
+
+
+def configure_backend(backend, sqlite_path):
+    """Fija DB_MODE antes de importar config.py/app.py"""
+    if backend == 'sqlite':
+        os.environ['DB_MODE'] = 'sqlite'
+        os.environ['SQLITE_LOCAL_PATH'] = sqlite_path
+    else:
+        os.environ['DB_MODE'] = 'mysql'
+
+
+def summarize(samples_s):
+    """Estadísticos de una lista de duraciones en segundos (resultado en ms)"""
+    from db_monitor import percentile
+
+    ms = [s * 1000.0 for s in samples_s]
+    return {
+        'n': len(ms),
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'max_ms': round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def git_revision():
+    """Commit actual (si el directorio es un repositorio git)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def wait_for_writer():
+    """En modo SQLite las escrituras son asíncronas: esperar al escritor único"""
+    from sqlite_local import get_local_writer
+
+    writer = get_local_writer()
+    if writer is not None:
+        writer.flush()
+
+
+# =====================================================================
+# SIEMBRA DE DATOS
+# =====================================================================
+
+def seed_database(app, stations, control_stations, days, seed):
+    """
+    Siembra histórico determinista + estaciones, telemetría y umbrales
+
+    Returns:
+        dict: Filas sembradas por tabla
+    """
+    from database import db, MonitoringStation, PumpTelemetry, AlertThreshold
+    from backfill_historico import run_backfill
+
+    end = datetime.utcnow().replace(second=0, microsecond=0)
+    start = end - timedelta(days=days)
+
+    with app.app_context():
+        db.create_all()
+        db_uri = str(db.engine.url.render_as_string(hide_password=False))
+
+    result = run_backfill(start, end, stations, interval_s=600, seed=seed, db_uri=db_uri,
+                          create_tables=True)
+
+    with app.app_context():
+        for name, minimo, maximo, nivel in SEED_THRESHOLDS:
+            if not AlertThreshold.query.filter_by(nombre_parametro=name).first():
+                db.session.add(AlertThreshold(nombre_parametro=name, valor_minimo=minimo,
+                                              valor_maximo=maximo, nivel_alerta=nivel, activo=True))
+
+        for station_id in range(1, control_stations + 1):
+            if not db.session.get(MonitoringStation, station_id):
+                db.session.add(MonitoringStation(id=station_id, nombre=f'Bench {station_id}',
+                                                 tipo_estacion='BOMBEO', activo=True,
+                                                 control_automatico_habilitado=False))
+            db.session.add(PumpTelemetry(
+                bomba_id=station_id,
+                estado='ENCENDIDO' if station_id % 2 else 'APAGADO',
+                caudal_m3h=80.0,
+                presion_entrada_bar=3.0,
+                presion_salida_bar=6.0,
+                consumo_energia_kw=22.0,
+                fecha_hora=end,
+                dispositivo_origen='BENCHMARK'
+            ))
+        db.session.commit()
+
+    return result['rows']
+
+
+# =====================================================================
+# ESCENARIOS
+# =====================================================================
+
+def reading(i, stations, when):
+    """Lectura sintética de compuerta/nivel (payload del simulador)"""
+    return {
+        'estacion_id': 1 + i % stations,
+        'numero_compuerta': 1,
+        'apertura_porcentaje': round((i * 7) % 100, 1),
+        'nivel_m': round(1.0 + (i % 50) / 25.0, 3),
+        'caudal_m3s': round(0.5 + (i % 30) / 10.0, 3),
+        'fecha_hora': when.isoformat(),
+        'dispositivo_origen': 'BENCHMARK'
+    }
+
+
+def bench_ingest(client, records, batch_size, stations):
+    """Throughput de /api/data (una lectura por petición) vs /api/data/batch"""
+    when = datetime.utcnow()
+    payloads = [reading(i, stations, when) for i in range(records)]
+    results = {}
+
+    latencies = []
+    started = time.perf_counter()
+    for payload in payloads:
+        t0 = time.perf_counter()
+        response = client.post('/api/data', json=payload)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/data respondió {response.status_code}: {response.get_data(as_text=True)}')
+    wait_for_writer()
+    elapsed = time.perf_counter() - started
+    results['single'] = dict(summarize(latencies), records=records,
+                             records_per_s=round(records / elapsed, 1))
+
+    latencies = []
+    started = time.perf_counter()
+    for offset in range(0, records, batch_size):
+        t0 = time.perf_counter()
+        response = client.post('/api/data/batch', json={'records': payloads[offset:offset + batch_size]})
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/data/batch respondió {response.status_code}: {response.get_data(as_text=True)}')
+    wait_for_writer()
+    elapsed = time.perf_counter() - started
+    results['batch'] = dict(summarize(latencies), records=records, batch_size=batch_size,
+                            records_per_s=round(records / elapsed, 1))
+
+    return results
+
+
+def bench_dashboard(client, windows, repeats, station_id=1):
+    """Latencia de /api/dashboard por ventana (horas)"""
+    results = {}
+    for hours in windows:
+        # Primera petición fuera de la medición (caché de páginas / planes)
+        client.get(f'/api/dashboard?station_id={station_id}&hours={hours}')
+        latencies = []
+        points = 0
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            response = client.get(f'/api/dashboard?station_id={station_id}&hours={hours}')
+            latencies.append(time.perf_counter() - t0)
+            points = len(response.get_json().get('historical_data', []))
+        results[f'{hours}h'] = dict(summarize(latencies), points=points)
+    return results
+
+
+def bench_control_cycle(app, station_counts, repeats):
+    """Duración de run_automatic_control_cycle según estaciones habilitadas"""
+    from database import db, MonitoringStation
+    from auto_control import run_automatic_control_cycle
+
+    results = {}
+    with app.app_context():
+        for count in station_counts:
+            MonitoringStation.query.update({'control_automatico_habilitado': False})
+            MonitoringStation.query.filter(MonitoringStation.id <= count).update(
+                {'control_automatico_habilitado': True})
+            db.session.commit()
+
+            durations = []
+            actions = {}
+            for _ in range(repeats):
+                # El ciclo imprime un informe por estación: no medir la consola
+                with contextlib.redirect_stdout(StringIO()):
+                    t0 = time.perf_counter()
+                    cycle = run_automatic_control_cycle()
+                    durations.append(time.perf_counter() - t0)
+            for item in cycle:
+                action = item['result']['action']
+                actions[action] = actions.get(action, 0) + 1
+
+            stats = summarize(durations)
+            stats['ms_per_station'] = round(stats['mean_ms'] / count, 3)
+            stats['actions'] = actions
+            results[str(count)] = stats
+    return results
+
+
+def bench_check_thresholds(app, calls):
+    """Costo por llamada de alert_manager.check_thresholds"""
+    from alert_system import alert_manager
+
+    params = [('nivel_agua', 1.8), ('nivel_agua', 3.4), ('presion_entrada_bar', 1.5),
+              ('temperatura_motor_c', 70.0), ('parametro_inexistente', 1.0)]
+    violations = 0
+    with app.app_context():
+        started = time.perf_counter()
+        for i in range(calls):
+            name, value = params[i % len(params)]
+            if alert_manager.check_thresholds(station_id=1, parameter_name=name, current_value=value):
+                violations += 1
+        elapsed = time.perf_counter() - started
+
+    return {
+        'calls': calls,
+        'mean_us': round(elapsed / calls * 1e6, 1),
+        'calls_per_s': round(calls / elapsed, 1),
+        'violations': violations
+    }
+
+
+def bench_serialization(app, rows, repeats, station_id=1):
+    """Listado meteorológico: objetos ORM + to_dict() + json vs ruta por columnas"""
+    from database import db, MeteorologicalData
+    from api_extended import meteorology_serializer
+    from serialization import dumps, ORJSON_AVAILABLE
+
+    def orm_path():
+        data = MeteorologicalData.query.filter_by(estacion_id=station_id).order_by(
+            MeteorologicalData.fecha_hora).limit(rows).all()
+        return json.dumps({'data': [d.to_dict() for d in data]}).encode('utf-8')
+
+    def fast_path():
+        data = meteorology_serializer.query().filter(
+            MeteorologicalData.estacion_id == station_id).order_by(
+            MeteorologicalData.fecha_hora).limit(rows).all()
+        return dumps({'data': meteorology_serializer.dicts(data)})
+
+    results = {'orjson': ORJSON_AVAILABLE}
+    with app.app_context():
+        for name, build in (('orm', orm_path), ('fast', fast_path)):
+            build()
+            latencies = []
+            size = 0
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                size = len(build())
+                latencies.append(time.perf_counter() - t0)
+                # Sin identity map acumulado entre repeticiones
+                db.session.remove()
+            results[name] = dict(summarize(latencies), bytes=size)
+
+    results['rows'] = rows
+    results['speedup'] = round(results['orm']['mean_ms'] / results['fast']['mean_ms'], 2) \
+        if results['fast']['mean_ms'] else None
+    return results
+
+
+# =====================================================================
+# COMPARACIÓN ENTRE VERSIONES
+# =====================================================================
+
+def lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def compare_results(current, baseline, tolerance=0.15):
+    """
+    Compara métricas clave contra un JSON anterior
+
+    Returns:
+        list: Dicts por métrica con el cambio relativo y si es regresión
+    """
+    report = []
+    for path, higher_is_better in REGRESSION_METRICS:
+        new = lookup(current['results'], path)
+        old = lookup(baseline.get('results', {}), path)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        regression = change < -tolerance if higher_is_better else change > tolerance
+        report.append({
+            'metric': '.'.join(path),
+            'baseline': old,
+            'current': new,
+            'change_pct': round(change * 100, 1),
+            'regression': regression
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de ingesta, consultas y control automático')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite',
+                        help='sqlite: archivo temporal; mysql: conexión de config.py')
+    parser.add_argument('--stations', type=int, default=3, help='Estaciones con histórico sembrado')
+    parser.add_argument('--days', type=int, default=31, help='Días de histórico sembrado')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla del generador')
+    parser.add_argument('--records', type=int, default=2000, help='Lecturas para la prueba de ingesta')
+    parser.add_argument('--batch', type=int, default=200, help='Tamaño de lote en /api/data/batch')
+    parser.add_argument('--windows', default='1,24,720', help='Ventanas del dashboard en horas')
+    parser.add_argument('--repeats', type=int, default=20, help='Repeticiones por medición')
+    parser.add_argument('--control-stations', default='1,10,50', help='Estaciones en el ciclo de control')
+    parser.add_argument('--threshold-calls', type=int, default=2000, help='Llamadas a check_thresholds')
+    parser.add_argument('--serialize-rows', type=int, default=5000, help='Filas del listado serializado')
+    parser.add_argument('--output', default='benchmark_resultados.json', help='Archivo JSON de resultados')
+    parser.add_argument('--baseline', help='JSON de una versión anterior para detectar regresiones')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Cambio relativo tolerado (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    windows = [int(h) for h in args.windows.split(',') if h.strip()]
+    station_counts = [int(n) for n in args.control_stations.split(',') if n.strip()]
+
+    tmp_dir = tempfile.mkdtemp(prefix='benchmark_')
+    configure_backend(args.backend, os.path.join(tmp_dir, 'benchmark.db'))
+
+    # Importar después de fijar DB_MODE (config.py lo lee al cargarse)
+    with contextlib.redirect_stdout(StringIO()):
+        from app import app
+    client = app.test_client()
+
+    print(f"🔄 Sembrando {args.stations} estaciones x {args.days} días (semilla {args.seed}, {args.backend})...")
+    t0 = time.perf_counter()
+    seeded = seed_database(app, args.stations, max(station_counts + [args.stations]), args.days, args.seed)
+    seed_s = time.perf_counter() - t0
+
+    # La ingesta va al final para no alterar las ventanas del dashboard
+    results = {}
+    print("📊 Dashboard...")
+    results['dashboard'] = bench_dashboard(client, windows, args.repeats)
+    print("🤖 Ciclo de control automático...")
+    results['control_cycle'] = bench_control_cycle(app, station_counts, max(1, args.repeats // 4))
+    print("🚨 check_thresholds...")
+    results['check_thresholds'] = bench_check_thresholds(app, args.threshold_calls)
+    print("🧾 Serialización de listados...")
+    results['serialization'] = bench_serialization(app, args.serialize_rows, args.repeats)
+    print("📥 Ingesta /api/data vs /api/data/batch...")
+    results['ingest'] = bench_ingest(client, args.records, args.batch, args.stations)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'seed': args.seed,
+            'stations': args.stations,
+            'days': args.days,
+            'seeded_rows': seeded,
+            'seed_s': round(seed_s, 3)
+        },
+        'results': results
+    }
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            output['comparison'] = compare_results(output, json.load(f), args.tolerance)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+
+    ingest = results['ingest']
+    print(f"\n✅ Resultados en {args.output}")
+    print(f"   Ingesta individual: {ingest['single']['records_per_s']:,} lecturas/s "
+          f"(p95 {ingest['single']['p95_ms']} ms)")
+    print(f"   Ingesta por lotes:  {ingest['batch']['records_per_s']:,} lecturas/s "
+          f"(lotes de {args.batch}, p95 {ingest['batch']['p95_ms']} ms)")
+    for window, stats in results['dashboard'].items():
+        print(f"   Dashboard {window:>5}: p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms "
+              f"({stats['points']} puntos)")
+    for count, stats in results['control_cycle'].items():
+        print(f"   Control {count:>4} estaciones: {stats['mean_ms']} ms ({stats['ms_per_station']} ms/estación)")
+    print(f"   check_thresholds: {results['check_thresholds']['mean_us']} µs/llamada")
+    serialization = results['serialization']
+    print(f"   Serialización {serialization['rows']} filas: to_dict {serialization['orm']['mean_ms']} ms, "
+          f"columnas {serialization['fast']['mean_ms']} ms (x{serialization['speedup']}, "
+          f"orjson={serialization['orjson']})")
+
+    regressions = [item for item in output.get('comparison', []) if item['regression']]
+    for item in regressions:
+        print(f"   ⚠️ Regresión en {item['metric']}: {item['baseline']} → {item['current']} "
+              f"({item['change_pct']:+.1f}%)")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
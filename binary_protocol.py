@@ -0,0 +1,177 @@
+"""
+Protocolo Binario Compacto de Telemetría (ESP32)
+Proyecto de grado
+
+Formato de tramas para enlaces celulares: estructuras empaquetadas little-endian
+con esquema fijo, en lugar de JSON con claves largas en español.
+
+Trama = cabecera (12 bytes) + N registros de tamaño fijo según el esquema:
+
+    Cabecera '<2sBBHHI':
+        magic        2s   b'EB'
+        version      B    1
+        schema_id    B    SCHEMA_METEO / SCHEMA_PUMP / SCHEMA_GATE
+        count        H    número de registros
+        device_id    H    dispositivo_origen = 'ESP32_<device_id>'
+        base_ts      I    epoch UTC en segundos (0 = hora del servidor)
+
+Cada registro empieza con 'dt' (uint16, segundos desde base_ts) y guarda los
+valores como enteros escalados (p.ej. nivel_m * 1000). En C equivale a un
+struct con __attribute__((packed)); ver wokwi_esp32_simulator/sketch.ino.
+
+El decodificador usa struct.iter_unpack sobre todo el bloque de registros y
+entrega filas listas para insertar en bloque (ingestion.write_rows).
+"""
+
+import struct
+from datetime import datetime, timedelta, timezone
+
+MAGIC = b'EB'
+VERSION = 1
+HEADER = struct.Struct('<2sBBHHI')
+
+SCHEMA_METEO = 1
+SCHEMA_PUMP = 2
+SCHEMA_GATE = 3
+
+CONTENT_TYPE = 'application/x-estacion-bin'
+
+PUMP_STATES = ('APAGADO', 'ENCENDIDO')
+PUMP_MODES = ('AUTO', 'MANUAL')
+
+
+class ProtocolError(ValueError):
+    """Trama binaria inválida (magic, versión, esquema o longitud)"""
+
+
+# Esquemas: formato del registro y (columna, escala) para cada campo tras 'dt'.
+# escala None = valor entero tal cual; 'estado'/'modo' se traducen a texto.
+SCHEMAS = {
+    SCHEMA_METEO: {
+        'format': struct.Struct('<HHhHHHHHH'),
+        'fields': [
+            ('estacion_id', None),
+            ('temperatura_c', 100),
+            ('humedad_porcentaje', 10),
+            ('precipitacion_mm', 10),
+            ('velocidad_viento_kmh', 10),
+            ('direccion_viento_grados', None),
+            ('presion_atmosferica_hpa', 10),
+            ('radiacion_solar_wm2', None),
+        ],
+    },
+    SCHEMA_PUMP: {
+        'format': struct.Struct('<HHBBHHHHhBxI'),
+        'fields': [
+            ('bomba_id', None),
+            ('estado', 'estado'),
+            ('modo_operacion', 'modo'),
+            ('caudal_m3h', 10),
+            ('presion_entrada_bar', 100),
+            ('presion_salida_bar', 100),
+            ('consumo_energia_kw', 10),
+            ('temperatura_motor_c', 10),
+            ('nivel_vibracion', None),
+            ('horas_operacion', 10),
+        ],
+    },
+    SCHEMA_GATE: {
+        'format': struct.Struct('<HHBxHHH'),
+        'fields': [
+            ('estacion_id', None),
+            ('numero_compuerta', None),
+            ('apertura_porcentaje', 10),
+            ('nivel_m', 1000),
+            ('caudal_m3s', 1000),
+        ],
+    },
+}
+
+
+def decode_frame(body, now=None):
+    """
+    Decodifica una trama binaria
+
+    Args:
+        body (bytes): Cuerpo de la petición
+        now (datetime): Hora de referencia si base_ts es 0 (por defecto utcnow)
+
+    Returns:
+        tuple: (schema_id, lista de dicts por registro con fecha_hora y dispositivo_origen)
+
+    Raises:
+        ProtocolError: Si la trama no es válida
+    """
+    if len(body) < HEADER.size:
+        raise ProtocolError('Trama demasiado corta')
+
+    magic, version, schema_id, count, device_id, base_ts = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ProtocolError('Magic inválido')
+    if version != VERSION:
+        raise ProtocolError(f'Versión de protocolo no soportada: {version}')
+    schema = SCHEMAS.get(schema_id)
+    if schema is None:
+        raise ProtocolError(f'Esquema desconocido: {schema_id}')
+
+    record = schema['format']
+    expected = HEADER.size + count * record.size
+    if len(body) != expected:
+        raise ProtocolError(f'Longitud {len(body)} no coincide con {count} registros ({expected} bytes)')
+
+    base = datetime.fromtimestamp(base_ts, timezone.utc).replace(tzinfo=None) if base_ts else (now or datetime.utcnow())
+    device = f'ESP32_{device_id}'
+    names = [name for name, _ in schema['fields']]
+    converters = [field_converter(scale) for _, scale in schema['fields']]
+
+    rows = []
+    for values in record.iter_unpack(memoryview(body)[HEADER.size:]):
+        row = {name: convert(value) for name, convert, value in zip(names, converters, values[1:])}
+        row['fecha_hora'] = base + timedelta(seconds=values[0])
+        row['dispositivo_origen'] = device
+        rows.append(row)
+
+    return schema_id, rows
+
+
+def field_converter(scale):
+    if scale is None:
+        return int
+    if scale == 'estado':
+        return lambda value: PUMP_STATES[1 if value else 0]
+    if scale == 'modo':
+        return lambda value: PUMP_MODES[value] if value < len(PUMP_MODES) else 'AUTO'
+    return lambda value: value / scale
+
+
+def encode_frame(schema_id, records, device_id=0, base_ts=0):
+    """
+    Codifica registros (dicts con los nombres de columna) en una trama
+
+    Lo usan los simuladores y pruebas; el ESP32 arma la misma trama en C.
+
+    Args:
+        schema_id (int): Esquema de los registros
+        records (list): Dicts con las columnas del esquema y opcionalmente 'dt'
+        device_id (int): Identificador numérico del dispositivo
+        base_ts (int): Epoch UTC de referencia (0 = hora del servidor)
+    """
+    schema = SCHEMAS[schema_id]
+    record = schema['format']
+    parts = [HEADER.pack(MAGIC, VERSION, schema_id, len(records), device_id, base_ts)]
+
+    for item in records:
+        values = [int(item.get('dt', 0))]
+        for name, scale in schema['fields']:
+            value = item.get(name) or 0
+            if scale == 'estado':
+                values.append(1 if value in (1, True) or str(value).upper().startswith('ENCENDID') else 0)
+            elif scale == 'modo':
+                values.append(PUMP_MODES.index(value) if value in PUMP_MODES else 0)
+            elif scale is None:
+                values.append(int(value))
+            else:
+                values.append(int(round(float(value) * scale)))
+        parts.append(record.pack(*values))
+
+    return b''.join(parts)
@@ -0,0 +1,257 @@
+"""
+Compresión de Respuestas HTTP (gzip / Brotli)
+Proyecto de grado
+
+Los operadores consultan el dashboard por enlaces rurales lentos. Sin
+compresión, script.js, dashboard_extended.js y los históricos de miles de
+puntos viajan completos.
+
+- ResponseCompressor: after_request de Flask que comprime las respuestas
+  JSON/texto que superan COMPRESSION_MIN_BYTES, según Accept-Encoding
+  (Brotli si el cliente lo acepta y el paquete está instalado, si no gzip)
+- AssetCache: archivos estáticos comprimidos una sola vez y guardados en
+  memoria; se recomprimen cuando cambia su mtime o tamaño
+- CompressedStaticHandler: mixin para los servidores estáticos servidor_*.py
+  (http.server) con la misma caché
+
+Configuración (config.py):
+    COMPRESSION_ENABLED         Activa la compresión (default true)
+    COMPRESSION_MIN_BYTES       Tamaño mínimo a comprimir (default 1024)
+    COMPRESSION_GZIP_LEVEL      Nivel gzip 1-9 para respuestas dinámicas (default 6)
+    COMPRESSION_BROTLI_QUALITY  Calidad Brotli 0-11 para respuestas dinámicas (default 4)
+
+Los estáticos se comprimen siempre al máximo (gzip 9, Brotli 11): se hace una
+vez por versión del archivo.
+"""
+
+import os
+import io
+import gzip
+import hashlib
+import threading
+import mimetypes
+from email.utils import formatdate
+from flask import request, Response, current_app, abort, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'text/javascript',
+    'text/css', 'text/html', 'text/plain', 'image/svg+xml'
+)
+
+# Nivel de los estáticos (se comprimen una sola vez por versión)
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.split(';')[0].strip() in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encoding, allow_brotli=True):
+    """
+    Elige la codificación según la cabecera Accept-Encoding
+
+    Returns:
+        str: 'br', 'gzip' o None (sin compresión)
+    """
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    def allowed(name):
+        return accepted.get(name, accepted.get('*', 0.0)) > 0
+
+    if allow_brotli and BROTLI_AVAILABLE and allowed('br'):
+        return 'br'
+    if allowed('gzip'):
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    """Comprime bytes con la codificación indicada"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    # mtime=0: misma entrada, mismos bytes (ETag estable)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class AssetCache:
+    """Estáticos comprimidos en memoria, invalidados por mtime y tamaño"""
+
+    def __init__(self, gzip_level=STATIC_GZIP_LEVEL, brotli_quality=STATIC_BROTLI_QUALITY):
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._entries = {}       # (ruta, codificación) -> (mtime_ns, tamaño, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, path, encoding):
+        """
+        Contenido del archivo con la codificación pedida (None = sin comprimir)
+
+        Returns:
+            tuple: (bytes, os.stat_result)
+        """
+        stat = os.stat(path)
+        key = (path, encoding)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2], stat
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        if encoding is not None:
+            data = compress(data, encoding, self.gzip_level, self.brotli_quality)
+
+        with self._lock:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, data)
+        return data, stat
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def asset_etag(stat, encoding):
+    """ETag por versión del archivo y codificación"""
+    raw = f'{stat.st_mtime_ns}-{stat.st_size}-{encoding or "identity"}'.encode('ascii')
+    return hashlib.sha1(raw).hexdigest()[:20]
+
+
+class ResponseCompressor:
+    """Compresión negociada de respuestas Flask"""
+
+    def __init__(self):
+        self.enabled = True
+        self.min_bytes = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        self.assets = AssetCache()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESSION_ENABLED', self.enabled)
+        self.min_bytes = app.config.get('COMPRESSION_MIN_BYTES', self.min_bytes)
+        self.gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', self.gzip_level)
+        self.brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', self.brotli_quality)
+        if self.enabled:
+            app.after_request(self._compress_response)
+
+    def _compress_response(self, response):
+        """Comprime respuestas dinámicas (JSON, texto) que superan min_bytes"""
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code >= 300
+                or 'Content-Encoding' in response.headers
+                or not is_compressible(response.mimetype)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+
+        encoding = negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        response.set_data(compress(data, encoding, self.gzip_level, self.brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def send_asset(self, filename, directory='', max_age=0):
+        """
+        Sirve un archivo estático con la compresión negociada desde la caché
+
+        Reemplaza a send_file/send_from_directory para css/js/html (rutas
+        relativas a la raíz de la aplicación). Responde 304 si el ETag coincide.
+        """
+        path = safe_join(os.path.join(current_app.root_path, directory), filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        mimetype = mimetypes.guess_type(path)[0]
+        if not is_compressible(mimetype):
+            # Imágenes, PDF, etc.: ya comprimidos, sin pasar por la caché
+            return send_file(path, max_age=max_age)
+
+        encoding = None
+        if self.enabled and os.path.getsize(path) >= self.min_bytes:
+            encoding = negotiate(request.headers.get('Accept-Encoding'))
+        data, stat = self.assets.get(path, encoding)
+
+        response = Response(data, mimetype=mimetype)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(asset_etag(stat, encoding))
+        response.last_modified = stat.st_mtime
+        response.cache_control.max_age = max_age
+        response.cache_control.public = True
+        return response.make_conditional(request)
+
+
+class CompressedStaticHandler:
+    """
+    Mixin para http.server.SimpleHTTPRequestHandler (servidor_*.py)
+
+    Sirve css/js/html/json comprimidos desde una caché compartida:
+        class MyHTTPRequestHandler(CompressedStaticHandler, http.server.SimpleHTTPRequestHandler)
+    """
+
+    asset_cache = AssetCache()
+    compression_min_bytes = 1024
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().send_head()
+
+        mimetype = self.guess_type(path)
+        encoding = negotiate(self.headers.get('Accept-Encoding')) if is_compressible(mimetype) else None
+        if encoding is None or os.path.getsize(path) < self.compression_min_bytes:
+            return super().send_head()
+
+        try:
+            data, stat = self.asset_cache.get(path, encoding)
+        except OSError:
+            return super().send_head()
+
+        etag = f'"{asset_etag(stat, encoding)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return None
+
+        self.send_response(200)
+        self.send_header('Content-Type', mimetype)
+        self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', formatdate(stat.st_mtime, usegmt=True))
+        self.end_headers()
+        return io.BytesIO(data)
+
+
+# Instancia global del compresor de respuestas
+response_compressor = ResponseCompressor()
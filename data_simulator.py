@@ -11,7 +11,9 @@ import math
 from datetime import datetime, timedelta
 from flask import Flask, jsonify, request
 from threading import Thread
-import requests
+from http_transport import BatchPoster
+
+API_BATCH_URL = 'http://localhost:9000/api/data/batch'
 
 class VirtualSensorSimulator:
     def __init__(self):
@@ -66,6 +68,8 @@ class VirtualSensorSimulator:
         self.current_data = {}
         self.historical_data = []
         self.running = False
+        # Las lecturas se agrupan y se envían en lote por una conexión persistente
+        self.poster = BatchPoster(API_BATCH_URL, max_items=50, max_delay=2.0, timeout=2)
         
     def calculate_flow(self, level, station_id=1):
         """Calcula caudal basado en ecuación de vertedero"""
@@ -244,6 +248,7 @@ class VirtualSensorSimulator:
     def start_simulation(self):
         """Inicia la simulación de datos en tiempo real"""
         self.running = True
+        self.poster.start()
         
         def simulation_loop():
             while self.running:
@@ -253,12 +258,8 @@ class VirtualSensorSimulator:
                         data = self.generate_station_data(station_id)
                         self.current_data[station_id] = data
                         
-                        # Enviar datos al sistema principal si está disponible
-                        try:
-                            response = requests.post('http://localhost:5000/api/data', 
-                                                   json=data, timeout=2)
-                        except:
-                            pass  # Sistema principal no disponible
+                        # Enviar datos al sistema principal (si no está disponible el lote se descarta)
+                        self.poster.add(data)
                     
                     # Guardar en histórico
                     self.historical_data.append({
@@ -283,6 +284,7 @@ class VirtualSensorSimulator:
     def stop_simulation(self):
         """Detiene la simulación"""
         self.running = False
+        self.poster.stop()
         print("Simulador de datos detenido")
     
     def get_dashboard_data(self, station_id=1, hours=24):
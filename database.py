@@ -341,6 +341,88 @@ class AutomaticControlLog(db.Model):
         }
 
 
+class ControlTiming(db.Model):
+    """Modelo para tiempos por fase de cada evaluación del control automático"""
+    __tablename__ = 'iot_tiempo_control'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    estacion_id = db.Column('estacion_id', db.Integer, nullable=False)
+    accion = db.Column(db.String(20))
+    total_ms = db.Column('total_ms', db.Numeric(10,3), nullable=False)
+    nivel_ms = db.Column('nivel_ms', db.Numeric(10,3))
+    lluvia_2h_ms = db.Column('lluvia_2h_ms', db.Numeric(10,3))
+    lluvia_24h_ms = db.Column('lluvia_24h_ms', db.Numeric(10,3))
+    estado_bomba_ms = db.Column('estado_bomba_ms', db.Numeric(10,3))
+    umbrales_ms = db.Column('umbrales_ms', db.Numeric(10,3))
+    decision_ms = db.Column('decision_ms', db.Numeric(10,3))
+    persistencia_ms = db.Column('persistencia_ms', db.Numeric(10,3))
+    alerta_ms = db.Column('alerta_ms', db.Numeric(10,3))
+    fecha_hora = db.Column('fecha_hora', db.DateTime, nullable=False, default=datetime.now)
+    
+    def __repr__(self):
+        return f'<ControlTiming {self.estacion_id}: {self.total_ms} ms>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'estacion_id': self.estacion_id,
+            'accion': self.accion,
+            'total_ms': float(self.total_ms) if self.total_ms is not None else None,
+            'nivel_ms': float(self.nivel_ms) if self.nivel_ms is not None else None,
+            'lluvia_2h_ms': float(self.lluvia_2h_ms) if self.lluvia_2h_ms is not None else None,
+            'lluvia_24h_ms': float(self.lluvia_24h_ms) if self.lluvia_24h_ms is not None else None,
+            'estado_bomba_ms': float(self.estado_bomba_ms) if self.estado_bomba_ms is not None else None,
+            'umbrales_ms': float(self.umbrales_ms) if self.umbrales_ms is not None else None,
+            'decision_ms': float(self.decision_ms) if self.decision_ms is not None else None,
+            'persistencia_ms': float(self.persistencia_ms) if self.persistencia_ms is not None else None,
+            'alerta_ms': float(self.alerta_ms) if self.alerta_ms is not None else None,
+            'fecha_hora': self.fecha_hora.isoformat() if self.fecha_hora else None
+        }
+
+
+class ActuatorCommand(db.Model):
+    """Modelo para comandos enviados a los actuadores (bombas) con confirmación"""
+    __tablename__ = 'iot_comando_actuador'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    estacion_id = db.Column('estacion_id', db.Integer)
+    bomba_id = db.Column('bomba_id', db.Integer, nullable=False)
+    log_control_id = db.Column('log_control_id', db.Integer)
+    comando = db.Column(db.String(20), nullable=False)
+    origen = db.Column(db.String(20), nullable=False, default='AUTO')
+    estado = db.Column(db.String(20), nullable=False, default='PENDIENTE')
+    canal = db.Column(db.String(10))
+    intentos = db.Column(db.Integer, default=0)
+    fecha_decision = db.Column('fecha_decision', db.DateTime, nullable=False, default=datetime.now)
+    fecha_envio = db.Column('fecha_envio', db.DateTime)
+    fecha_confirmacion = db.Column('fecha_confirmacion', db.DateTime)
+    fecha_expiracion = db.Column('fecha_expiracion', db.DateTime, nullable=False)
+    latencia_ms = db.Column('latencia_ms', db.Integer)
+    mensaje_error = db.Column('mensaje_error', db.Text)
+    
+    def __repr__(self):
+        return f'<ActuatorCommand {self.comando} bomba {self.bomba_id}: {self.estado}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'estacion_id': self.estacion_id,
+            'bomba_id': self.bomba_id,
+            'log_control_id': self.log_control_id,
+            'comando': self.comando,
+            'origen': self.origen,
+            'estado': self.estado,
+            'canal': self.canal,
+            'intentos': self.intentos,
+            'fecha_decision': self.fecha_decision.isoformat() if self.fecha_decision else None,
+            'fecha_envio': self.fecha_envio.isoformat() if self.fecha_envio else None,
+            'fecha_confirmacion': self.fecha_confirmacion.isoformat() if self.fecha_confirmacion else None,
+            'fecha_expiracion': self.fecha_expiracion.isoformat() if self.fecha_expiracion else None,
+            'latencia_ms': self.latencia_ms,
+            'mensaje_error': self.mensaje_error
+        }
+
+
 class MonitoringStation(db.Model):
     """Modelo extendido para estaciones de monitoreo"""
     __tablename__ = 'iot_estacion_monitoreo'
@@ -0,0 +1,205 @@
+"""
+Monitor del Pool de Conexiones - Base de Datos
+Proyecto de grado
+
+Registra, sin dependencias externas:
+- Tiempo de espera para obtener una conexión del pool (por petición /api/*)
+- Uso del pool (conexiones en uso, libres, overflow)
+- Conexiones nuevas e invalidadas (conexiones caídas de MySQL)
+- Consultas lentas según umbral configurable
+
+Es el único que engancha before/after_cursor_execute: la duración medida de
+cada consulta se entrega a los suscriptores (metrics.py, query_guard.py) con
+add_statement_listener, así el costo por consulta no crece con cada módulo.
+
+Los datos se exponen en GET /api/health/db para dimensionar el pool.
+"""
+
+import time
+import threading
+from collections import deque
+from flask import g, request
+from sqlalchemy import event
+
+
+def percentile(values, pct):
+    """Percentil por rango más cercano sobre una lista de valores"""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    index = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[max(0, min(index, len(ordered) - 1))]
+
+
+class DBMonitor:
+    """Recolector de métricas del pool de conexiones y de consultas"""
+
+    def __init__(self, max_samples=2000, slow_query_ms=200):
+        self._lock = threading.Lock()
+        self.slow_query_ms = slow_query_ms
+        self.checkout_waits_ms = deque(maxlen=max_samples)
+        self.recent_slow_queries = deque(maxlen=20)
+        self.total_queries = 0
+        self.slow_queries = 0
+        self.connections_opened = 0
+        self.connections_invalidated = 0
+        self.checkout_timeouts = 0
+        self.engine = None
+        self._statement_listeners = []
+
+    def init_app(self, app, db):
+        """Registra eventos de SQLAlchemy y el medidor de checkout por petición"""
+        self.slow_query_ms = app.config.get('DB_SLOW_QUERY_MS', self.slow_query_ms)
+        max_samples = app.config.get('DB_MONITOR_SAMPLES')
+        if max_samples:
+            self.checkout_waits_ms = deque(maxlen=max_samples)
+
+        with app.app_context():
+            self.engine = db.engine
+
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(self.engine, 'handle_error', self._on_error)
+        event.listen(self.engine.pool, 'connect', self._on_connect)
+        event.listen(self.engine.pool, 'invalidate', self._on_invalidate)
+
+        @app.before_request
+        def measure_checkout_wait():
+            # Solo rutas de API: los archivos estáticos no usan base de datos
+            if not request.path.startswith('/api/') or request.path == '/api/health/db':
+                return None
+
+            start = time.perf_counter()
+            try:
+                db.session.connection()
+            except Exception:
+                # Timeout del pool u otra falla: el handler devolverá el error
+                with self._lock:
+                    self.checkout_timeouts += 1
+                return None
+
+            wait_ms = (time.perf_counter() - start) * 1000
+            g.db_checkout_ms = wait_ms
+            with self._lock:
+                self.checkout_waits_ms.append(wait_ms)
+            return None
+
+    def add_statement_listener(self, listener):
+        """
+        Suscribe listener(statement, parameters, duration_ms) a cada consulta medida
+
+        Se llama en el hilo que ejecutó la consulta, así que puede usar g o
+        threading.local para atribuirla a la petición o bloque en curso.
+        """
+        if listener not in self._statement_listeners:
+            self._statement_listeners.append(listener)
+
+    # ------------------------------------------------------------------
+    # Eventos de SQLAlchemy
+    # ------------------------------------------------------------------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get('query_start_time')
+        if not start_times:
+            return
+
+        elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+        with self._lock:
+            self.total_queries += 1
+            if elapsed_ms >= self.slow_query_ms:
+                self.slow_queries += 1
+                self.recent_slow_queries.append({
+                    'duration_ms': round(elapsed_ms, 2),
+                    'statement': statement[:300],
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+                })
+
+        for listener in self._statement_listeners:
+            listener(statement, parameters, elapsed_ms)
+
+    def _on_error(self, exception_context):
+        # Una sentencia que falla no dispara after_cursor_execute: descartar su
+        # inicio para que la lista de conn.info no crezca con la conexión del pool
+        conn = exception_context.connection
+        if conn is None or exception_context.statement is None:
+            return
+        start_times = conn.info.get('query_start_time')
+        if start_times:
+            start_times.pop()
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.connections_invalidated += 1
+
+    # ------------------------------------------------------------------
+    # Reporte
+    # ------------------------------------------------------------------
+
+    def get_pool_status(self):
+        """Uso actual del pool (los pools de SQLite no exponen todos los contadores)"""
+        pool = self.engine.pool if self.engine is not None else None
+        if pool is None:
+            return {}
+
+        status = {'pool_class': type(pool).__name__}
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, name, None)
+            if callable(method):
+                status[name] = method()
+
+        max_overflow = getattr(pool, '_max_overflow', None)
+        if max_overflow is not None and 'size' in status:
+            status['max_overflow'] = max_overflow
+            status['capacity'] = status['size'] + max(max_overflow, 0)
+            if status['capacity'] > 0 and 'checkedout' in status:
+                status['usage_percent'] = round(status['checkedout'] * 100.0 / status['capacity'], 1)
+
+        timeout = getattr(pool, '_timeout', None)
+        if timeout is not None:
+            status['timeout_s'] = timeout
+        recycle = getattr(pool, '_recycle', None)
+        if recycle is not None:
+            status['recycle_s'] = recycle
+        status['pre_ping'] = getattr(pool, '_pre_ping', False)
+
+        return status
+
+    def get_stats(self):
+        """Resumen completo para /api/health/db"""
+        with self._lock:
+            waits = list(self.checkout_waits_ms)
+            stats = {
+                'queries': {
+                    'total': self.total_queries,
+                    'slow': self.slow_queries,
+                    'slow_threshold_ms': self.slow_query_ms,
+                    'recent_slow': list(self.recent_slow_queries)
+                },
+                'connections': {
+                    'opened': self.connections_opened,
+                    'invalidated': self.connections_invalidated,
+                    'checkout_timeouts': self.checkout_timeouts
+                }
+            }
+
+        stats['pool'] = self.get_pool_status()
+        stats['checkout_wait_ms'] = {
+            'samples': len(waits),
+            'p50': round(percentile(waits, 50), 3),
+            'p95': round(percentile(waits, 95), 3),
+            'p99': round(percentile(waits, 99), 3),
+            'max': round(max(waits), 3) if waits else 0.0
+        }
+        return stats
+
+
+# Instancia global del monitor
+db_monitor = DBMonitor()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Núcleo de Decisión del Control Automático (sin efectos secundarios)
+Proyecto de grado
+
+Las reglas de AutomaticController.decision_logic extraídas a funciones puras:
+- decide(): una evaluación (la usa el controlador en línea)
+- decide_batch(): las mismas reglas sobre arreglos NumPy, sin bucles de Python
+- simulate() / what_if(): reproducen meses de histórico con distintas
+  configuraciones de umbrales y cuentan arranques, paradas, horas de bombeo
+  y kWh consumidos en tarifa pico
+
+La reproducción es en lazo abierto: usa los niveles registrados y asume que
+la bomba sigue la decisión, sin modelar cómo el bombeo habría cambiado el nivel.
+
+Uso:
+    python decision_kernel.py --station 1 --days 90 \\
+        --grid min_water_level=0.4,0.5,0.6 --grid max_rain_2h_for_pumping=20,30
+"""
+
+import json
+import time
+import argparse
+import itertools
+from datetime import datetime, timedelta
+import numpy as np
+
+# Tarifas energéticas (arreglo int8)
+TARIFF_VALLEY, TARIFF_STANDARD, TARIFF_PEAK = 0, 1, 2
+TARIFF_NAMES = ['VALLEY', 'STANDARD', 'PEAK']
+
+# Tarifa por hora del día (Colombia ejemplo): valle 22-6, pico 6-10 y 18-22
+HOURLY_TARIFF = np.array(
+    [TARIFF_VALLEY] * 6 + [TARIFF_PEAK] * 4 + [TARIFF_STANDARD] * 8 +
+    [TARIFF_PEAK] * 4 + [TARIFF_VALLEY] * 2, dtype=np.int8
+)
+
+DEFAULT_THRESHOLDS = {
+    'min_water_level': 0.5,
+    'max_water_level': 3.0,
+    'min_inlet_pressure': 2.0,
+    'max_rain_2h_for_pumping': 30.0
+}
+
+# Regla que decidió cada paso (para los reportes de decide_batch)
+RULE_CRITICAL_LEVEL = 1
+RULE_LOW_PRESSURE = 2
+RULE_HEAVY_RAIN = 3
+RULE_MAX_LEVEL = 4
+RULE_PEAK_URGENT = 5
+RULE_PEAK_WAIT = 6
+RULE_LOW_LEVEL = 7
+RULE_HOLD = 8
+RULE_DEFAULT = 0
+RULE_NAMES = {
+    RULE_DEFAULT: 'sin_bombeo',
+    RULE_CRITICAL_LEVEL: 'nivel_critico',
+    RULE_LOW_PRESSURE: 'presion_insuficiente',
+    RULE_HEAVY_RAIN: 'lluvia_fuerte',
+    RULE_MAX_LEVEL: 'nivel_maximo',
+    RULE_PEAK_URGENT: 'pico_urgente',
+    RULE_PEAK_WAIT: 'pico_esperar',
+    RULE_LOW_LEVEL: 'nivel_bajo',
+    RULE_HOLD: 'mantener'
+}
+
+
+def tariff_for_hour(hour):
+    """Tarifa (PEAK/VALLEY/STANDARD) para una hora del día"""
+    return TARIFF_NAMES[HOURLY_TARIFF[hour]]
+
+
+def resolve_thresholds(thresholds):
+    """Umbrales con los valores por defecto para las claves ausentes"""
+    return {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+
+
+def decide(water_level, rainfall_2h, tariff, pump_running, inlet_pressure, thresholds=None):
+    """
+    Evalúa las reglas de control para un instante
+
+    Reglas (en orden de prioridad):
+    1. Nivel < 50% del mínimo y lluvia 2h < 15mm: encender si hay presión
+    2. Lluvia 2h > máximo: apagar
+    3. Nivel > máximo: apagar
+    4. Tarifa PEAK: encender solo si nivel < 70% del mínimo
+    5. Nivel < mínimo, lluvia 2h < 5mm y presión suficiente: encender
+    6. Nivel dentro de [mínimo, máximo]: mantener estado
+    Por defecto: apagar
+
+    Args:
+        water_level (float): Nivel actual en metros (None si no hay lectura)
+        rainfall_2h (float): Precipitación últimas 2 horas (mm)
+        tariff (str): PEAK / VALLEY / STANDARD
+        pump_running (bool): Estado actual de la bomba
+        inlet_pressure (float): Presión de entrada (bar)
+        thresholds (dict): Umbrales; las claves ausentes usan DEFAULT_THRESHOLDS
+
+    Returns:
+        dict: {'should_run', 'reason', 'rule'}
+    """
+    th = resolve_thresholds(thresholds)
+    min_water_level = th['min_water_level']
+    max_water_level = th['max_water_level']
+    min_pressure = th['min_inlet_pressure']
+    max_rain_2h = th['max_rain_2h_for_pumping']
+    has_level = water_level is not None
+
+    # REGLA 1: Nivel crítico bajo (enciende incluso con lluvia moderada)
+    if has_level and water_level < min_water_level * 0.5 and rainfall_2h < 15.0:
+        if inlet_pressure >= min_pressure:
+            return decision(True, RULE_CRITICAL_LEVEL,
+                            f'Nivel crítico ({water_level:.2f}m < {min_water_level*0.5:.2f}m)')
+        return decision(False, RULE_LOW_PRESSURE,
+                        f'Presión insuficiente ({inlet_pressure:.2f} bar < {min_pressure} bar)')
+
+    # REGLA 2: Lluvia fuerte reciente
+    if rainfall_2h > max_rain_2h:
+        return decision(False, RULE_HEAVY_RAIN, f'Lluvia fuerte reciente ({rainfall_2h:.1f}mm en 2h)')
+
+    # REGLA 3: Nivel máximo alcanzado
+    if has_level and water_level > max_water_level:
+        return decision(False, RULE_MAX_LEVEL,
+                        f'Nivel máximo alcanzado ({water_level:.2f}m > {max_water_level:.2f}m)')
+
+    # REGLA 4: Tarifa pico, solo bombear si es urgente
+    if tariff == 'PEAK':
+        if has_level and water_level < min_water_level * 0.7:
+            return decision(True, RULE_PEAK_URGENT,
+                            f'Nivel bajo en tarifa pico ({water_level:.2f}m < {min_water_level*0.7:.2f}m)')
+        level_text = f'{water_level:.2f}m' if has_level else 'sin lectura'
+        return decision(False, RULE_PEAK_WAIT, f'Tarifa PICO - esperar tarifa valle (nivel actual: {level_text})')
+
+    # REGLA 5: Condiciones normales de operación
+    if has_level and water_level < min_water_level and rainfall_2h < 5.0 and inlet_pressure >= min_pressure:
+        return decision(True, RULE_LOW_LEVEL,
+                        f'Nivel bajo ({water_level:.2f}m < {min_water_level:.2f}m), condiciones óptimas')
+
+    # REGLA 6: Mantener estado actual si el nivel es aceptable
+    if has_level and min_water_level <= water_level <= max_water_level:
+        return decision(pump_running, RULE_HOLD, f'Nivel aceptable ({water_level:.2f}m), mantener estado')
+
+    return decision(False, RULE_DEFAULT, 'Condiciones no requieren bombeo')
+
+
+def decision(should_run, rule, reason):
+    return {'should_run': bool(should_run), 'reason': reason, 'rule': RULE_NAMES[rule]}
+
+
+# ---------------------------------------------------------------------
+# Evaluación vectorizada
+# ---------------------------------------------------------------------
+
+def decide_batch(level, rain_2h, tariff, pressure, thresholds=None, initial_running=False):
+    """
+    Mismas reglas que decide() sobre series de tiempo
+
+    La regla 6 (mantener) depende del estado anterior: cada paso queda como
+    ENCENDER, APAGAR o MANTENER y el estado se obtiene propagando hacia
+    adelante el último paso que no es MANTENER (maximum.accumulate).
+
+    Args:
+        level (ndarray): Nivel en metros (NaN = sin lectura)
+        rain_2h (ndarray): Precipitación acumulada 2h (mm)
+        tariff (ndarray): Códigos TARIFF_* por paso
+        pressure (ndarray): Presión de entrada (bar)
+        thresholds (dict): Umbrales
+        initial_running (bool): Estado de la bomba antes del primer paso
+
+    Returns:
+        tuple: (running bool[n], rule int8[n])
+    """
+    th = resolve_thresholds(thresholds)
+    min_level = th['min_water_level']
+    max_level = th['max_water_level']
+    has_pressure = pressure >= th['min_inlet_pressure']
+    peak = tariff == TARIFF_PEAK
+
+    # Comparaciones con NaN son falsas: igual que "water_level is not None"
+    with np.errstate(invalid='ignore'):
+        critical = (level < min_level * 0.5) & (rain_2h < 15.0)
+        conditions = [
+            critical & has_pressure,
+            critical,
+            rain_2h > th['max_rain_2h_for_pumping'],
+            level > max_level,
+            peak & (level < min_level * 0.7),
+            peak,
+            (level < min_level) & (rain_2h < 5.0) & has_pressure,
+            (level >= min_level) & (level <= max_level)
+        ]
+    rules = [RULE_CRITICAL_LEVEL, RULE_LOW_PRESSURE, RULE_HEAVY_RAIN, RULE_MAX_LEVEL,
+             RULE_PEAK_URGENT, RULE_PEAK_WAIT, RULE_LOW_LEVEL, RULE_HOLD]
+    rule = np.select(conditions, rules, default=RULE_DEFAULT).astype(np.int8)
+
+    # 1 = encender, 0 = apagar, -1 = mantener
+    action = np.where(np.isin(rule, (RULE_CRITICAL_LEVEL, RULE_PEAK_URGENT, RULE_LOW_LEVEL)), 1, 0)
+    action = np.where(rule == RULE_HOLD, -1, action).astype(np.int8)
+
+    # Índice del último paso con decisión propia (o -1 = estado inicial)
+    n = len(action)
+    decided = np.where(action >= 0, np.arange(n), -1)
+    last = np.maximum.accumulate(decided) if n else decided
+    running = np.where(last >= 0, action[np.maximum(last, 0)] == 1, bool(initial_running))
+    return running, rule
+
+
+def simulate(history, thresholds=None, power_kw=75.0, initial_running=False):
+    """
+    Reproduce el histórico con una configuración de umbrales
+
+    Args:
+        history (dict): Series de load_history() o construidas a mano:
+                        'level', 'rain_2h', 'tariff', 'pressure', 'step_hours'
+        thresholds (dict): Umbrales a evaluar
+        power_kw (float): Potencia de la bomba en marcha
+
+    Returns:
+        dict: Arranques, paradas, horas de bombeo, kWh (total y en pico), reglas
+    """
+    running, rule = decide_batch(
+        history['level'], history['rain_2h'], history['tariff'], history['pressure'],
+        thresholds, initial_running
+    )
+    previous = np.concatenate(([bool(initial_running)], running[:-1]))
+    step_hours = history['step_hours']
+    pumping_hours = float(running.sum() * step_hours)
+    peak_hours = float((running & (history['tariff'] == TARIFF_PEAK)).sum() * step_hours)
+    counts = np.bincount(rule, minlength=len(RULE_NAMES))
+
+    return {
+        'thresholds': resolve_thresholds(thresholds),
+        'steps': int(len(running)),
+        'starts': int((running & ~previous).sum()),
+        'stops': int((~running & previous).sum()),
+        'pumping_hours': round(pumping_hours, 2),
+        'energy_kwh': round(pumping_hours * power_kw, 1),
+        'peak_kwh': round(peak_hours * power_kw, 1),
+        'rules': {RULE_NAMES[code]: int(count) for code, count in enumerate(counts) if count}
+    }
+
+
+def what_if(history, configurations, power_kw=75.0, initial_running=False):
+    """Evalúa varias configuraciones de umbrales sobre el mismo histórico"""
+    return [simulate(history, config, power_kw, initial_running) for config in configurations]
+
+
+def threshold_grid(grid):
+    """Producto cartesiano {'min_water_level': [0.4, 0.5], ...} -> lista de dicts"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+# ---------------------------------------------------------------------
+# Carga del histórico desde la base de datos
+# ---------------------------------------------------------------------
+
+def load_history(station_id, start, end, step_minutes=15, assumed_pressure=None):
+    """
+    Series regulares de nivel, lluvia 2h, tarifa y presión para una estación
+
+    Requiere contexto de aplicación. Nivel y presión toman la última lectura
+    de cada paso (con arrastre hacia adelante); la lluvia se suma por paso y
+    se acumula en ventanas de 2 horas.
+
+    Args:
+        assumed_pressure (float): Presión para pasos sin telemetría de bomba
+                                  (por defecto 0.0, como el controlador)
+    """
+    from database import db, WaterLevel, MeteorologicalData, PumpTelemetry
+
+    step = np.timedelta64(step_minutes, 'm')
+    origin = np.datetime64(start, 'm')
+    steps = int((np.datetime64(end, 'm') - origin) // step)
+    if steps <= 0:
+        raise ValueError('El rango de fechas no contiene pasos')
+
+    def series(column_time, column_value, key_column, key):
+        rows = db.session.query(column_time, column_value).filter(
+            key_column == key, column_time >= start, column_time < end
+        ).order_by(column_time).all()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        times = np.array([row[0] for row in rows], dtype='datetime64[m]')
+        values = np.array([float(row[1]) if row[1] is not None else np.nan for row in rows])
+        index = ((times - origin) // step).astype(np.int64)
+        keep = (index >= 0) & (index < steps)
+        return index[keep], values[keep]
+
+    level_index, level_values = series(WaterLevel.fecha_hora, WaterLevel.nivel_m, WaterLevel.estacion_id, station_id)
+    rain_index, rain_values = series(MeteorologicalData.fecha_hora, MeteorologicalData.precipitacion_mm,
+                                     MeteorologicalData.estacion_id, station_id)
+    pressure_index, pressure_values = series(PumpTelemetry.fecha_hora, PumpTelemetry.presion_entrada_bar,
+                                             PumpTelemetry.bomba_id, station_id)
+
+    rain_step = np.bincount(rain_index, weights=np.nan_to_num(rain_values), minlength=steps)
+    window = max(1, int(round(120 / step_minutes)))
+    cumulative = np.concatenate(([0.0], np.cumsum(rain_step)))
+    rain_2h = cumulative[1:] - cumulative[np.maximum(np.arange(1, steps + 1) - window, 0)]
+
+    pressure = forward_fill(pressure_index, pressure_values, steps)
+    pressure = np.where(np.isnan(pressure), assumed_pressure or 0.0, pressure)
+
+    hours = ((origin + np.arange(steps) * step).astype('datetime64[h]').astype(np.int64)) % 24
+    return {
+        'station_id': station_id,
+        'start': str(origin),
+        'step_minutes': step_minutes,
+        'step_hours': step_minutes / 60.0,
+        'level': forward_fill(level_index, level_values, steps),
+        'rain_2h': rain_2h,
+        'tariff': HOURLY_TARIFF[hours],
+        'pressure': pressure
+    }
+
+
+def forward_fill(index, values, steps):
+    """Última lectura de cada paso, arrastrada hacia adelante (NaN antes de la primera)"""
+    filled = np.full(steps, np.nan)
+    # Índices ordenados: la última asignación de cada paso es su lectura más reciente
+    filled[index] = values
+    present = ~np.isnan(filled)
+    last = np.maximum.accumulate(np.where(present, np.arange(steps), -1))
+    return np.where(last >= 0, filled[np.maximum(last, 0)], np.nan)
+
+
+def parse_grid(items):
+    grid = {}
+    for item in items or []:
+        key, _, values = item.partition('=')
+        if key not in DEFAULT_THRESHOLDS:
+            raise SystemExit(f"Umbral desconocido '{key}' (use {', '.join(DEFAULT_THRESHOLDS)})")
+        grid[key] = [float(value) for value in values.split(',') if value.strip()]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reproducción what-if de las reglas de control sobre el histórico')
+    parser.add_argument('--station', type=int, default=1, help='Estación / bomba')
+    parser.add_argument('--days', type=int, default=90, help='Días de histórico hacia atrás')
+    parser.add_argument('--step', type=int, default=15, help='Minutos por paso')
+    parser.add_argument('--grid', action='append', metavar='UMBRAL=v1,v2',
+                        help='Valores a evaluar para un umbral (repetible)')
+    parser.add_argument('--power-kw', type=float, default=75.0, help='Potencia de la bomba')
+    parser.add_argument('--assume-pressure', type=float,
+                        help='Presión de entrada si no hay telemetría de bomba')
+    parser.add_argument('--output', help='Archivo JSON con los resultados')
+    args = parser.parse_args()
+
+    from app import app
+
+    end = datetime.now()
+    start = end - timedelta(days=args.days)
+    with app.app_context():
+        t0 = time.perf_counter()
+        history = load_history(args.station, start, end, args.step, args.assume_pressure)
+        load_s = time.perf_counter() - t0
+
+    configurations = threshold_grid(parse_grid(args.grid)) or [{}]
+    t0 = time.perf_counter()
+    results = what_if(history, configurations, args.power_kw)
+    sim_s = time.perf_counter() - t0
+
+    print(f"\n📈 Estación {args.station}: {len(history['level'])} pasos de {args.step} min "
+          f"(carga {load_s:.2f}s, {len(results)} configuraciones en {sim_s:.3f}s)\n")
+    print(f"{'umbrales':<60} {'arranques':>9} {'paradas':>8} {'horas':>8} {'kWh pico':>9}")
+    for result in results:
+        label = ', '.join(f'{key}={value:g}' for key, value in result['thresholds'].items())
+        print(f"{label:<60} {result['starts']:>9} {result['stops']:>8} "
+              f"{result['pumping_hours']:>8.1f} {result['peak_kwh']:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
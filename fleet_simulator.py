@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Simulador de Flota Asíncrono - Generador de Carga para la Ingesta
+Proyecto de grado
+
+Simula miles de sensores virtuales en un solo hilo:
+- Un único event loop asyncio (en lugar de un hilo del SO por sensor)
+- Rueda de temporizadores (hashed timing wheel) para programar las lecturas
+- Reutiliza los modelos de sensores existentes (RioLeonSensor, GateSensor, WaterLevelSensor)
+- Envío asíncrono con aiohttp (o pool de hilos + sesión keep-alive si no está instalado)
+- Lecturas agrupadas hacia /api/data/batch
+
+Uso:
+    python fleet_simulator.py --sensors 5000 --rate 500 --duration 120
+    python fleet_simulator.py --sensors 200 --interval 5 --batch 1 --duration 60
+"""
+
+import sys
+import json
+import time
+import math
+import random
+import asyncio
+import argparse
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from virtual_sensors import SensorConfig, GateSensor, WaterLevelSensor
+from sensores_rio_leon import (
+    SensorChigorodaConfig, FreaticsLevelSensor, RiverLevelSensor,
+    FlowVelocitySensor, GatePositionSensor
+)
+from http_transport import create_session, encode_json, GZIP_REQUESTS
+from db_monitor import percentile
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    Rueda de temporizadores (hashed timing wheel)
+
+    Programar y vencer un temporizador es O(1): cada elemento se guarda en
+    la ranura (tick_objetivo % ranuras); al avanzar un tick solo se revisa
+    una ranura.
+    """
+
+    def __init__(self, tick=0.05, slots=1024):
+        self.tick = tick
+        self.slots = slots
+        self.wheel = [[] for _ in range(slots)]
+        self.current_tick = 0
+        self.size = 0
+
+    def schedule(self, delay, item):
+        """Programa un elemento para dentro de 'delay' segundos"""
+        target = self.current_tick + max(1, int(math.ceil(delay / self.tick)))
+        self.wheel[target % self.slots].append((target, item))
+        self.size += 1
+
+    def advance(self):
+        """Avanza un tick y retorna los elementos vencidos"""
+        self.current_tick += 1
+        index = self.current_tick % self.slots
+        bucket = self.wheel[index]
+        if not bucket:
+            return []
+
+        due = [item for target, item in bucket if target <= self.current_tick]
+        if len(due) == len(bucket):
+            self.wheel[index] = []
+        else:
+            # Elementos de vueltas futuras permanecen en la ranura
+            self.wheel[index] = [entry for entry in bucket if entry[0] > self.current_tick]
+        self.size -= len(due)
+        return due
+
+
+# Mezcla de sensores de la flota: (tipo, clase, rango)
+SENSOR_MIX = [
+    ('freatic_level', FreaticsLevelSensor, (0.5, 6.0)),
+    ('river_level', RiverLevelSensor, (0.2, 8.0)),
+    ('flow', FlowVelocitySensor, (0.1, 4.5)),
+    ('gate', GatePositionSensor, (0.0, 100.0)),
+    ('gate', GateSensor, (0.0, 100.0)),
+    ('water_level', WaterLevelSensor, (0.5, 3.0)),
+]
+
+
+def create_sensor(index, sensor_type, sensor_class, value_range, station_id, interval):
+    """Crea un sensor usando la configuración de su familia"""
+    sensor_id = 10000 + index
+    if issubclass(sensor_class, (GateSensor, WaterLevelSensor)):
+        config = SensorConfig(
+            sensor_id=sensor_id, sensor_type=sensor_type,
+            name=f'Flota {sensor_type} {sensor_id}', location=f'Estación {station_id}',
+            min_value=value_range[0], max_value=value_range[1],
+            update_interval=interval
+        )
+    else:
+        config = SensorChigorodaConfig(
+            sensor_id=sensor_id, sensor_type=sensor_type,
+            name=f'Flota {sensor_type} {sensor_id}', location=f'Estación {station_id}',
+            station_id=station_id, coordinates={'lat': 7.6652, 'lon': -76.6841},
+            min_value=value_range[0], max_value=value_range[1], precision=0.01,
+            unit='%' if sensor_type == 'gate' else 'metros', update_interval=interval
+        )
+    return sensor_class(config)
+
+
+class FleetSimulator:
+    """Motor asíncrono que simula una flota completa de sensores"""
+
+    def __init__(self, api_base, sensors=1000, interval=10.0, stations=20, batch_size=100,
+                 concurrency=16, tick=0.05, gzip_body=GZIP_REQUESTS, max_queue=100000, seed=None):
+        self.api_base = api_base.rstrip('/')
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.gzip_body = gzip_body
+        self.max_queue = max_queue
+        self.wheel = TimerWheel(tick=tick)
+        self.rng = random.Random(seed)
+        if seed is not None:
+            random.seed(seed)
+
+        # Último valor conocido por estación: cada lectura envía el estado completo
+        self.station_state = {
+            station_id: {'apertura': 50.0, 'nivel': 2.0, 'caudal': None}
+            for station_id in range(1, stations + 1)
+        }
+
+        self.fleet = []
+        for i in range(sensors):
+            sensor_type, sensor_class, value_range = SENSOR_MIX[i % len(SENSOR_MIX)]
+            station_id = i % stations + 1
+            sensor = create_sensor(i, sensor_type, sensor_class, value_range, station_id, interval)
+            self.fleet.append((sensor, station_id))
+
+        self.stats = {
+            'generated': 0, 'sent': 0, 'failed': 0, 'dropped': 0, 'requests': 0,
+            'latencies_ms': [], 'timer_lag_ms': []
+        }
+
+    def build_payload(self, sensor, station_id):
+        """Actualiza el estado de la estación con la lectura y arma el payload"""
+        state = self.station_state[station_id]
+        value = float(sensor.current_value)
+        sensor_type = sensor.config.sensor_type
+
+        if sensor_type == 'gate':
+            state['apertura'] = round(max(0.0, min(100.0, value)), 2)
+        elif sensor_type == 'flow':
+            state['caudal'] = round(value, 4)
+        else:
+            state['nivel'] = round(value, 3)
+
+        return {
+            'estacion_id': station_id,
+            'apertura_porcentaje': state['apertura'],
+            'nivel_m': state['nivel'],
+            'caudal_m3s': state['caudal'],
+            'fecha_hora': datetime.now().isoformat(),
+            'dispositivo_origen': f'flota_{sensor_type}_{sensor.config.sensor_id}'
+        }
+
+    async def _scheduler(self, queue, deadline):
+        """Avanza la rueda de temporizadores y genera las lecturas vencidas"""
+        loop = asyncio.get_running_loop()
+        tick = self.wheel.tick
+
+        # Fase inicial aleatoria para repartir la carga
+        for entry in self.fleet:
+            self.wheel.schedule(self.rng.uniform(0, self.interval), entry)
+
+        start = loop.time()
+        while loop.time() < deadline:
+            next_tick_at = start + (self.wheel.current_tick + 1) * tick
+            delay = next_tick_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Si el loop se atrasó, ponerse al día tick por tick
+            elapsed_ticks = int((loop.time() - start) / tick)
+            while self.wheel.current_tick < elapsed_ticks:
+                lag_ms = (loop.time() - (start + (self.wheel.current_tick + 1) * tick)) * 1000
+                due = self.wheel.advance()
+                if due:
+                    self.stats['timer_lag_ms'].append(lag_ms)
+
+                for sensor, station_id in due:
+                    sensor.update_value()
+                    payload = self.build_payload(sensor, station_id)
+                    self.stats['generated'] += 1
+                    try:
+                        queue.put_nowait(payload)
+                    except asyncio.QueueFull:
+                        self.stats['dropped'] += 1
+                    self.wheel.schedule(self.interval, (sensor, station_id))
+
+    async def _sender(self, queue, post):
+        """Toma lecturas de la cola y las envía en lotes"""
+        while True:
+            payload = await queue.get()
+            if payload is None:
+                queue.task_done()
+                return
+
+            batch = [payload]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    extra = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if extra is None:
+                    stop = True
+                    queue.task_done()
+                    break
+                batch.append(extra)
+
+            if self.batch_size > 1:
+                url, body = f"{self.api_base}/api/data/batch", {'records': batch}
+            else:
+                url, body = f"{self.api_base}/api/data", batch[0]
+
+            started = time.perf_counter()
+            try:
+                status = await post(url, body)
+                ok = status < 400
+            except Exception as e:
+                logger.debug(f"Error de envío: {e}")
+                ok = False
+            self.stats['latencies_ms'].append((time.perf_counter() - started) * 1000)
+            self.stats['requests'] += 1
+            self.stats['sent' if ok else 'failed'] += len(batch)
+
+            for _ in batch:
+                queue.task_done()
+            if stop:
+                return
+
+    async def _progress(self, started, deadline):
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            await asyncio.sleep(5)
+            elapsed = time.time() - started
+            print(f"[{elapsed:6.1f}s] generadas={self.stats['generated']} enviadas={self.stats['sent']} "
+                  f"fallidas={self.stats['failed']} descartadas={self.stats['dropped']} "
+                  f"tasa={self.stats['sent'] / elapsed:.1f}/s")
+
+    async def run(self, duration):
+        """Ejecuta la simulación durante 'duration' segundos"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        started = time.time()
+        deadline = loop.time() + duration
+
+        if AIOHTTP_AVAILABLE:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            timeout = aiohttp.ClientTimeout(total=30)
+            client = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+            async def post(url, body):
+                data, headers = encode_json(body, self.gzip_body)
+                async with client.post(url, data=data, headers=headers) as response:
+                    await response.read()
+                    return response.status
+        else:
+            # Respaldo sin aiohttp: sesión keep-alive en un pool de hilos
+            client = None
+            session = create_session(pool_maxsize=self.concurrency)
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+            def blocking_post(url, body):
+                data, headers = encode_json(body, self.gzip_body)
+                return session.post(url, data=data, headers=headers, timeout=30).status_code
+
+            async def post(url, body):
+                return await loop.run_in_executor(executor, blocking_post, url, body)
+
+        senders = [asyncio.create_task(self._sender(queue, post)) for _ in range(self.concurrency)]
+        progress = asyncio.create_task(self._progress(started, deadline))
+
+        try:
+            await self._scheduler(queue, deadline)
+            # Drenar lo pendiente y detener los emisores
+            for _ in senders:
+                await queue.put(None)
+            await asyncio.gather(*senders)
+        finally:
+            progress.cancel()
+            if client is not None:
+                await client.close()
+            else:
+                executor.shutdown(wait=False)
+
+        return self.report(time.time() - started)
+
+    def report(self, elapsed):
+        """Resumen de la corrida"""
+        latencies = self.stats['latencies_ms']
+        lags = self.stats['timer_lag_ms']
+        return {
+            'sensors': len(self.fleet),
+            'interval_s': self.interval,
+            'duration_s': round(elapsed, 2),
+            'transport': 'aiohttp' if AIOHTTP_AVAILABLE else 'threads',
+            'batch_size': self.batch_size,
+            'generated': self.stats['generated'],
+            'sent': self.stats['sent'],
+            'failed': self.stats['failed'],
+            'dropped': self.stats['dropped'],
+            'requests': self.stats['requests'],
+            'throughput_per_s': round(self.stats['sent'] / elapsed, 1) if elapsed else 0,
+            'request_latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(max(latencies), 2) if latencies else 0.0
+            },
+            'timer_lag_ms': {
+                'p99': round(percentile(lags, 99), 2),
+                'max': round(max(lags), 2) if lags else 0.0
+            }
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulador de flota asíncrono (generador de carga)')
+    parser.add_argument('--api', default='http://localhost:9000', help='URL base de la API')
+    parser.add_argument('--sensors', type=int, default=1000, help='Número de sensores de la flota')
+    parser.add_argument('--rate', type=float, help='Lecturas por segundo de toda la flota (define el intervalo)')
+    parser.add_argument('--interval', type=float, default=10.0, help='Segundos entre lecturas de cada sensor')
+    parser.add_argument('--duration', type=float, default=60.0, help='Duración de la prueba en segundos')
+    parser.add_argument('--stations', type=int, default=20, help='Estaciones entre las que se reparte la flota')
+    parser.add_argument('--batch', type=int, default=100, help='Lecturas por petición (1 = /api/data individual)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Peticiones HTTP simultáneas')
+    parser.add_argument('--seed', type=int, help='Semilla aleatoria (corridas reproducibles)')
+    parser.add_argument('--json', action='store_true', help='Imprimir solo el reporte JSON')
+    args = parser.parse_args()
+
+    interval = args.sensors / args.rate if args.rate else args.interval
+
+    if not args.json:
+        print("=" * 70)
+        print("SIMULADOR DE FLOTA ASÍNCRONO - GENERADOR DE CARGA")
+        print(f"API: {args.api} | Sensores: {args.sensors} | Intervalo: {interval:.2f}s "
+              f"(~{args.sensors / interval:.0f} lecturas/s)")
+        print(f"Duración: {args.duration}s | Lote: {args.batch} | Concurrencia: {args.concurrency} | "
+              f"Transporte: {'aiohttp' if AIOHTTP_AVAILABLE else 'hilos + requests'}")
+        print("=" * 70)
+
+    simulator = FleetSimulator(
+        args.api, sensors=args.sensors, interval=interval, stations=args.stations,
+        batch_size=args.batch, concurrency=args.concurrency, seed=args.seed
+    )
+
+    try:
+        report = asyncio.run(simulator.run(args.duration))
+    except KeyboardInterrupt:
+        print("\nSimulación interrumpida")
+        sys.exit(1)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Transporte HTTP Compartido - Simuladores y Servidor
+Proyecto de grado
+
+Capa común para todos los clientes que envían telemetría a la API:
+- Sesiones requests con pool de conexiones keep-alive (una conexión TCP
+  reutilizada en lugar de una nueva por muestra)
+- Cuerpos JSON comprimidos con gzip (opcional, solo si superan un tamaño mínimo)
+- Micro-lotes por tamaño/tiempo para drivers de alto volumen
+
+Lado servidor:
+- GzipRequestMiddleware descomprime cuerpos 'Content-Encoding: gzip' antes de Flask
+
+Variables de entorno:
+    HTTP_POOL_SIZE   Conexiones por host en el pool (default 32)
+    HTTP_GZIP        'true' para comprimir cuerpos grandes (default false)
+"""
+
+import os
+import io
+import gzip
+import json
+import zlib
+import time
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+GZIP_REQUESTS = os.getenv('HTTP_GZIP', 'false').lower() == 'true'
+# Por debajo de este tamaño la compresión no compensa
+GZIP_MIN_BYTES = 1024
+
+
+# =====================================================================
+# CLIENTE
+# =====================================================================
+
+def create_session(pool_maxsize=DEFAULT_POOL_SIZE, pool_connections=4):
+    """
+    Crea una sesión HTTP con pool de conexiones persistentes
+
+    Args:
+        pool_maxsize (int): Conexiones reutilizables por host
+        pool_connections (int): Hosts distintos en caché
+    """
+    session = requests.Session()
+    # pool_block=True: si todas las conexiones están ocupadas se espera en
+    # lugar de abrir conexiones descartables (evita agotar puertos efímeros)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': 'estacion-bombeo-simulador/1.0'})
+    return session
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name='default', pool_maxsize=DEFAULT_POOL_SIZE):
+    """Retorna la sesión compartida del proceso (se crea la primera vez)"""
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = create_session(pool_maxsize=pool_maxsize)
+            _sessions[name] = session
+        return session
+
+
+def encode_json(body, gzip_body=GZIP_REQUESTS, min_bytes=GZIP_MIN_BYTES):
+    """
+    Serializa un cuerpo JSON, comprimiéndolo si corresponde
+
+    Returns:
+        tuple: (bytes del cuerpo, cabeceras HTTP)
+    """
+    data = json.dumps(body, separators=(',', ':'), default=str).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+
+    if gzip_body and len(data) >= min_bytes:
+        data = gzip.compress(data, compresslevel=5)
+        headers['Content-Encoding'] = 'gzip'
+
+    return data, headers
+
+
+def post_json(session, url, body, timeout=10, gzip_body=GZIP_REQUESTS):
+    """POST de un cuerpo JSON usando la sesión indicada"""
+    data, headers = encode_json(body, gzip_body)
+    return session.post(url, data=data, headers=headers, timeout=timeout)
+
+
+class MicroBatcher:
+    """
+    Agrupa elementos y los entrega en lotes
+
+    Un lote se envía cuando alcanza max_items o cuando el elemento más
+    antiguo lleva max_delay segundos esperando, lo que ocurra primero.
+    flush_fn recibe la lista de elementos; si lanza una excepción el lote
+    se descarta y se contabiliza (para entrega garantizada usar store_forward).
+    """
+
+    def __init__(self, flush_fn, max_items=100, max_delay=1.0, max_pending=10000):
+        self.flush_fn = flush_fn
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+        self._items = []
+        self._first_at = None
+        self._cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.stats = {'items': 0, 'batches': 0, 'dropped': 0, 'errors': 0}
+
+    def add(self, item):
+        """Agrega un elemento al lote en curso"""
+        with self._cond:
+            if len(self._items) >= self.max_pending:
+                # Cola llena: se descarta el más antiguo
+                self._items.pop(0)
+                self.stats['dropped'] += 1
+            if not self._items:
+                self._first_at = time.monotonic()
+            self._items.append(item)
+            if len(self._items) >= self.max_items:
+                self._cond.notify()
+
+    def start(self):
+        """Inicia el hilo de envío"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Envía lo pendiente y detiene el hilo"""
+        if not self.running:
+            return
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self.thread.join(timeout=10)
+        self.flush()
+
+    def flush(self):
+        """Envía inmediatamente todo lo acumulado, en lotes de max_items"""
+        while True:
+            with self._cond:
+                if not self._items:
+                    return
+                batch = self._take()
+            self._deliver(batch)
+
+    def _take(self):
+        batch = self._items[:self.max_items]
+        del self._items[:self.max_items]
+        self._first_at = time.monotonic() if self._items else None
+        return batch
+
+    def _deliver(self, batch):
+        if not batch:
+            return
+        try:
+            self.flush_fn(batch)
+            self.stats['items'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"Lote de {len(batch)} elementos no enviado: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running:
+                    if len(self._items) >= self.max_items:
+                        break
+                    if self._first_at is not None:
+                        remaining = self.max_delay - (time.monotonic() - self._first_at)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if not self.running:
+                    return
+                batch = self._take()
+            self._deliver(batch)
+
+
+class BatchPoster(MicroBatcher):
+    """MicroBatcher que publica cada lote como {"records": [...]} en un endpoint de lote"""
+
+    def __init__(self, url, session=None, timeout=10, gzip_body=GZIP_REQUESTS, **kwargs):
+        super().__init__(self._post, **kwargs)
+        self.url = url
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.gzip_body = gzip_body
+
+    def _post(self, batch):
+        response = post_json(self.session, self.url, {'records': batch}, self.timeout, self.gzip_body)
+        if response.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {response.status_code}")
+
+
+# =====================================================================
+# SERVIDOR
+# =====================================================================
+
+class GzipRequestMiddleware:
+    """
+    Middleware WSGI: descomprime cuerpos con 'Content-Encoding: gzip'
+
+    Limita el tamaño descomprimido para evitar bombas de compresión.
+    """
+
+    def __init__(self, wsgi_app, max_size=16 * 1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').lower() != 'gzip':
+            return self.wsgi_app(environ, start_response)
+
+        length = environ.get('CONTENT_LENGTH')
+        stream = environ['wsgi.input']
+        raw = stream.read(int(length)) if length else stream.read()
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(raw, self.max_size + 1)
+        except zlib.error:
+            return self._error(start_response, '400 BAD REQUEST', 'Cuerpo gzip inválido')
+
+        if len(data) > self.max_size or decompressor.unconsumed_tail:
+            return self._error(start_response, '413 REQUEST ENTITY TOO LARGE', 'Cuerpo descomprimido demasiado grande')
+
+        environ['wsgi.input'] = io.BytesIO(data)
+        environ['CONTENT_LENGTH'] = str(len(data))
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+    @staticmethod
+    def _error(start_response, status, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
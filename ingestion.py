@@ -0,0 +1,264 @@
+"""
+Ingesta de Telemetría - Normalización y Escritura
+Proyecto de grado
+
+Funciones compartidas por los endpoints de recepción de datos:
+- Normalización de payloads de compuerta/nivel, meteorología y bomba (español e inglés)
+- Escritura de filas: executemany en MySQL o hilo escritor único en SQLite
+- Compresión opcional por señal antes de escribir (signal_compression.py)
+- Copia opcional en segmentos columnares (segment_store.py)
+- Registros de tramas binarias compactas (binary_protocol.py)
+"""
+
+from datetime import datetime
+from database import db, GateStatus, WaterLevel, MeteorologicalData, PumpTelemetry
+from sqlite_local import get_local_writer
+from binary_protocol import SCHEMA_METEO, SCHEMA_PUMP, SCHEMA_GATE
+from signal_compression import ingest_compressor
+from segment_store import segment_store
+from latest_values import latest_values
+
+
+def parse_timestamp(raw):
+    """Convierte una fecha ISO (con o sin 'Z') a datetime; None retorna la hora actual"""
+    if not raw:
+        return datetime.now()
+    return datetime.fromisoformat(str(raw).replace('Z', '+00:00'))
+
+
+def gate_state(apertura):
+    """Estado de compuerta derivado del porcentaje de apertura"""
+    apertura = float(apertura)
+    return 'MOVING' if 0 < apertura < 100 else 'OPEN' if apertura == 100 else 'CLOSE'
+
+
+def parse_gate_payload(data):
+    """
+    Normaliza un payload de compuerta + nivel de agua
+
+    Acepta payloads en español (simulador) e inglés (clientes antiguos).
+
+    Args:
+        data (dict): Payload recibido
+
+    Returns:
+        tuple: (fila iot_estado_compuerta, fila iot_nivel_agua) como dicts
+
+    Raises:
+        ValueError: Si faltan campos requeridos
+    """
+    station_id = data.get('estacion_id') or data.get('station_id') or data.get('gate_id')
+    numero_compuerta = data.get('numero_compuerta') or data.get('gate_number') or 1
+    apertura = data.get('apertura_porcentaje')
+    if apertura is None:
+        apertura = data.get('position_percent')
+    if apertura is None:
+        apertura = data.get('gate_position_percent')
+
+    nivel = data.get('nivel_m')
+    if nivel is None:
+        nivel = data.get('level_m')
+
+    caudal = data.get('caudal_m3s')
+    if caudal is None:
+        caudal = data.get('flow_m3s')
+
+    if station_id is None or apertura is None or nivel is None:
+        raise ValueError('Missing required fields')
+
+    fecha_hora = parse_timestamp(data.get('fecha_hora') or data.get('timestamp'))
+
+    estado = data.get('estado') or gate_state(apertura)
+
+    dispositivo = data.get('dispositivo_origen') or data.get('source_device') or 'unknown'
+
+    gate_row = {
+        'estacion_id': int(station_id),
+        'numero_compuerta': int(numero_compuerta),
+        'estado': estado,
+        'apertura_porcentaje': apertura,
+        'caudal_m3s': caudal,
+        'valor_sensor_posicion': apertura,
+        'fecha_hora': fecha_hora,
+        'dispositivo_origen': dispositivo
+    }
+
+    level_row = {
+        'estacion_id': int(station_id),
+        'nivel_m': nivel,
+        'volumen_m3': data.get('volumen_m3'),
+        'tendencia': data.get('tendencia'),
+        'fecha_hora': fecha_hora,
+        'dispositivo_origen': dispositivo
+    }
+
+    return gate_row, level_row
+
+
+def parse_meteorology_payload(data):
+    """
+    Normaliza un payload meteorológico (mismos valores por defecto que POST /api/meteorology)
+
+    Returns:
+        dict: Fila de iot_datos_meteorologicos
+
+    Raises:
+        ValueError: Si falta estacion_id
+    """
+    station_id = data.get('estacion_id') or data.get('station_id')
+    if station_id is None:
+        raise ValueError('Missing estacion_id')
+
+    def first(*keys, default=None):
+        for key in keys:
+            if data.get(key) is not None:
+                return data[key]
+        return default
+
+    return {
+        'estacion_id': int(station_id),
+        'precipitacion_mm': first('precipitacion_mm', 'precipitation_mm', default=0.0),
+        'velocidad_viento_kmh': first('velocidad_viento_kmh', 'wind_speed_kmh', default=0.0),
+        'direccion_viento_grados': first('direccion_viento_grados', 'wind_direction_deg', default=0),
+        'temperatura_c': first('temperatura_c', 'temperature_c'),
+        'humedad_porcentaje': first('humedad_porcentaje', 'humidity_percent'),
+        'presion_atmosferica_hpa': first('presion_atmosferica_hpa', 'pressure_hpa'),
+        'radiacion_solar_wm2': first('radiacion_solar_wm2', 'solar_radiation_wm2'),
+        'fecha_hora': parse_timestamp(first('fecha_hora', 'timestamp')),
+        'dispositivo_origen': first('dispositivo_origen', 'source_device')
+    }
+
+
+def parse_pump_payload(data):
+    """
+    Normaliza un payload de telemetría de bomba (mismos valores por defecto que POST /api/pump/telemetry)
+
+    Returns:
+        dict: Fila de iot_telemetria_bomba
+
+    Raises:
+        ValueError: Si falta bomba_id
+    """
+    pump_id = data.get('bomba_id') or data.get('pump_id')
+    if pump_id is None:
+        raise ValueError('Missing bomba_id')
+
+    estado = data.get('estado')
+    if estado is None and 'is_running' in data:
+        estado = 'ENCENDIDO' if data['is_running'] else 'APAGADO'
+
+    return {
+        'bomba_id': int(pump_id),
+        'estado': estado or 'APAGADO',
+        'caudal_m3h': data.get('caudal_m3h', data.get('flow_rate_m3h', 0.0)),
+        'presion_entrada_bar': data.get('presion_entrada_bar', data.get('inlet_pressure_bar', 0.0)),
+        'presion_salida_bar': data.get('presion_salida_bar', data.get('outlet_pressure_bar', 0.0)),
+        'consumo_energia_kw': data.get('consumo_energia_kw', data.get('power_consumption_kwh', 0.0)),
+        'temperatura_motor_c': data.get('temperatura_motor_c', data.get('motor_temperature_c')),
+        'nivel_vibracion': data.get('nivel_vibracion'),
+        'horas_operacion': data.get('horas_operacion', data.get('running_hours', 0.0)),
+        'modo_operacion': data.get('modo_operacion', 'AUTO'),
+        'fecha_hora': parse_timestamp(data.get('fecha_hora') or data.get('timestamp')),
+        'dispositivo_origen': data.get('dispositivo_origen') or data.get('source_device')
+    }
+
+
+def write_rows(groups):
+    """
+    Inserta filas en bloque
+
+    En modo SQLite las filas se encolan al escritor único; en MySQL se
+    insertan con executemany y un solo commit. Con INGEST_COMPRESSION_ENABLED
+    solo se escriben las filas que la compresión por señal decide guardar.
+    Con SEGMENT_STORE_ENABLED las mismas filas se anexan al almacén de segmentos.
+
+    Args:
+        groups (list): Lista de tuplas (Modelo, [filas como dict])
+    """
+    if ingest_compressor.enabled:
+        # Actualiza los últimos valores con todas las muestras antes de descartar
+        groups = ingest_compressor.compress_groups(groups)
+    elif latest_values.shared is not None:
+        latest_values.update_groups(groups)
+    groups = [(model, rows) for model, rows in groups if rows]
+    if not groups:
+        return
+
+    writer = get_local_writer()
+    if writer is not None:
+        for model, rows in groups:
+            writer.submit(model.__table__, rows)
+    else:
+        for model, rows in groups:
+            db.session.execute(model.__table__.insert(), rows)
+        db.session.commit()
+
+    if segment_store.enabled:
+        segment_store.append_groups(groups)
+
+
+def store_gate_readings(payloads):
+    """
+    Normaliza y guarda una lista de lecturas de compuerta/nivel
+
+    Returns:
+        int: Número de lecturas guardadas
+    """
+    gate_rows = []
+    level_rows = []
+    for data in payloads:
+        gate_row, level_row = parse_gate_payload(data)
+        gate_rows.append(gate_row)
+        level_rows.append(level_row)
+
+    write_rows([(GateStatus, gate_rows), (WaterLevel, level_rows)])
+    return len(gate_rows)
+
+
+def binary_row_groups(schema_id, rows):
+    """
+    Agrupa los registros decodificados de una trama binaria por tabla
+
+    Returns:
+        list: [(Modelo, filas)] listo para write_rows
+    """
+    if schema_id == SCHEMA_METEO:
+        return [(MeteorologicalData, rows)]
+    if schema_id == SCHEMA_PUMP:
+        return [(PumpTelemetry, rows)]
+    if schema_id == SCHEMA_GATE:
+        gate_rows = [{
+            'estacion_id': row['estacion_id'],
+            'numero_compuerta': row['numero_compuerta'] or 1,
+            'estado': gate_state(row['apertura_porcentaje']),
+            'apertura_porcentaje': row['apertura_porcentaje'],
+            'caudal_m3s': row['caudal_m3s'],
+            'valor_sensor_posicion': row['apertura_porcentaje'],
+            'fecha_hora': row['fecha_hora'],
+            'dispositivo_origen': row['dispositivo_origen']
+        } for row in rows]
+        # Mismas claves que parse_gate_payload: executemany exige filas homogéneas
+        level_rows = [{
+            'estacion_id': row['estacion_id'],
+            'nivel_m': row['nivel_m'],
+            'volumen_m3': None,
+            'tendencia': None,
+            'fecha_hora': row['fecha_hora'],
+            'dispositivo_origen': row['dispositivo_origen']
+        } for row in rows]
+        return [(GateStatus, gate_rows), (WaterLevel, level_rows)]
+    raise ValueError(f'Esquema desconocido: {schema_id}')
+
+
+def store_binary_rows(schema_id, rows):
+    """
+    Guarda registros decodificados de una trama binaria (binary_protocol.py)
+
+    Los registros ya traen nombres de columna y fecha_hora: se escriben sin
+    pasar por la normalización de payloads JSON.
+
+    Returns:
+        int: Número de registros guardados
+    """
+    write_rows(binary_row_groups(schema_id, rows))
+    return len(rows)
@@ -148,6 +148,7 @@ CREATE TABLE IF NOT EXISTS iot_alerta_sistema (
     FOREIGN KEY (bomba_id) REFERENCES iot_estacion_bombeo (id) ON DELETE SET NULL,
     INDEX idx_alerta_severidad_fecha (severidad, fecha_hora DESC),
     INDEX idx_alerta_resuelto (esta_resuelto, fecha_hora DESC),
+    INDEX idx_alerta_estacion_resuelto_fecha (estacion_id, esta_resuelto, fecha_hora DESC),
     INDEX idx_alerta_tipo (tipo_alerta)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Alertas generadas por el sistema';
 
@@ -188,6 +189,48 @@ CREATE TABLE IF NOT EXISTS iot_log_control_automatico (
     INDEX idx_log_control_fecha (fecha_hora DESC)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Registro de decisiones del sistema de control automático';
 
+-- Tabla: Tiempos por Fase del Control Automático (una fila por evaluación)
+CREATE TABLE IF NOT EXISTS iot_tiempo_control (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    estacion_id INT NOT NULL,
+    accion VARCHAR(20),
+    total_ms DECIMAL(10,3) NOT NULL,
+    nivel_ms DECIMAL(10,3),
+    lluvia_2h_ms DECIMAL(10,3),
+    lluvia_24h_ms DECIMAL(10,3),
+    estado_bomba_ms DECIMAL(10,3),
+    umbrales_ms DECIMAL(10,3),
+    decision_ms DECIMAL(10,3),
+    persistencia_ms DECIMAL(10,3),
+    alerta_ms DECIMAL(10,3),
+    fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_tiempo_control_estacion_fecha (estacion_id, fecha_hora DESC),
+    INDEX idx_tiempo_control_fecha (fecha_hora DESC)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Perfil de latencia del control automático por fase';
+
+-- Tabla: Comandos a Actuadores (cola por bomba con confirmación ACK)
+CREATE TABLE IF NOT EXISTS iot_comando_actuador (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    estacion_id INT,
+    bomba_id INT NOT NULL,
+    log_control_id INT,
+    comando VARCHAR(20) NOT NULL,
+    origen VARCHAR(20) NOT NULL DEFAULT 'AUTO',
+    estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+    canal VARCHAR(10),
+    intentos INT DEFAULT 0,
+    fecha_decision DATETIME(3) NOT NULL,
+    fecha_envio DATETIME(3),
+    fecha_confirmacion DATETIME(3),
+    fecha_expiracion DATETIME(3) NOT NULL,
+    latencia_ms INT,
+    mensaje_error TEXT,
+    FOREIGN KEY (log_control_id) REFERENCES iot_log_control_automatico (id) ON DELETE SET NULL,
+    INDEX idx_comando_bomba_estado (bomba_id, estado, id),
+    INDEX idx_comando_estado_expiracion (estado, fecha_expiracion),
+    INDEX idx_comando_fecha (fecha_decision DESC)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Comandos enviados a bombas: cola, confirmación y latencia de actuación';
+
 -- Tabla: Contactos para Notificaciones
 CREATE TABLE IF NOT EXISTS iot_contacto_notificacion (
     id INT AUTO_INCREMENT PRIMARY KEY,
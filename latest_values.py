@@ -0,0 +1,381 @@
+"""
+Caché de Últimos Valores por Estación
+Proyecto de grado
+
+Con la compresión de series en la ingesta (signal_compression.py) la última
+muestra recibida puede no estar todavía en la base: el algoritmo retiene el
+punto más reciente hasta saber si es necesario guardarlo. Esta caché recibe
+TODAS las muestras antes de comprimir, así el estado actual del dashboard y
+el control automático no se atrasan.
+
+Claves: (tabla, estacion_id) con la última fila recibida (dict con las
+columnas y fecha_hora). Para compuertas la clave es la estación (última
+compuerta que reportó).
+
+Dos almacenamientos:
+- En memoria del proceso (por defecto). Con varios workers cada uno tiene
+  su copia, y solo ve lo que él mismo recibió.
+- Tabla compartida (LATEST_VALUES_SHARED): archivo de tamaño fijo mapeado
+  con mmap (en /dev/shm si existe) que leen todos los workers. Un slot por
+  (estación, señal) con valor, fecha_hora y calidad, protegido con seqlock:
+  el escritor pone el contador en impar, escribe y lo deja en par; el
+  lector reintenta si lo ve impar o si cambió durante la lectura. Los
+  escritores se excluyen con flock; los lectores no toman ningún bloqueo.
+
+Uso:
+    latest_values.update('iot_nivel_agua', 1, fila)
+    latest_values.get('iot_nivel_agua', 1)      # dict o None
+    newest(fila_db, 'iot_nivel_agua', 1)        # la más reciente entre base y caché (atributos)
+    current('iot_nivel_agua', 1, repository.latest_water_level)
+"""
+
+import os
+import math
+import mmap
+import zlib
+import struct
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import String
+from database import GateStatus, WaterLevel, MeteorologicalData, PumpTelemetry
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+# Tabla -> columna que identifica la estación en la fila
+STATION_COLUMNS = {
+    'iot_estado_compuerta': 'estacion_id',
+    'iot_nivel_agua': 'estacion_id',
+    'iot_datos_meteorologicos': 'estacion_id',
+    'iot_telemetria_bomba': 'bomba_id',
+}
+
+# Columnas que no son señales
+NON_SIGNAL_COLUMNS = {'id', 'fecha_hora', 'dispositivo_origen'}
+
+# Calidad de cada señal en la tabla compartida
+QUALITY_GOOD = 0        # valor presente en la última muestra
+QUALITY_MISSING = 1     # la última muestra no traía la señal
+QUALITY_INVALID = 2     # valor no numérico en una señal numérica
+QUALITY_NAMES = {QUALITY_GOOD: 'GOOD', QUALITY_MISSING: 'MISSING', QUALITY_INVALID: 'INVALID'}
+
+EPOCH = datetime(1970, 1, 1)
+
+MAGIC = b'LVT1'
+HEADER = struct.Struct('<4sIII')        # magic, estaciones, señales, crc del esquema
+# seq, estación, señal, calidad, es_texto, fecha_hora (µs), valor, texto
+SLOT = struct.Struct('<IiHBBqd16s4x')
+SEQ = struct.Struct('<I')
+SEQLOCK_RETRIES = 100
+
+
+def table_signals(model):
+    """[(columna, es_texto)] de un modelo en orden de definición"""
+    station_column = STATION_COLUMNS[model.__tablename__]
+    return [(attr.key, isinstance(attr.columns[0].type, String))
+            for attr in model.__mapper__.column_attrs
+            if attr.key not in NON_SIGNAL_COLUMNS and attr.key != station_column]
+
+
+# Señales de la tabla compartida: el orden fija la posición de cada slot
+SIGNALS = [(model.__tablename__, name, is_text)
+           for model in (GateStatus, WaterLevel, MeteorologicalData, PumpTelemetry)
+           for name, is_text in table_signals(model)]
+SIGNAL_INDEX = {(table, name): index for index, (table, name, _) in enumerate(SIGNALS)}
+TABLE_SIGNALS = {table: [(index, name, is_text) for index, (signal_table, name, is_text) in enumerate(SIGNALS)
+                         if signal_table == table]
+                 for table in STATION_COLUMNS}
+
+
+def to_micros(when):
+    return int((when.replace(tzinfo=None) - EPOCH) / timedelta(microseconds=1))
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class SharedLatestTable:
+    """Últimos valores por (estación, señal) en un archivo mmap compartido entre procesos"""
+
+    def __init__(self, path, max_stations=256):
+        """
+        Args:
+            path (str): Archivo de la tabla (se crea o se reinicia si el esquema cambió)
+            max_stations (int): Estaciones 0..max_stations-1 (las demás no se guardan)
+        """
+        self.path = path
+        self.max_stations = max_stations
+        self.layout_crc = zlib.crc32(repr(SIGNALS).encode('utf-8'))
+        self.size = HEADER.size + max_stations * len(SIGNALS) * SLOT.size
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        with self._writer_lock():
+            if not self._valid_header():
+                self._file.truncate(0)
+                self._file.write(HEADER.pack(MAGIC, max_stations, len(SIGNALS), self.layout_crc))
+                self._file.truncate(self.size)
+                self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+
+    def _valid_header(self):
+        self._file.seek(0)
+        raw = self._file.read(HEADER.size)
+        return (len(raw) == HEADER.size and os.fstat(self._file.fileno()).st_size == self.size
+                and HEADER.unpack(raw) == (MAGIC, self.max_stations, len(SIGNALS), self.layout_crc))
+
+    def _writer_lock(self):
+        return _FileLock(self._file, self._lock)
+
+    def _offset(self, station_id, signal_index):
+        return HEADER.size + (station_id * len(SIGNALS) + signal_index) * SLOT.size
+
+    # --- escritura ---
+
+    def update_rows(self, table, rows):
+        """Escribe las filas de una tabla; una fila anterior a la guardada no la reemplaza"""
+        signals = TABLE_SIGNALS.get(table)
+        if not signals:
+            return
+        station_column = STATION_COLUMNS[table]
+        with self._writer_lock():
+            for row in rows:
+                station_id = row.get(station_column)
+                if station_id is None or row.get('fecha_hora') is None:
+                    continue
+                station_id = int(station_id)
+                if not 0 <= station_id < self.max_stations:
+                    continue
+                micros = to_micros(row['fecha_hora'])
+                current = SLOT.unpack_from(self._map, self._offset(station_id, signals[0][0]))
+                if current[0] and current[5] > micros:
+                    continue
+                for index, name, is_text in signals:
+                    self._write_slot(self._offset(station_id, index), station_id, index, micros,
+                                     row.get(name), is_text)
+
+    def _write_slot(self, offset, station_id, index, micros, value, is_text):
+        text = b''
+        number = math.nan
+        quality = QUALITY_GOOD
+        if value is None:
+            quality = QUALITY_MISSING
+        elif is_text:
+            text = str(value).encode('utf-8')[:16]
+        else:
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                quality = QUALITY_INVALID
+
+        seq = SEQ.unpack_from(self._map, offset)[0]
+        # Impar: escritura en curso (si ya era impar, un escritor anterior se interrumpió)
+        seq = (seq + (1 if seq % 2 == 0 else 2)) & 0xFFFFFFFF
+        SEQ.pack_into(self._map, offset, seq)
+        SLOT.pack_into(self._map, offset, seq, station_id, index, quality, is_text, micros, number, text)
+        # Par y distinto de 0 (0 = slot nunca escrito)
+        SEQ.pack_into(self._map, offset, ((seq + 1) & 0xFFFFFFFF) or 2)
+
+    def clear(self):
+        with self._writer_lock():
+            self._map[HEADER.size:] = bytes(self.size - HEADER.size)
+
+    # --- lectura (sin bloqueo) ---
+
+    def _read_slot(self, offset):
+        for _ in range(SEQLOCK_RETRIES):
+            seq = SEQ.unpack_from(self._map, offset)[0]
+            if seq % 2:
+                continue
+            fields = SLOT.unpack_from(self._map, offset)
+            if fields[0] == seq and SEQ.unpack_from(self._map, offset)[0] == seq:
+                return fields
+        return None
+
+    def get_signal(self, table, station_id, signal):
+        """
+        Última lectura de una señal
+
+        Returns:
+            tuple: (valor, fecha_hora, calidad) o None si no hay datos
+        """
+        index = SIGNAL_INDEX.get((table, signal))
+        if index is None or not 0 <= station_id < self.max_stations:
+            return None
+        fields = self._read_slot(self._offset(station_id, index))
+        if fields is None or not fields[0]:
+            return None
+        return self._value(fields), from_micros(fields[5]), fields[3]
+
+    def get(self, table, station_id):
+        """
+        Última fila de una estación (todas las señales de la misma muestra)
+
+        Returns:
+            dict: Columnas, columna de estación y fecha_hora; None si no hay datos
+                  o una escritura concurrente no terminó a tiempo
+        """
+        signals = TABLE_SIGNALS.get(table)
+        if not signals or not 0 <= station_id < self.max_stations:
+            return None
+        for _ in range(SEQLOCK_RETRIES):
+            slots = [self._read_slot(self._offset(station_id, index)) for index, _, _ in signals]
+            if any(fields is None for fields in slots):
+                continue
+            if any(not fields[0] for fields in slots):
+                return None
+            # Todas las señales de una fila llevan su fecha_hora: distinta = fila a medio escribir
+            micros = slots[0][5]
+            if all(fields[5] == micros for fields in slots):
+                row = {name: self._value(fields) for (_, name, _), fields in zip(signals, slots)}
+                row[STATION_COLUMNS[table]] = station_id
+                row['fecha_hora'] = from_micros(micros)
+                return row
+        return None
+
+    @staticmethod
+    def _value(fields):
+        if fields[3] != QUALITY_GOOD:
+            return None
+        if fields[4]:
+            return fields[7].rstrip(b'\0').decode('utf-8', 'replace')
+        return fields[6]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class _FileLock:
+    """Exclusión entre escritores: hilo (Lock) y proceso (flock, si existe)"""
+
+    def __init__(self, file, lock):
+        self.file = file
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        if FCNTL_AVAILABLE:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if FCNTL_AVAILABLE:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.lock.release()
+
+
+class LatestValueCache:
+    """Última fila recibida por (tabla, estación): en el proceso o en la tabla compartida"""
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+        self.shared = None
+
+    def init_app(self, app):
+        if app.config.get('LATEST_VALUES_SHARED', False):
+            self.attach(app.config['LATEST_VALUES_PATH'], app.config.get('LATEST_VALUES_MAX_STATIONS', 256))
+
+    def attach(self, path, max_stations=256):
+        """Usa la tabla compartida en `path` (todos los procesos deben usar el mismo archivo)"""
+        if self.shared is None:
+            self.shared = SharedLatestTable(path, max_stations)
+        return self.shared
+
+    def update(self, table, station_id, row):
+        """Guarda la fila si es más reciente que la actual (las tardías no retroceden el valor)"""
+        if self.shared is not None:
+            self.shared.update_rows(table, [row])
+            return
+        key = (table, station_id)
+        row = dict(row)
+        if row['fecha_hora'].tzinfo is not None:
+            # Como al guardar en DateTime sin zona: se conserva la hora tal cual llegó
+            row['fecha_hora'] = row['fecha_hora'].replace(tzinfo=None)
+        with self._lock:
+            current = self._rows.get(key)
+            if current is None or row['fecha_hora'] >= current['fecha_hora']:
+                self._rows[key] = row
+
+    def update_rows(self, table, rows):
+        """Registra un lote de filas de una tabla"""
+        column = STATION_COLUMNS.get(table)
+        if column is None:
+            return
+        if self.shared is not None:
+            self.shared.update_rows(table, rows)
+            return
+        for row in rows:
+            if row.get(column) is not None and row.get('fecha_hora') is not None:
+                self.update(table, int(row[column]), row)
+
+    def update_groups(self, groups):
+        """Registra [(Modelo, filas)] (mismo formato que ingestion.write_rows)"""
+        for model, rows in groups:
+            self.update_rows(model.__tablename__, rows)
+
+    def update_record(self, record):
+        """Registra un objeto ORM recién guardado (endpoints que insertan de a una fila)"""
+        row = {attr.key: getattr(record, attr.key) for attr in record.__mapper__.column_attrs}
+        self.update_rows(record.__tablename__, [row])
+
+    def get(self, table, station_id):
+        if self.shared is not None:
+            return self.shared.get(table, station_id)
+        with self._lock:
+            row = self._rows.get((table, station_id))
+        return dict(row) if row is not None else None
+
+    def clear(self):
+        if self.shared is not None:
+            self.shared.clear()
+        with self._lock:
+            self._rows.clear()
+
+
+def newest(db_row, table, station_id):
+    """
+    La lectura más reciente entre la base y la caché
+
+    Args:
+        db_row: Objeto ORM de la base (o None)
+        table (str): Nombre de la tabla
+        station_id (int): Estación
+
+    Returns:
+        Objeto con las columnas como atributos (fila ORM o SimpleNamespace de la caché), o None
+    """
+    cached = latest_values.get(table, station_id)
+    if cached is None:
+        return db_row
+    if db_row is None or cached['fecha_hora'] > db_row.fecha_hora:
+        return SimpleNamespace(**cached)
+    return db_row
+
+
+def current(table, station_id, query):
+    """
+    Lectura actual de una estación
+
+    Con la tabla compartida se responde desde ella sin consultar la base; la
+    base solo se consulta si la estación todavía no tiene datos en la tabla.
+    Sin tabla compartida, como newest().
+
+    Args:
+        query (callable): Función(station_id) que retorna la última fila de la base
+    """
+    if latest_values.shared is not None:
+        cached = latest_values.get(table, station_id)
+        if cached is not None:
+            return SimpleNamespace(**cached)
+    return newest(query(station_id), table, station_id)
+
+
+# Instancia global de la caché de últimos valores
+latest_values = LatestValueCache()
@@ -0,0 +1,235 @@
+"""
+Métricas por Petición - Formato Prometheus
+Proyecto de grado
+
+Registra, sin dependencias externas (no requiere prometheus_client):
+- Latencia por ruta (histograma) y peticiones por código de estado
+- Tamaño del cuerpo de petición y de respuesta por ruta
+- Número de consultas SQL y tiempo en base de datos por petición
+  (medidos por db_monitor, que entrega la duración de cada consulta)
+
+Las rutas se etiquetan con la regla de Flask (/api/alerts/<int:alert_id>/resolve)
+y no con la URL concreta, para que el número de series no crezca sin límite.
+
+Los datos se exponen en GET /metrics (formato de texto de Prometheus 0.0.4).
+"""
+
+import time
+import threading
+from flask import g, request, has_request_context
+
+
+# Límites superiores de los buckets (segundos / bytes / consultas)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos (no es thread-safe por sí solo)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        """Líneas _bucket/_sum/_count en formato Prometheus"""
+        lines = []
+        cumulative = 0
+        for upper, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{format_labels(labels, le=format_value(upper))} {cumulative}')
+        lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} {self.total}')
+        lines.append(f'{name}_sum{format_labels(labels)} {format_value(self.sum)}')
+        lines.append(f'{name}_count{format_labels(labels)} {self.total}')
+        return lines
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in items) + '}'
+
+
+class RequestMetrics:
+    """Recolector de métricas HTTP y de base de datos por ruta"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.requests = {}           # (method, route, status) -> contador
+        self.latency = {}            # (method, route) -> Histogram (s)
+        self.request_bytes = {}      # (method, route) -> Histogram
+        self.response_bytes = {}     # (method, route) -> Histogram
+        self.db_time = {}            # (method, route) -> Histogram (s)
+        self.db_queries = {}         # (method, route) -> Histogram
+        self.in_flight = 0
+        self.db_monitor = None
+        self.enabled = True
+
+    def init_app(self, app, db_monitor=None):
+        """Registra hooks de Flask y se suscribe a las consultas medidas por db_monitor"""
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.db_monitor = db_monitor
+        if not self.enabled:
+            return
+
+        # Sin db_monitor no hay medición de consultas (db_time/db_queries en 0)
+        if db_monitor is not None:
+            db_monitor.add_statement_listener(self._on_statement)
+
+        @app.before_request
+        def start_request_timer():
+            g.metrics_start = time.perf_counter()
+            g.metrics_db_queries = 0
+            g.metrics_db_seconds = 0.0
+            g.metrics_in_flight = True
+            with self._lock:
+                self.in_flight += 1
+
+        @app.after_request
+        def record_request(response):
+            self._record(response)
+            return response
+
+        @app.teardown_request
+        def finish_request(exc):
+            # teardown se ejecuta siempre, incluso si after_request no llegó a correr
+            if g.pop('metrics_in_flight', False):
+                with self._lock:
+                    self.in_flight = max(0, self.in_flight - 1)
+
+    # ------------------------------------------------------------------
+    # Consultas medidas por db_monitor (solo se atribuyen las hechas dentro de una petición)
+    # ------------------------------------------------------------------
+
+    def _on_statement(self, statement, parameters, duration_ms):
+        # El escritor SQLite y los hilos de fondo no tienen contexto de petición
+        if has_request_context() and 'metrics_start' in g:
+            g.metrics_db_queries += 1
+            g.metrics_db_seconds += duration_ms / 1000
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    def _record(self, response):
+        start = g.get('metrics_start')
+        if start is None:
+            return
+
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else '<sin_ruta>'
+        key = (request.method, route)
+        request_size = request.content_length or 0
+        response_size = response.calculate_content_length() or 0
+
+        with self._lock:
+            status_key = (request.method, route, str(response.status_code))
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self._histogram(self.latency, key, LATENCY_BUCKETS).observe(elapsed)
+            self._histogram(self.request_bytes, key, SIZE_BUCKETS).observe(request_size)
+            self._histogram(self.response_bytes, key, SIZE_BUCKETS).observe(response_size)
+            self._histogram(self.db_time, key, LATENCY_BUCKETS).observe(g.metrics_db_seconds)
+            self._histogram(self.db_queries, key, QUERY_COUNT_BUCKETS).observe(g.metrics_db_queries)
+
+        # Evita contar dos veces si Flask procesa la respuesta de error tras un fallo
+        g.metrics_start = None
+
+    @staticmethod
+    def _histogram(store, key, buckets):
+        histogram = store.get(key)
+        if histogram is None:
+            histogram = store[key] = Histogram(buckets)
+        return histogram
+
+    # ------------------------------------------------------------------
+    # Exposición
+    # ------------------------------------------------------------------
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus"""
+        lines = []
+
+        def histogram_family(name, help_text, store):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (method, route), histogram in sorted(store.items()):
+                lines.extend(histogram.render(name, {'method': method, 'route': route}))
+
+        with self._lock:
+            lines.append('# HELP http_requests_total Peticiones HTTP por ruta y código de estado')
+            lines.append('# TYPE http_requests_total counter')
+            for (method, route, status), count in sorted(self.requests.items()):
+                labels = format_labels({'method': method, 'route': route, 'status': status})
+                lines.append(f'http_requests_total{labels} {count}')
+
+            histogram_family('http_request_duration_seconds', 'Latencia de la petición', self.latency)
+            histogram_family('http_request_size_bytes', 'Tamaño del cuerpo de la petición', self.request_bytes)
+            histogram_family('http_response_size_bytes', 'Tamaño del cuerpo de la respuesta', self.response_bytes)
+            histogram_family('http_request_db_seconds', 'Tiempo en consultas SQL por petición', self.db_time)
+            histogram_family('http_request_db_queries', 'Consultas SQL por petición', self.db_queries)
+
+            lines.append('# HELP http_requests_in_flight Peticiones en curso')
+            lines.append('# TYPE http_requests_in_flight gauge')
+            lines.append(f'http_requests_in_flight {self.in_flight}')
+
+        lines.append('# HELP process_uptime_seconds Segundos desde el arranque del proceso')
+        lines.append('# TYPE process_uptime_seconds gauge')
+        lines.append(f'process_uptime_seconds {format_value(time.time() - self.started_at)}')
+
+        if self.db_monitor is not None:
+            lines.extend(self._render_db_monitor())
+
+        return '\n'.join(lines) + '\n'
+
+    def _render_db_monitor(self):
+        """Estado del pool y contadores de db_monitor como métricas"""
+        stats = self.db_monitor.get_stats()
+        lines = []
+
+        def metric(name, metric_type, help_text, value):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name} {format_value(value)}')
+
+        metric('db_queries_total', 'counter', 'Consultas SQL ejecutadas', stats['queries']['total'])
+        metric('db_slow_queries_total', 'counter', 'Consultas SQL lentas', stats['queries']['slow'])
+        metric('db_connections_opened_total', 'counter', 'Conexiones nuevas', stats['connections']['opened'])
+        metric('db_connections_invalidated_total', 'counter', 'Conexiones invalidadas',
+               stats['connections']['invalidated'])
+        metric('db_checkout_timeouts_total', 'counter', 'Timeouts al obtener conexión del pool',
+               stats['connections']['checkout_timeouts'])
+        metric('db_checkout_wait_p95_ms', 'gauge', 'Espera p95 por conexión del pool (ms)',
+               stats['checkout_wait_ms']['p95'])
+
+        pool = stats.get('pool', {})
+        for name in ('size', 'checkedout', 'checkedin', 'overflow'):
+            if name in pool:
+                metric(f'db_pool_{name}', 'gauge', f'Pool de conexiones: {name}', pool[name])
+        return lines
+
+
+# Instancia global de métricas
+request_metrics = RequestMetrics()
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Puente MQTT → Base de Datos con Escrituras por Lotes
+Proyecto de grado
+
+Alternativa a HTTP petición-por-muestra para flotas grandes:
+- Se suscribe a tópicos por estación y tipo de medición:
+      estacion/<estacion_id>/compuerta   JSON (mismos alias que POST /api/data)
+      estacion/<estacion_id>/meteo       JSON (mismos campos que POST /api/meteorology)
+      estacion/<estacion_id>/bomba       JSON (mismos campos que POST /api/pump/telemetry)
+      estacion/<estacion_id>/bin         trama binaria (binary_protocol.py)
+  Un mensaje JSON puede ser un objeto o una lista de objetos.
+- Normaliza con las mismas funciones de ingestion.py que usa la API
+- Acumula filas por tabla y las inserta con executemany (por tamaño o por tiempo)
+- Compresión por señal opcional (--compress, signal_compression.py): cada
+  consumidor comprime las estaciones de su partición
+- Copia columnar opcional (--segments, segment_store.py) de lo escrito
+- Con LATEST_VALUES_SHARED actualiza la tabla de últimos valores que leen
+  los workers de la API (latest_values.py)
+- Varios consumidores en paralelo:
+      --shared ingesta   suscripción compartida ($share/ingesta/...), el broker reparte
+      --partition 0/4    partición estática por estacion_id (brokers sin $share)
+
+La lógica de mensajes (handle_message/flush) no depende del broker: se puede
+probar sin red o contra un Mosquitto local de pruebas.
+
+Entrega: el mensaje se confirma al broker al recibirlo. Lo que esté en el
+búfer sin escribir (como máximo --batch filas o --flush segundos) se pierde si
+el proceso muere; para entrega garantizada usar HTTP con store_forward.py.
+
+Uso:
+    python mqtt_bridge.py --broker localhost --batch 500 --flush 1.0
+    python mqtt_bridge.py --shared ingesta          (lanzar N procesos)
+    python mqtt_bridge.py --partition 2/4
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from sqlalchemy import create_engine
+from database import GateStatus, WaterLevel, MeteorologicalData, PumpTelemetry
+from ingestion import parse_gate_payload, parse_meteorology_payload, parse_pump_payload, binary_row_groups
+from binary_protocol import decode_frame
+from signal_compression import IngestCompressor, DEFAULT_SIGNALS, merge_signals
+from segment_store import SegmentStore
+from latest_values import latest_values
+
+try:
+    import paho.mqtt.client as mqtt
+    MQTT_AVAILABLE = True
+except ImportError:
+    mqtt = None
+    MQTT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TOPIC_PREFIX = 'estacion'
+MEASUREMENT_KINDS = ('compuerta', 'meteo', 'bomba', 'bin')
+
+
+class MQTTIngestBridge:
+    """Consumidor MQTT que normaliza lecturas y las escribe por lotes"""
+
+    def __init__(self, db_uri=None, broker='localhost', port=1883, topic_prefix=TOPIC_PREFIX,
+                 shared_group=None, partition=0, partitions=1, batch_size=500, flush_interval=1.0,
+                 qos=1, client_id=None, username=None, password=None, writer=None, max_pending=100000,
+                 compressor=None, segments=None):
+        """
+        Args:
+            db_uri (str): Base de datos destino (por defecto config.py)
+            shared_group (str): Grupo de suscripción compartida MQTT ($share/<grupo>/...)
+            partition (int): Partición estática de este consumidor (0..partitions-1)
+            partitions (int): Número total de particiones estáticas
+            batch_size (int): Filas acumuladas que disparan una escritura
+            flush_interval (float): Segundos máximos entre escrituras
+            writer (callable): Función(groups) que escribe [(Modelo, filas)];
+                               por defecto executemany sobre db_uri
+            max_pending (int): Filas máximas retenidas si la base no responde
+            compressor (IngestCompressor): Compresión por señal antes del búfer (None = todas las filas)
+            segments (SegmentStore): Almacén de segmentos al que se anexa cada lote escrito
+        """
+        if partitions < 1 or not 0 <= partition < partitions:
+            raise ValueError('Partición inválida')
+
+        self.broker = broker
+        self.port = port
+        self.topic_prefix = topic_prefix
+        self.shared_group = shared_group
+        self.partition = partition
+        self.partitions = partitions
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.qos = qos
+        self.client_id = client_id or f'puente-ingesta-{partition}'
+        self.username = username
+        self.password = password
+
+        self.engine = None
+        if writer is None:
+            if db_uri is None:
+                import config
+                db_uri = config.SQLALCHEMY_DATABASE_URI
+            self.engine = create_engine(db_uri, pool_pre_ping=True)
+            writer = self.write_groups
+        self.writer = writer
+        self.compressor = compressor
+        self.segments = segments
+
+        self._lock = threading.Lock()
+        self._buffers = {}       # Modelo -> [filas]
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._flusher = None
+        self.client = None
+
+        self.stats = {
+            'messages': 0,
+            'rows': 0,
+            'skipped_partition': 0,
+            'invalid': 0,
+            'flushes': 0,
+            'write_errors': 0,
+            'dropped': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Procesamiento de mensajes (independiente del broker)
+    # ------------------------------------------------------------------
+
+    def subscription(self):
+        """Filtro de suscripción (compartido si hay grupo)"""
+        topic = f'{self.topic_prefix}/+/+'
+        if self.shared_group:
+            return f'$share/{self.shared_group}/{topic}'
+        return topic
+
+    def owns_station(self, station_id):
+        return self.partitions == 1 or station_id % self.partitions == self.partition
+
+    def handle_message(self, topic, payload):
+        """
+        Normaliza un mensaje y lo agrega al búfer
+
+        Returns:
+            int: Filas agregadas (0 si el mensaje se descartó)
+        """
+        self.stats['messages'] += 1
+        parts = topic.split('/')
+        if len(parts) != 3 or parts[0] != self.topic_prefix or parts[2] not in MEASUREMENT_KINDS:
+            self.stats['invalid'] += 1
+            logger.warning(f"Tópico no reconocido: {topic}")
+            return 0
+
+        _, station, kind = parts
+        try:
+            station_id = int(station)
+        except ValueError:
+            self.stats['invalid'] += 1
+            logger.warning(f"Estación inválida en tópico: {topic}")
+            return 0
+
+        if not self.owns_station(station_id):
+            self.stats['skipped_partition'] += 1
+            return 0
+
+        try:
+            groups = self.parse(station_id, kind, payload)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            self.stats['invalid'] += 1
+            logger.warning(f"Mensaje descartado en {topic}: {e}")
+            return 0
+
+        if self.compressor is not None:
+            groups = self.compressor.compress_groups(groups)
+        elif latest_values.shared is not None:
+            latest_values.update_groups(groups)
+
+        added = 0
+        with self._lock:
+            incoming = sum(len(rows) for _, rows in groups)
+            if self._pending + incoming > self.max_pending:
+                self.stats['dropped'] += incoming
+                logger.error(f"Búfer lleno ({self._pending} filas): mensaje de {topic} descartado")
+                return 0
+            for model, rows in groups:
+                if rows:
+                    self._buffers.setdefault(model, []).extend(rows)
+                    added += len(rows)
+            self._pending += added
+            # Tras un error de escritura se espera flush_interval antes de reintentar
+            should_flush = self._pending >= self.batch_size and time.monotonic() >= self._retry_at
+
+        if should_flush:
+            self.flush()
+        return added
+
+    def parse(self, station_id, kind, payload):
+        """Convierte el payload en [(Modelo, filas)]"""
+        if kind == 'bin':
+            schema_id, rows = decode_frame(bytes(payload))
+            return binary_row_groups(schema_id, rows)
+
+        data = json.loads(payload)
+        items = data if isinstance(data, list) else [data]
+
+        if kind == 'compuerta':
+            gate_rows, level_rows = [], []
+            for item in items:
+                item.setdefault('estacion_id', station_id)
+                gate_row, level_row = parse_gate_payload(item)
+                gate_rows.append(gate_row)
+                level_rows.append(level_row)
+            return [(GateStatus, gate_rows), (WaterLevel, level_rows)]
+
+        if kind == 'meteo':
+            for item in items:
+                item.setdefault('estacion_id', station_id)
+            return [(MeteorologicalData, [parse_meteorology_payload(item) for item in items])]
+
+        # bomba: el tópico lleva el id de estación/bomba
+        for item in items:
+            item.setdefault('bomba_id', station_id)
+        return [(PumpTelemetry, [parse_pump_payload(item) for item in items])]
+
+    def flush(self):
+        """Escribe todo lo acumulado en un solo lote por tabla"""
+        if self.compressor is not None:
+            # Estaciones que dejaron de reportar: su última muestra retenida se guarda
+            self._buffer_groups(self.compressor.release_idle())
+        with self._lock:
+            if not self._pending:
+                self._last_flush = time.monotonic()
+                return 0
+            groups = list(self._buffers.items())
+            pending = self._pending
+            self._buffers = {}
+            self._pending = 0
+            self._last_flush = time.monotonic()
+
+        try:
+            self.writer(groups)
+        except Exception as e:
+            self.stats['write_errors'] += 1
+            logger.error(f"Error escribiendo lote de {pending} filas: {e}")
+            with self._lock:
+                self._retry_at = time.monotonic() + self.flush_interval
+                if self._pending + pending > self.max_pending:
+                    # Base caída demasiado tiempo: se descarta el lote más antiguo
+                    self.stats['dropped'] += pending
+                    logger.error(f"Búfer lleno: {pending} filas descartadas")
+                else:
+                    # Reencolar al frente para el siguiente intento
+                    for model, rows in groups:
+                        self._buffers[model] = rows + self._buffers.get(model, [])
+                    self._pending += pending
+            return 0
+
+        if self.segments is not None:
+            self.segments.append_groups(groups)
+        self.stats['flushes'] += 1
+        self.stats['rows'] += pending
+        return pending
+
+    def _buffer_groups(self, groups):
+        """Agrega filas al búfer sin disparar escritura"""
+        with self._lock:
+            for model, rows in groups:
+                self._buffers.setdefault(model, []).extend(rows)
+                self._pending += len(rows)
+
+    def write_groups(self, groups):
+        """Escritor por defecto: executemany por tabla en una sola transacción"""
+        with self.engine.begin() as conn:
+            for model, rows in groups:
+                conn.execute(model.__table__.insert(), rows)
+
+    # ------------------------------------------------------------------
+    # Conexión al broker
+    # ------------------------------------------------------------------
+
+    def _flush_loop(self):
+        while not self._stop.wait(min(self.flush_interval, 0.5)):
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        if rc != 0:
+            logger.error(f"Conexión MQTT rechazada (rc={rc})")
+            return
+        topic = self.subscription()
+        client.subscribe(topic, qos=self.qos)
+        logger.info(f"Suscrito a {topic} (partición {self.partition}/{self.partitions})")
+
+    def _on_message(self, client, userdata, message):
+        self.handle_message(message.topic, message.payload)
+
+    def _on_disconnect(self, client, userdata, *args):
+        logger.warning("Desconectado del broker MQTT; paho reintentará la conexión")
+
+    def create_client(self):
+        if not MQTT_AVAILABLE:
+            raise RuntimeError('paho-mqtt no está instalado (pip install paho-mqtt)')
+
+        # paho-mqtt 2.x exige la versión del API de callbacks
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=self.client_id,
+                                 clean_session=not self.shared_group)
+        else:
+            client = mqtt.Client(client_id=self.client_id, clean_session=not self.shared_group)
+
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+        client.on_disconnect = self._on_disconnect
+        client.reconnect_delay_set(min_delay=1, max_delay=60)
+        return client
+
+    def start(self):
+        """Conecta al broker y procesa mensajes en segundo plano"""
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+        self.client = self.create_client()
+        self.client.connect(self.broker, self.port, keepalive=30)
+        self.client.loop_start()
+
+    def stop(self):
+        """Detiene el consumo y escribe lo pendiente"""
+        self._stop.set()
+        if self.client is not None:
+            self.client.loop_stop()
+            self.client.disconnect()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        if self.compressor is not None:
+            self._buffer_groups(self.compressor.drain())
+        self.flush()
+        if self.segments is not None:
+            self.segments.close()
+        if self.engine is not None:
+            self.engine.dispose()
+
+    def run_forever(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(10)
+                logger.info(f"Mensajes {self.stats['messages']:,} | filas {self.stats['rows']:,} | "
+                            f"inválidos {self.stats['invalid']} | errores {self.stats['write_errors']}")
+                if self.compressor is not None:
+                    logger.info(f"Compresión por señal: {self.compressor.ratio()} muestras por fila guardada")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Puente MQTT → base de datos (escrituras por lotes)')
+    parser.add_argument('--broker', default='localhost', help='Host del broker MQTT')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--prefix', default=TOPIC_PREFIX, help='Prefijo de tópicos')
+    parser.add_argument('--shared', help='Grupo de suscripción compartida ($share/<grupo>/...)')
+    parser.add_argument('--partition', default='0/1', help='Partición estática i/n por estacion_id')
+    parser.add_argument('--batch', type=int, default=500, help='Filas por escritura')
+    parser.add_argument('--flush', type=float, default=1.0, help='Segundos máximos entre escrituras')
+    parser.add_argument('--qos', type=int, choices=[0, 1], default=1)
+    parser.add_argument('--db-uri', help='URI de base de datos (por defecto config.py)')
+    parser.add_argument('--compress', action='store_true',
+                        help='Compresión por señal (banda muerta + puerta oscilante) antes de escribir')
+    parser.add_argument('--segments', action='store_true',
+                        help='Anexar también al almacén de segmentos (SEGMENT_STORE_DIR)')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    partition, partitions = (int(x) for x in args.partition.split('/'))
+
+    import config
+    compressor = None
+    if args.compress:
+        compressor = IngestCompressor(signals=merge_signals(DEFAULT_SIGNALS, config.INGEST_COMPRESSION_SIGNALS),
+                                      max_interval_s=config.INGEST_COMPRESSION_MAX_INTERVAL_S)
+    if config.LATEST_VALUES_SHARED:
+        latest_values.attach(config.LATEST_VALUES_PATH, config.LATEST_VALUES_MAX_STATIONS)
+    segments = None
+    if args.segments:
+        segments = SegmentStore(root=config.SEGMENT_STORE_DIR, points_per_segment=config.SEGMENT_POINTS)
+
+    bridge = MQTTIngestBridge(
+        db_uri=args.db_uri, broker=args.broker, port=args.port, topic_prefix=args.prefix,
+        shared_group=args.shared, partition=partition, partitions=partitions,
+        batch_size=args.batch, flush_interval=args.flush, qos=args.qos,
+        username=args.username, password=args.password, compressor=compressor,
+        segments=segments
+    )
+    print(f"📡 Puente MQTT {args.broker}:{args.port} → {bridge.subscription()} | "
+          f"partición {partition}/{partitions} | lotes de {args.batch} o cada {args.flush}s")
+    bridge.run_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Paginación por Cursor (keyset) sobre (fecha_hora, id)
+Proyecto de grado
+
+En lugar de OFFSET (que recorre y descarta todas las filas anteriores), cada
+página continúa desde la última fila entregada:
+
+    WHERE fecha_hora >= :t AND (fecha_hora > :t OR id > :id)
+    ORDER BY fecha_hora, id
+    LIMIT :limit + 1
+
+El costo de una página es O(limit) a cualquier profundidad, usando los índices
+(estacion_id, fecha_hora) existentes (InnoDB agrega el id a cada índice
+secundario). La fila extra indica si hay más páginas.
+
+El cursor es opaco para el cliente: base64 de "<fecha_hora ISO>|<id>".
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """Cursor de paginación malformado"""
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f'{timestamp.isoformat()}|{row_id}'.encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devuelve (fecha_hora, id) o lanza InvalidCursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode('ascii').split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f'Cursor inválido: {cursor}') from e
+
+
+def page_limit(requested, default, maximum):
+    """Límite de página acotado a [1, maximum]"""
+    if requested is None:
+        return default
+    return max(1, min(requested, maximum))
+
+
+def keyset_page(query, model, after=None, limit=100, descending=False):
+    """
+    Aplica orden, cursor y límite a una consulta sobre un modelo con fecha_hora e id
+
+    Args:
+        query: Consulta con los filtros del endpoint (sin order_by)
+        model: Modelo con columnas fecha_hora e id
+        after (str): Cursor devuelto por la página anterior
+        limit (int): Filas por página
+        descending (bool): Más recientes primero
+
+    Returns:
+        tuple: (filas, next_cursor o None si es la última página)
+    """
+    time_column, id_column = model.fecha_hora, model.id
+
+    if after:
+        timestamp, row_id = decode_cursor(after)
+        if descending:
+            query = query.filter(
+                time_column <= timestamp,
+                (time_column < timestamp) | (id_column < row_id)
+            )
+        else:
+            query = query.filter(
+                time_column >= timestamp,
+                (time_column > timestamp) | (id_column > row_id)
+            )
+
+    if descending:
+        query = query.order_by(time_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(time_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.fecha_hora, last.id)
@@ -0,0 +1,210 @@
+"""
+Guardia de Consultas SQL - Detección de N+1 y Presupuestos por Endpoint
+Proyecto de grado
+
+Modo de instrumentación para desarrollo y pruebas (desactivado en producción):
+- Registra las consultas SQL ejecutadas en cada petición
+- Marca sentencias idénticas repetidas (mismo SQL y mismos parámetros)
+- Detecta patrones N+1 (mismo SQL repetido con parámetros distintos)
+- Aplica presupuestos de consultas por ruta (QUERY_BUDGETS)
+
+Modos (QUERY_GUARD_MODE):
+- 'off':   sin instrumentación (por defecto)
+- 'log':   advierte en el log y añade la cabecera X-Query-Count
+- 'raise': además lanza QueryBudgetExceeded al superar el presupuesto
+           (con app.testing la excepción llega a la prueba)
+
+Uso fuera de una petición (scripts, pruebas del ciclo de control):
+    with query_guard.track(budget=20) as tracker:
+        run_automatic_control_cycle()
+    print(tracker.count, tracker.report())
+"""
+
+import logging
+import threading
+import contextlib
+from collections import Counter
+from flask import g, request, has_request_context
+
+logger = logging.getLogger(__name__)
+
+GUARD_MODES = ('off', 'log', 'raise')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Una ruta o bloque ejecutó más consultas SQL que su presupuesto"""
+
+
+class QueryTracker:
+    """Consultas SQL registradas en una petición o bloque track()"""
+
+    def __init__(self, label, budget=None):
+        self.label = label
+        self.budget = budget
+        self.statements = []     # (sql, parámetros, duración ms)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def total_ms(self):
+        return sum(duration for _, _, duration in self.statements)
+
+    def add(self, statement, parameters, duration_ms):
+        self.statements.append((statement, freeze_parameters(parameters), duration_ms))
+
+    def duplicates(self):
+        """Sentencias idénticas (SQL + parámetros) ejecutadas más de una vez"""
+        counts = Counter((sql, params) for sql, params, _ in self.statements)
+        return [(sql, times) for (sql, _), times in counts.items() if times > 1]
+
+    def repeated_statements(self, threshold):
+        """Mismo SQL repetido >= threshold veces con cualquier parámetro (patrón N+1)"""
+        counts = Counter(sql for sql, _, _ in self.statements)
+        return [(sql, times) for sql, times in counts.items() if times >= threshold]
+
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def report(self, repeat_threshold=3):
+        return {
+            'label': self.label,
+            'queries': self.count,
+            'budget': self.budget,
+            'total_ms': round(self.total_ms, 3),
+            'duplicates': [{'statement': sql[:300], 'times': times} for sql, times in self.duplicates()],
+            'repeated': [{'statement': sql[:300], 'times': times}
+                         for sql, times in self.repeated_statements(repeat_threshold)]
+        }
+
+
+def freeze_parameters(parameters):
+    """Parámetros hasheables para comparar sentencias idénticas"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return tuple(sorted((key, repr(value)) for key, value in parameters.items()))
+    if isinstance(parameters, (list, tuple)):
+        return tuple(freeze_parameters(item) if isinstance(item, (dict, list, tuple)) else repr(item)
+                     for item in parameters)
+    return repr(parameters)
+
+
+class QueryGuard:
+    """Instrumentación de consultas por petición con presupuestos por ruta"""
+
+    def __init__(self):
+        self.mode = 'off'
+        self.budgets = {}
+        self.default_budget = None
+        self.repeat_threshold = 3
+        self._local = threading.local()
+        self._listening = False
+        self.db_monitor = None
+
+    def init_app(self, app, db_monitor):
+        """Se suscribe a las consultas de db_monitor y registra hooks de Flask si el modo no es 'off'"""
+        self.mode = app.config.get('QUERY_GUARD_MODE', 'off')
+        if self.mode not in GUARD_MODES:
+            raise ValueError(f"QUERY_GUARD_MODE debe ser uno de {GUARD_MODES}, no '{self.mode}'")
+        self.budgets = dict(app.config.get('QUERY_BUDGETS', {}))
+        self.default_budget = app.config.get('QUERY_GUARD_DEFAULT_BUDGET')
+        self.repeat_threshold = app.config.get('QUERY_GUARD_REPEAT_THRESHOLD', self.repeat_threshold)
+
+        self.db_monitor = db_monitor
+
+        # En modo 'off' no se suscribe nada: track() lo hace bajo demanda
+        if self.mode == 'off':
+            return
+        self.listen()
+
+        @app.before_request
+        def start_query_tracking():
+            g.query_tracker = QueryTracker(request.path)
+
+        @app.after_request
+        def check_query_budget(response):
+            tracker = g.pop('query_tracker', None)
+            if tracker is None:
+                return response
+
+            if request.url_rule is not None:
+                tracker.label = f'{request.method} {request.url_rule.rule}'
+                tracker.budget = self.budget_for(request.url_rule.rule)
+            response.headers['X-Query-Count'] = str(tracker.count)
+            self.inspect(tracker)
+            return response
+
+    def listen(self):
+        """Se suscribe a las consultas medidas por db_monitor (una sola vez)"""
+        if self._listening or self.db_monitor is None:
+            return
+        self.db_monitor.add_statement_listener(self._on_statement)
+        self._listening = True
+
+    def budget_for(self, rule):
+        return self.budgets.get(rule, self.default_budget)
+
+    # ------------------------------------------------------------------
+    # Consultas medidas por db_monitor
+    # ------------------------------------------------------------------
+
+    def _current_trackers(self):
+        trackers = list(getattr(self._local, 'stack', []))
+        if has_request_context():
+            tracker = g.get('query_tracker')
+            if tracker is not None:
+                trackers.append(tracker)
+        return trackers
+
+    def _on_statement(self, statement, parameters, duration_ms):
+        for tracker in self._current_trackers():
+            tracker.add(statement, parameters, duration_ms)
+
+    # ------------------------------------------------------------------
+    # Análisis
+    # ------------------------------------------------------------------
+
+    def inspect(self, tracker):
+        """Registra advertencias y, en modo 'raise', falla si se supera el presupuesto"""
+        for sql, times in tracker.duplicates():
+            logger.warning(f"[query_guard] {tracker.label}: sentencia idéntica ejecutada {times} veces: {sql[:200]}")
+
+        for sql, times in tracker.repeated_statements(self.repeat_threshold):
+            logger.warning(f"[query_guard] {tracker.label}: posible N+1, {times} ejecuciones de: {sql[:200]}")
+
+        logger.debug(f"[query_guard] {tracker.label}: {tracker.count} consultas en {tracker.total_ms:.1f} ms")
+
+        if tracker.over_budget():
+            message = f"{tracker.label} ejecutó {tracker.count} consultas (presupuesto {tracker.budget})"
+            if self.mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(f"[query_guard] {message}")
+
+    @contextlib.contextmanager
+    def track(self, label='bloque', budget=None):
+        """
+        Registra las consultas de un bloque de código (fuera o dentro de una petición)
+
+        Args:
+            label (str): Nombre para los mensajes
+            budget (int): Máximo de consultas; si se supera lanza QueryBudgetExceeded
+        """
+        self.listen()
+        tracker = QueryTracker(label, budget)
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(tracker)
+        try:
+            yield tracker
+        finally:
+            stack.remove(tracker)
+
+        for sql, times in tracker.duplicates():
+            logger.warning(f"[query_guard] {label}: sentencia idéntica ejecutada {times} veces: {sql[:200]}")
+        if tracker.over_budget():
+            raise QueryBudgetExceeded(f"{label} ejecutó {tracker.count} consultas (presupuesto {budget})")
+
+
+# Instancia global de la guardia de consultas
+query_guard = QueryGuard()
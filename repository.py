@@ -0,0 +1,215 @@
+"""
+Repositorio de Consultas Frecuentes (sentencias lambda en caché)
+Proyecto de grado
+
+Las consultas que se repiten en cada petición o ciclo de control (última
+lectura por estación, rangos por fecha, umbrales activos) estaban escritas
+con Model.query.filter_by(...).order_by(...) en app.py, api_extended.py,
+auto_control.py y alert_system.py. Cada llamada volvía a construir la
+sentencia y a calcular su clave de caché.
+
+Aquí cada consulta es una función con nombre construida con lambda_stmt:
+SQLAlchemy analiza la lambda una sola vez por proceso y en las llamadas
+siguientes solo extrae los parámetros (estación, fechas), reutilizando el
+SQL compilado. Los nombres de columna son los del esquema en español
+(estacion_id, fecha_hora): un nombre inexistente falla en la primera llamada,
+no en un script que se ejecuta una vez al año.
+
+Todas las funciones requieren contexto de aplicación (db.session).
+"""
+
+from sqlalchemy import select, func, lambda_stmt
+from database import (
+    db, GateStatus, WaterLevel, MeteorologicalData, PumpTelemetry,
+    AlertThreshold, AutomaticControlLog, MonitoringStation, NotificationContact
+)
+
+
+# =====================================================================
+# ÚLTIMA LECTURA POR ESTACIÓN / BOMBA
+# =====================================================================
+
+def latest_gate_status(station_id):
+    """
+    Último estado de compuerta de una estación
+
+    Returns:
+        GateStatus: Registro más reciente o None
+    """
+    stmt = lambda_stmt(lambda: select(GateStatus).where(GateStatus.estacion_id == station_id)
+                       .order_by(GateStatus.fecha_hora.desc()).limit(1))
+    return db.session.scalars(stmt).first()
+
+
+def gate_status_before(station_id, when):
+    """
+    Estado de compuerta vigente justo antes de `when`
+
+    Returns:
+        GateStatus: Registro o None
+    """
+    stmt = lambda_stmt(lambda: select(GateStatus).where(GateStatus.estacion_id == station_id,
+                                                        GateStatus.fecha_hora < when)
+                       .order_by(GateStatus.fecha_hora.desc()).limit(1))
+    return db.session.scalars(stmt).first()
+
+
+def latest_water_level(station_id):
+    """
+    Último nivel de agua de una estación
+
+    Returns:
+        WaterLevel: Registro más reciente o None
+    """
+    stmt = lambda_stmt(lambda: select(WaterLevel).where(WaterLevel.estacion_id == station_id)
+                       .order_by(WaterLevel.fecha_hora.desc()).limit(1))
+    return db.session.scalars(stmt).first()
+
+
+def latest_pump_telemetry(bomba_id):
+    """
+    Última telemetría de una bomba
+
+    Returns:
+        PumpTelemetry: Registro más reciente o None
+    """
+    stmt = lambda_stmt(lambda: select(PumpTelemetry).where(PumpTelemetry.bomba_id == bomba_id)
+                       .order_by(PumpTelemetry.fecha_hora.desc()).limit(1))
+    return db.session.scalars(stmt).first()
+
+
+def latest_control_log(bomba_id):
+    """
+    Última decisión del control automático para una bomba
+
+    Returns:
+        AutomaticControlLog: Registro más reciente o None
+    """
+    stmt = lambda_stmt(lambda: select(AutomaticControlLog).where(AutomaticControlLog.bomba_id == bomba_id)
+                       .order_by(AutomaticControlLog.fecha_hora.desc()).limit(1))
+    return db.session.scalars(stmt).first()
+
+
+# =====================================================================
+# RANGOS POR FECHA
+# =====================================================================
+
+def water_levels_since(station_id, start, after_id=None):
+    """
+    Niveles de agua desde `start` en orden cronológico
+
+    Args:
+        station_id (int): Estación
+        start (datetime): Inicio de la ventana
+        after_id (int): Solo filas con id mayor (cursor incremental del dashboard)
+
+    Returns:
+        list[WaterLevel]
+    """
+    stmt = lambda_stmt(lambda: select(WaterLevel).where(WaterLevel.estacion_id == station_id,
+                                                        WaterLevel.fecha_hora >= start))
+    if after_id is not None:
+        stmt += lambda s: s.where(WaterLevel.id > after_id)
+    stmt += lambda s: s.order_by(WaterLevel.fecha_hora)
+    return db.session.scalars(stmt).all()
+
+
+def gate_statuses_between(station_id, start, end=None):
+    """
+    Estados de compuerta en [start, end] (end=None: hasta ahora) en orden cronológico
+
+    Returns:
+        list[GateStatus]
+    """
+    stmt = lambda_stmt(lambda: select(GateStatus).where(GateStatus.estacion_id == station_id,
+                                                        GateStatus.fecha_hora >= start))
+    if end is not None:
+        stmt += lambda s: s.where(GateStatus.fecha_hora <= end)
+    stmt += lambda s: s.order_by(GateStatus.fecha_hora)
+    return db.session.scalars(stmt).all()
+
+
+def meteorology_between(station_id, start, end):
+    """
+    Registros meteorológicos en [start, end]
+
+    Returns:
+        list[MeteorologicalData]
+    """
+    stmt = lambda_stmt(lambda: select(MeteorologicalData).where(MeteorologicalData.estacion_id == station_id,
+                                                                MeteorologicalData.fecha_hora >= start,
+                                                                MeteorologicalData.fecha_hora <= end))
+    return db.session.scalars(stmt).all()
+
+
+def rainfall_total(station_id, since):
+    """
+    Precipitación acumulada (mm) desde `since`
+
+    Returns:
+        float: Suma de precipitacion_mm (0.0 sin registros)
+    """
+    stmt = lambda_stmt(lambda: select(func.sum(MeteorologicalData.precipitacion_mm))
+                       .where(MeteorologicalData.estacion_id == station_id,
+                              MeteorologicalData.fecha_hora >= since))
+    result = db.session.scalar(stmt)
+    return float(result) if result else 0.0
+
+
+# =====================================================================
+# CONFIGURACIÓN (UMBRALES, ESTACIONES, CONTACTOS)
+# =====================================================================
+
+def active_thresholds():
+    """
+    Umbrales activos (iot_umbral_alerta es global, sin estación)
+
+    Returns:
+        list[AlertThreshold]
+    """
+    stmt = lambda_stmt(lambda: select(AlertThreshold).where(AlertThreshold.activo == True))
+    return db.session.scalars(stmt).all()
+
+
+def thresholds_for_parameter(parameter_name):
+    """
+    Umbrales activos de un parámetro
+
+    Returns:
+        list[AlertThreshold]
+    """
+    stmt = lambda_stmt(lambda: select(AlertThreshold).where(AlertThreshold.nombre_parametro == parameter_name,
+                                                            AlertThreshold.activo == True))
+    return db.session.scalars(stmt).all()
+
+
+def auto_control_stations():
+    """
+    Estaciones activas con control automático habilitado
+
+    Returns:
+        list[MonitoringStation]
+    """
+    stmt = lambda_stmt(lambda: select(MonitoringStation).where(
+        MonitoringStation.control_automatico_habilitado == True,
+        MonitoringStation.activo == True))
+    return db.session.scalars(stmt).all()
+
+
+def notification_recipients(severity):
+    """
+    Contactos activos que reciben la severidad indicada (CRITICAL/HIGH/MEDIUM/LOW)
+
+    Returns:
+        list[NotificationContact]: Sin filtro de preferencia si la severidad no se reconoce
+    """
+    stmt = lambda_stmt(lambda: select(NotificationContact).where(NotificationContact.activo == True))
+    if severity == 'CRITICAL':
+        stmt += lambda s: s.where(NotificationContact.recibir_critico == True)
+    elif severity == 'HIGH':
+        stmt += lambda s: s.where(NotificationContact.recibir_alto == True)
+    elif severity == 'MEDIUM':
+        stmt += lambda s: s.where(NotificationContact.recibir_medio == True)
+    elif severity == 'LOW':
+        stmt += lambda s: s.where(NotificationContact.recibir_bajo == True)
+    return db.session.scalars(stmt).all()
@@ -7,6 +7,11 @@ class AdvancedMonitoringDashboard {
         this.refreshInterval = null;
         this.connectionStatus = 'disconnected';
         this.lastData = null;
+        // Actualización incremental de gráficos (/api/dashboard?since=cursor)
+        this.chartCursor = null;
+        this.chartTimestamps = [];
+        this.deltaPolls = 0;
+        this.maxDeltaPolls = 20; // Recarga completa periódica para resincronizar
         this.virtualSensors = new Map();
         this.alerts = [];
         
@@ -187,12 +192,14 @@ class AdvancedMonitoringDashboard {
         // Selector de estación
         document.getElementById('stationSelect').addEventListener('change', (e) => {
             this.stationId = parseInt(e.target.value);
+            this.resetChartCursor();
             this.loadData();
         });
 
         // Control de rango de tiempo
         document.getElementById('timeRange').addEventListener('change', (e) => {
             this.timeRange = parseInt(e.target.value);
+            this.resetChartCursor();
             this.loadData();
         });
 
@@ -286,18 +293,37 @@ class AdvancedMonitoringDashboard {
                     this.simulatorEnabled = false;
                 }
             } else {
-                // Usar solo API principal
-                const response = await fetch(`${this.apiBase}/api/dashboard?station_id=${this.stationId}&hours=${this.timeRange}`);
+                // Usar solo API principal (incremental si ya hay cursor)
+                let url = `${this.apiBase}/api/dashboard?station_id=${this.stationId}&hours=${this.timeRange}`;
+                if (this.chartCursor !== null && !manual && this.deltaPolls < this.maxDeltaPolls) {
+                    url += `&since=${this.chartCursor}`;
+                }
+                const response = await fetch(url);
                 if (!response.ok) {
                     throw new Error(`HTTP ${response.status}`);
                 }
                 data = await response.json();
             }
             
+            if (data.delta) {
+                // La respuesta incremental no trae el resumen diario: conservar el último
+                data.daily_summary = this.lastData ? this.lastData.daily_summary : {};
+            }
             this.lastData = data;
             
             this.updateDashboard(data);
-            this.updateCharts(data.historical_data || []);
+            let resync = false;
+            if (data.delta) {
+                resync = this.appendChartPoints(data.historical_data || [], data.window_start);
+                if (!resync) this.deltaPolls++;
+            } else {
+                this.updateCharts(data.historical_data || []);
+                this.deltaPolls = 0;
+            }
+            // Tras pedir una recarga completa no se guarda el cursor de esta respuesta
+            if (!resync) {
+                this.chartCursor = data.cursor ?? null;
+            }
             this.updateVirtualSensorsFromData(data.virtual_sensors || {});
             await this.loadWeatherData();
             this.updateConnectionStatus('connected');
@@ -499,32 +525,44 @@ class AdvancedMonitoringDashboard {
         this.checkAlerts(status, summary);
     }
 
+    formatChartLabel(timestamp) {
+        const date = new Date(timestamp);
+        return this.timeRange <= 6 ? 
+            date.toLocaleTimeString('es', { hour: '2-digit', minute: '2-digit' }) :
+            date.toLocaleString('es', { 
+                day: '2-digit', 
+                month: '2-digit',
+                hour: '2-digit', 
+                minute: '2-digit' 
+            });
+    }
+
+    gateValue(item) {
+        // position_percent viene del API; gate_opening_percent de los datos simulados
+        return item.gate_opening_percent ?? item.position_percent ?? 0;
+    }
+
+    resetChartCursor() {
+        this.chartCursor = null;
+        this.deltaPolls = 0;
+    }
+
     updateCharts(historicalData) {
         // Si no hay datos históricos, generar datos simulados
         if (!historicalData || historicalData.length === 0) {
             console.log('⚠️  Sin datos históricos, generando simulación...');
             historicalData = this.generateSimulatedHistoricalData(20);
+            this.resetChartCursor();
         }
 
         // Formatear etiquetas de tiempo
-        const labels = historicalData.map(item => {
-            const date = new Date(item.timestamp);
-            return this.timeRange <= 6 ? 
-                date.toLocaleTimeString('es', { hour: '2-digit', minute: '2-digit' }) :
-                date.toLocaleString('es', { 
-                    day: '2-digit', 
-                    month: '2-digit',
-                    hour: '2-digit', 
-                    minute: '2-digit' 
-                });
-        });
+        this.chartTimestamps = historicalData.map(item => new Date(item.timestamp).getTime());
+        const labels = historicalData.map(item => this.formatChartLabel(item.timestamp));
 
         // Datos para gráficos
         const flowData = historicalData.map(item => item.flow_m3s || 0);
         const levelData = historicalData.map(item => item.level_m || 0);
-        
-        // Obtener datos de compuerta (simulado o real)
-        const gateData = historicalData.map(item => item.gate_opening_percent || (Math.random() * 100));
+        const gateData = historicalData.map(item => this.gateValue(item));
 
         // Actualizar gráfico de caudal
         if (this.flowChart) {
@@ -549,6 +587,54 @@ class AdvancedMonitoringDashboard {
             this.gateChart.update('none');
         }
     }
+
+    // Retorna true si pidió recargar la ventana completa (cursor reiniciado)
+    appendChartPoints(points, windowStart) {
+        // Puntos fuera de orden (lecturas diferidas): recargar la ventana completa
+        const lastTime = this.chartTimestamps[this.chartTimestamps.length - 1];
+        if (points.length && lastTime !== undefined && new Date(points[0].timestamp).getTime() < lastTime) {
+            this.resetChartCursor();
+            return true;
+        }
+
+        const charts = [
+            [this.flowChart, item => item.flow_m3s || 0],
+            [this.levelChart, item => item.level_m || 0],
+            [this.gateChart, item => this.gateValue(item)]
+        ].filter(([chart]) => chart);
+
+        // Agregar al final
+        points.forEach(item => {
+            this.chartTimestamps.push(new Date(item.timestamp).getTime());
+            const label = this.formatChartLabel(item.timestamp);
+            charts.forEach(([chart, value]) => {
+                chart.data.labels.push(label);
+                chart.data.datasets[0].data.push(value(item));
+            });
+        });
+
+        // Recortar los puntos que salieron de la ventana
+        // Mismo criterio de zona horaria que item.timestamp (ISO sin zona)
+        const cutoff = windowStart ? new Date(windowStart).getTime() : -Infinity;
+        let expired = 0;
+        while (expired < this.chartTimestamps.length && this.chartTimestamps[expired] < cutoff) {
+            expired++;
+        }
+        if (expired) {
+            this.chartTimestamps.splice(0, expired);
+            charts.forEach(([chart]) => {
+                chart.data.labels.splice(0, expired);
+                chart.data.datasets[0].data.splice(0, expired);
+            });
+        }
+
+        if (!points.length && !expired) return false;
+
+        charts.forEach(([chart]) => chart.update('none'));
+        if (this.flowChart) this.updateFlowStats(this.flowChart.data.datasets[0].data);
+        if (this.levelChart) this.updateLevelStats(this.levelChart.data.datasets[0].data);
+        return false;
+    }
     
     generateSimulatedHistoricalData(count) {
         const data = [];
@@ -0,0 +1,505 @@
+"""
+Almacén de Series en Segmentos Columnares (solo anexar, Gorilla + mmap)
+Proyecto de grado
+
+Las tablas de telemetría guardan una fila por muestra con id autoincremental,
+índices y el texto dispositivo_origen repetido en cada fila. Para consultar
+años de datos cada 10 s eso es mucho espacio y muchas páginas de índice.
+
+Este almacén opcional (SEGMENT_STORE_ENABLED) guarda, en paralelo a la base,
+una serie por (tabla, estación, señal):
+
+    <SEGMENT_STORE_DIR>/<tabla>/<estación>/<señal>/
+        active.log   muestras del segmento abierto (16 bytes: int64 s, float64)
+        data.seg     segmentos sellados, uno tras otro (solo anexar)
+        index.bin    un registro por segmento: t_inicial, t_final, puntos, offset, bytes
+
+Un segmento se sella al llegar a SEGMENT_POINTS muestras (4096 ≈ 11 h a 10 s):
+- Tiempos: delta de deltas en segundos (muestras regulares = 1 bit)
+- Valores: XOR con el anterior (codificación Gorilla; valor repetido = 1 bit)
+
+Lectura: index.bin se busca por rango de tiempo (bisect) y data.seg se lee
+con mmap; solo se decodifican los segmentos que cruzan el rango, en orden.
+Las muestras del segmento abierto se leen de active.log.
+
+Reglas:
+- Cada serie solo acepta tiempos crecientes; las muestras tardías quedan
+  solo en la base (estadística 'late').
+- Un solo proceso escribe (gateway SQLite o mqtt_bridge.py); cualquier
+  worker puede leer.
+- La base sigue siendo el registro completo: borrar el directorio solo
+  pierde la copia columnar.
+"""
+
+import os
+import mmap
+import bisect
+import struct
+import threading
+from datetime import datetime, timedelta
+from database import WaterLevel, MeteorologicalData, PumpTelemetry
+from pagination import encode_cursor, decode_cursor
+
+EPOCH = datetime(1970, 1, 1)
+
+POINT = struct.Struct('<qd')              # muestra del segmento abierto
+INDEX_ENTRY = struct.Struct('<qqIQI')      # t_inicial, t_final, puntos, offset, bytes
+SEGMENT_HEADER = struct.Struct('<Iq')      # puntos, t_inicial
+
+# Tabla -> (columna de estación, señales numéricas)
+SERIES_TABLES = {
+    WaterLevel.__tablename__: ('estacion_id', ('nivel_m', 'volumen_m3')),
+    MeteorologicalData.__tablename__: ('estacion_id', (
+        'temperatura_c', 'humedad_porcentaje', 'precipitacion_mm', 'velocidad_viento_kmh',
+        'direccion_viento_grados', 'presion_atmosferica_hpa', 'radiacion_solar_wm2', 'indice_uv',
+        'evapotranspiracion_mm', 'humedad_suelo_porcentaje', 'temperatura_suelo_c',
+        'humedad_hoja_porcentaje')),
+    PumpTelemetry.__tablename__: ('bomba_id', (
+        'caudal_m3h', 'presion_entrada_bar', 'presion_salida_bar', 'consumo_energia_kw',
+        'temperatura_motor_c', 'nivel_vibracion', 'horas_operacion')),
+}
+
+
+# =====================================================================
+# CODIFICACIÓN GORILLA
+# =====================================================================
+
+class BitWriter:
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value, bits):
+        self.acc = (self.acc << bits) | value
+        self.bits += bits
+        while self.bits >= 8:
+            self.bits -= 8
+            self.out.append((self.acc >> self.bits) & 0xFF)
+        self.acc &= (1 << self.bits) - 1
+
+    def getvalue(self):
+        if self.bits:
+            return bytes(self.out) + bytes([(self.acc << (8 - self.bits)) & 0xFF])
+        return bytes(self.out)
+
+
+class BitReader:
+    def __init__(self, data):
+        self.data = bytes(data) + bytes(9)
+        self.pos = 0
+
+    def read(self, bits):
+        byte, offset = self.pos >> 3, self.pos & 7
+        self.pos += bits
+        chunk = int.from_bytes(self.data[byte:byte + 9], 'big')
+        return (chunk >> (72 - offset - bits)) & ((1 << bits) - 1)
+
+
+# Rangos del delta de deltas: (prefijo, bits del prefijo, bits del valor)
+DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12))
+
+
+def float_bits(value):
+    return struct.unpack('<Q', struct.pack('<d', value))[0]
+
+
+def bits_float(bits):
+    return struct.unpack('<d', struct.pack('<Q', bits))[0]
+
+
+def encode_segment(points):
+    """Codifica [(t_segundos, valor)] crecientes en un bloque Gorilla"""
+    t_first, v_first = points[0]
+    writer = BitWriter()
+    previous_bits = float_bits(v_first)
+    writer.write(previous_bits, 64)
+    previous_t, previous_delta = t_first, 0
+    leading, trailing = 65, 0
+
+    for t, value in points[1:]:
+        delta = t - previous_t
+        dod = delta - previous_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, value_bits in DOD_BUCKETS:
+                half = 1 << (value_bits - 1)
+                if -half < dod <= half:
+                    writer.write(prefix, prefix_bits)
+                    writer.write(dod + half - 1, value_bits)
+                    break
+            else:
+                writer.write(0b1111, 4)
+                writer.write(dod & 0xFFFFFFFF, 32)
+        previous_t, previous_delta = t, delta
+
+        bits = float_bits(value)
+        xor = bits ^ previous_bits
+        previous_bits = bits
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+        new_leading = min(64 - xor.bit_length(), 31)
+        new_trailing = (xor & -xor).bit_length() - 1
+        if new_leading >= leading and new_trailing >= trailing:
+            # Cabe en la ventana de bits significativos anterior
+            writer.write(0b10, 2)
+            writer.write(xor >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = new_leading, new_trailing
+            meaningful = 64 - leading - trailing
+            writer.write(0b11, 2)
+            writer.write(leading, 5)
+            writer.write(meaningful - 1, 6)
+            writer.write(xor >> trailing, meaningful)
+
+    return SEGMENT_HEADER.pack(len(points), t_first) + writer.getvalue()
+
+
+def decode_segment(block):
+    """Genera (t_segundos, valor) de un bloque Gorilla"""
+    count, t = SEGMENT_HEADER.unpack_from(block)
+    reader = BitReader(block[SEGMENT_HEADER.size:])
+    read = reader.read
+    bits = read(64)
+    yield t, bits_float(bits)
+    delta = 0
+    leading = trailing = 0
+
+    for _ in range(count - 1):
+        if read(1):
+            if not read(1):
+                dod = read(7) - 63
+            elif not read(1):
+                dod = read(9) - 255
+            elif not read(1):
+                dod = read(12) - 2047
+            else:
+                dod = read(32)
+                if dod >= 1 << 31:
+                    dod -= 1 << 32
+            delta += dod
+        t += delta
+
+        if read(1):
+            if read(1):
+                leading = read(5)
+                meaningful = read(6) + 1
+                trailing = 64 - leading - meaningful
+            bits ^= read(64 - leading - trailing) << trailing
+        yield t, bits_float(bits)
+
+
+# =====================================================================
+# SERIE (tabla, estación, señal)
+# =====================================================================
+
+class Series:
+    """Archivos de una serie: segmento abierto, segmentos sellados e índice"""
+
+    def __init__(self, directory, points_per_segment):
+        self.directory = directory
+        self.points_per_segment = points_per_segment
+        self.log_path = os.path.join(directory, 'active.log')
+        self.data_path = os.path.join(directory, 'data.seg')
+        self.index_path = os.path.join(directory, 'index.bin')
+        self._index = []          # [(t_inicial, t_final, puntos, offset, bytes)]
+        self._index_size = -1
+        self._map = None
+        self._map_size = 0
+        self._active = None       # muestras abiertas (solo en el proceso escritor)
+        self._log = None
+
+    # --- escritura ---
+
+    def _load_active(self):
+        self.refresh_index()
+        sealed_until = self._index[-1][1] if self._index else None
+        self._active = [point for point in self.read_log()
+                        if sealed_until is None or point[0] > sealed_until]
+
+    def last_time(self):
+        if self._active is None:
+            self._load_active()
+        if self._active:
+            return self._active[-1][0]
+        return self._index[-1][1] if self._index else None
+
+    def append(self, t, value):
+        """Anexa una muestra; False si no es posterior a la última"""
+        last = self.last_time()
+        if last is not None and t <= last:
+            return False
+        if self._log is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._log = open(self.log_path, 'ab')
+        self._log.write(POINT.pack(t, value))
+        self._active.append((t, value))
+        if len(self._active) >= self.points_per_segment:
+            self.seal()
+        return True
+
+    def seal(self):
+        """Codifica el segmento abierto, lo anexa a data.seg y lo registra en el índice"""
+        if not self._active:
+            return
+        block = encode_segment(self._active)
+        # El offset es el tamaño real del archivo: bytes huérfanos de un corte previo no afectan
+        with open(self.data_path, 'ab') as data:
+            offset = data.tell()
+            data.write(block)
+            data.flush()
+            os.fsync(data.fileno())
+        entry = (self._active[0][0], self._active[-1][0], len(self._active), offset, len(block))
+        with open(self.index_path, 'ab') as index:
+            index.write(INDEX_ENTRY.pack(*entry))
+        # Si el proceso muere antes de truncar, _load_active descarta lo ya sellado
+        self._log.close()
+        self._log = open(self.log_path, 'wb')
+        self._active = []
+
+    def flush(self):
+        """Hace visibles a otros procesos las muestras anexadas"""
+        if self._log is not None:
+            self._log.flush()
+
+    # --- lectura ---
+
+    def refresh_index(self):
+        try:
+            size = os.path.getsize(self.index_path)
+        except OSError:
+            size = 0
+        if size != self._index_size:
+            entries = []
+            if size:
+                with open(self.index_path, 'rb') as index:
+                    raw = index.read(size - size % INDEX_ENTRY.size)
+                entries = list(INDEX_ENTRY.iter_unpack(raw))
+            self._index = entries
+            self._index_size = size
+        return self._index
+
+    def read_log(self):
+        try:
+            with open(self.log_path, 'rb') as log:
+                raw = log.read()
+        except OSError:
+            return []
+        # Un registro incompleto al final (escritura en curso) se ignora
+        return list(POINT.iter_unpack(raw[:len(raw) - len(raw) % POINT.size]))
+
+    def _segment_bytes(self, offset, length):
+        end = offset + length
+        if self._map is None or self._map_size < end:
+            if self._map is not None:
+                self._map.close()
+            with open(self.data_path, 'rb') as data:
+                self._map = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map_size = len(self._map)
+        return self._map[offset:end]
+
+    def scan(self, start=None, end=None):
+        """Genera (t_segundos, valor) con start <= t <= end en orden"""
+        index = self.refresh_index()
+        first = 0
+        if start is not None:
+            first = bisect.bisect_left([entry[1] for entry in index], start)
+        for t_first, t_last, _, offset, length in index[first:]:
+            if end is not None and t_first > end:
+                return
+            for t, value in decode_segment(self._segment_bytes(offset, length)):
+                if start is not None and t < start:
+                    continue
+                if end is not None and t > end:
+                    return
+                yield t, value
+
+        sealed_until = index[-1][1] if index else None
+        active = self._active if self._active is not None else self.read_log()
+        for t, value in active:
+            if sealed_until is not None and t <= sealed_until:
+                continue
+            if start is not None and t < start:
+                continue
+            if end is not None and t > end:
+                return
+            yield t, value
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._map_size = 0
+
+
+# =====================================================================
+# ALMACÉN
+# =====================================================================
+
+def to_seconds(when):
+    """Segundos desde 1970; la zona horaria se descarta como al guardar en DateTime"""
+    return int((when.replace(tzinfo=None) - EPOCH).total_seconds())
+
+
+def from_seconds(t):
+    return EPOCH + timedelta(seconds=t)
+
+
+class SegmentStore:
+    """Series por (tabla, estación, señal) en segmentos Gorilla"""
+
+    def __init__(self, root=None, points_per_segment=4096):
+        self.enabled = False
+        self.root = root
+        self.points_per_segment = points_per_segment
+        self._series = {}
+        self._lock = threading.Lock()
+        self.stats = {'appended': 0, 'late': 0, 'sealed': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SEGMENT_STORE_ENABLED', self.enabled)
+        self.root = app.config.get('SEGMENT_STORE_DIR', self.root)
+        self.points_per_segment = app.config.get('SEGMENT_POINTS', self.points_per_segment)
+        if self.enabled:
+            app.logger.info(f"Almacén de segmentos en {self.root}")
+
+    def series(self, table, station_id, signal):
+        key = (table, int(station_id), signal)
+        series = self._series.get(key)
+        if series is None:
+            directory = os.path.join(self.root, table, str(int(station_id)), signal)
+            series = self._series[key] = Series(directory, self.points_per_segment)
+        return series
+
+    def append_groups(self, groups):
+        """
+        Anexa las señales numéricas de [(Modelo, filas)] a sus series
+
+        Las tablas sin series (compuertas, alertas) se ignoran.
+        """
+        touched = set()
+        with self._lock:
+            for model, rows in groups:
+                layout = SERIES_TABLES.get(model.__tablename__)
+                if layout is None:
+                    continue
+                station_column, signals = layout
+                for row in rows:
+                    t = to_seconds(row['fecha_hora'])
+                    for signal in signals:
+                        value = row.get(signal)
+                        if value is None:
+                            continue
+                        series = self.series(model.__tablename__, row[station_column], signal)
+                        touched.add(series)
+                        if series.append(t, float(value)):
+                            self.stats['appended'] += 1
+                        else:
+                            self.stats['late'] += 1
+            for series in touched:
+                series.flush()
+
+    def append_record(self, record):
+        """Anexa un objeto ORM recién guardado (endpoints que insertan de a una fila)"""
+        if record.__tablename__ not in SERIES_TABLES:
+            return
+        row = {attr.key: getattr(record, attr.key) for attr in record.__mapper__.column_attrs}
+        self.append_groups([(type(record), [row])])
+
+    def seal_all(self):
+        """Sella los segmentos abiertos (al detener el proceso o antes de copiar el directorio)"""
+        with self._lock:
+            for series in self._series.values():
+                if series._active:
+                    series.seal()
+                    self.stats['sealed'] += 1
+
+    def read(self, table, station_id, signal, start=None, end=None):
+        """Genera (fecha_hora, valor) de una serie en [start, end]"""
+        series = self.series(table, station_id, signal)
+        start_s = to_seconds(start) if start is not None else None
+        end_s = to_seconds(end) if end is not None else None
+        for t, value in series.scan(start_s, end_s):
+            yield from_seconds(t), value
+
+    def read_rows(self, table, station_id, columns, start=None, end=None, after=None, limit=1000):
+        """
+        Filas {fecha_hora, columnas...} armadas por instante, en orden cronológico
+
+        Args:
+            after (datetime): Solo instantes posteriores (cursor de la página anterior)
+            limit (int): Filas máximas; se lee una más para saber si hay otra página
+
+        Returns:
+            tuple: (filas, hay_más)
+        """
+        start_s = to_seconds(start) if start is not None else None
+        if after is not None:
+            after_s = to_seconds(after) + 1
+            start_s = after_s if start_s is None else max(start_s, after_s)
+        end_s = to_seconds(end) if end is not None else None
+
+        merged = {}
+        for column in columns:
+            series = self.series(table, station_id, column)
+            # Cada instante de la página aparece en alguna serie entre sus primeras limit+1 muestras
+            for count, (t, value) in enumerate(series.scan(start_s, end_s)):
+                if count > limit:
+                    break
+                merged.setdefault(t, {})[column] = value
+
+        instants = sorted(merged)
+        has_more = len(instants) > limit
+        rows = []
+        for t in instants[:limit]:
+            row = dict.fromkeys(columns)
+            row.update(merged[t])
+            row['fecha_hora'] = from_seconds(t)
+            rows.append(row)
+        return rows, has_more
+
+    def page(self, serializer, station_id, start, after=None, limit=1000):
+        """
+        Página de un histórico con las columnas de un ModelSerializer
+
+        Las columnas que no son series (id, dispositivo_origen) salen en None; la
+        de estación, con station_id. El cursor es el de pagination.py con id 0
+        (en una serie cada instante es único).
+
+        Returns:
+            tuple: (filas como tuplas en el orden de serializer.names, next_cursor o None)
+
+        Raises:
+            InvalidCursor: Si el cursor está malformado
+        """
+        table = serializer.model.__tablename__
+        station_column, signals = SERIES_TABLES[table]
+        columns = [name for name in serializer.names if name in signals]
+        after_time = decode_cursor(after)[0] if after else None
+        rows, has_more = self.read_rows(table, station_id, columns, start=start, after=after_time, limit=limit)
+        for row in rows:
+            row[station_column] = station_id
+        next_cursor = encode_cursor(rows[-1]['fecha_hora'], 0) if has_more else None
+        return [tuple(row.get(name) for name in serializer.names) for row in rows], next_cursor
+
+    def disk_usage(self, table, station_id):
+        """Bytes en disco de todas las señales de una estación"""
+        total = 0
+        base = os.path.join(self.root, table, str(int(station_id)))
+        for directory, _, files in os.walk(base):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        return total
+
+    def close(self):
+        self.seal_all()
+        for series in self._series.values():
+            series.close()
+
+
+# Instancia global del almacén de segmentos
+segment_store = SegmentStore()
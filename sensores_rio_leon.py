@@ -8,7 +8,6 @@ Finca La Plana - Sistema de Monitoreo Avanzado
 import time
 import math
 import random
-import requests
 import threading
 import logging
 from datetime import datetime, timedelta
@@ -18,6 +17,7 @@ import json
 
 # Importar configuración específica de Chigorodó
 from config_chigorodo import get_chigorodo_config, ChigodoHydrologicalModel
+from store_forward import StoreForwardClient
 
 # Configurar logging
 logging.basicConfig(
@@ -207,7 +207,11 @@ class FreaticsLevelSensor(RioLeonSensor):
 
 class RiverLevelSensor(RioLeonSensor):
     """Sensor de nivel del río León"""
-    
+
+    def __init__(self, config: SensorChigorodaConfig):
+        super().__init__(config)
+        self.base_level = (config.min_value + config.max_value) / 2
+
     def update_value(self):
         """Actualiza nivel del río considerando caudales y precipitación"""
         seasonal_factor = self.get_seasonal_influence()
@@ -356,12 +360,14 @@ class GatePositionSensor(RioLeonSensor):
 class ChigorodSensorManager:
     """Gestor de sensores virtuales para Chigorodó"""
     
-    def __init__(self, api_url: str = "http://localhost:5000"):
+    def __init__(self, api_url: str = "http://localhost:5000", spool_dir: str = "spool/rio_leon"):
         self.api_url = api_url
         self.sensors: Dict[int, RioLeonSensor] = {}
         self.running = False
         self.threads = []
         self.chigorodo_config = get_chigorodo_config()
+        # Spool en disco: las lecturas se conservan durante cortes de red
+        self.client = StoreForwardClient(api_url, spool_dir)
         
     def create_default_sensors(self):
         """Crea sensores por defecto para las estaciones de Finca La Plana"""
@@ -457,6 +463,7 @@ class ChigorodSensorManager:
     def start_simulation(self):
         """Inicia simulación de todos los sensores"""
         self.running = True
+        self.client.start()
         logger.info(f"Iniciando simulación - Río León, Chigorodó...")
         logger.info(f"Estaciones: Finca La Plana ({len(self.sensors)} sensores)")
         
@@ -532,21 +539,9 @@ class ChigorodSensorManager:
         return base_data
         
     def _send_data(self, data: dict):
-        """Envía datos a la API"""
-        try:
-            response = requests.post(
-                f"{self.api_url}/api/data",
-                json=data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                logger.debug(f"Datos enviados - Sensor {data['sensor_id']}")
-            else:
-                logger.warning(f"Error al enviar datos: {response.status_code}")
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error de conexión: {e}")
+        """Encola datos para envío a la API (store-and-forward)"""
+        self.client.send('/api/data', data)
+        logger.debug(f"Datos encolados - Sensor {data['sensor_id']}")
             
     def get_system_status(self) -> dict:
         """Estado completo del sistema de Chigorodó"""
@@ -563,6 +558,7 @@ class ChigorodSensorManager:
     def stop_simulation(self):
         """Detiene la simulación"""
         self.running = False
+        self.client.stop()
         logger.info("Deteniendo simulación Río León...")
 
 def main():
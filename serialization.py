@@ -0,0 +1,162 @@
+"""
+Serialización Rápida de Listados (tuplas de columnas + orjson)
+Proyecto de grado
+
+Los listados grandes (históricos, alertas, comandos) gastaban la mayor parte
+del tiempo en:
+- Construir objetos ORM (identity map, estado de sesión) por cada fila
+- to_dict() campo a campo (float(Decimal), isoformat())
+- jsonify con el codificador estándar de Python
+
+Este módulo:
+- Selecciona solo columnas (filas Row, sin identity map)
+- Convierte por columna con una función elegida una sola vez según el tipo
+  (Numeric -> float; fechas quedan como datetime)
+- Codifica con orjson si está instalado (datetime nativo, en C); si no,
+  con json estándar y el mismo formato ISO
+
+Diferencia con to_dict(): un valor numérico 0 se entrega como 0.0 y no como
+null (to_dict usa `float(x) if x else None`). Los campos que to_dict completa
+con 0.0 se declaran en `defaults`.
+
+Proyección (parámetro fields=): project() devuelve un serializador solo con
+las columnas pedidas, de modo que el SELECT trae únicamente esas columnas.
+
+Uso:
+    serializer = ModelSerializer(MeteorologicalData)
+    rows = serializer.query().filter(...).all()
+    return json_response({'data': serializer.dicts(rows)})
+
+    subset = serializer.project(request.args.get('fields'), always=('id', 'fecha_hora'))
+"""
+
+import json
+import decimal
+from datetime import datetime, date
+from flask import Response
+from sqlalchemy import Numeric
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+JSON_MIMETYPE = 'application/json'
+# Proyecciones distintas guardadas por serializador (combinaciones de fields=)
+MAX_PROJECTIONS = 64
+
+
+class InvalidFields(ValueError):
+    """Parámetro fields= con columnas que el modelo no tiene"""
+
+
+def _default(value):
+    """Tipos que el codificador no conoce (solo en la ruta sin orjson, o Decimal sueltos)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f'Tipo no serializable: {type(value).__name__}')
+
+
+def dumps(payload):
+    """Codifica a bytes JSON (orjson si está disponible)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Equivalente a jsonify(payload), status con el codificador rápido"""
+    return Response(dumps(payload), status=status, mimetype=JSON_MIMETYPE)
+
+
+class ModelSerializer:
+    """Columnas de un modelo con su conversión precalculada"""
+
+    def __init__(self, model, fields=None, defaults=None):
+        """
+        Args:
+            model: Modelo de database.py
+            fields (list): Nombres de atributo a incluir (por defecto todas las columnas)
+            defaults (dict): Valor para columnas NULL (p. ej. precipitacion_mm -> 0.0,
+                             igual que to_dict)
+        """
+        self.model = model
+        self.defaults = defaults or {}
+        self._projections = {}
+        mapper = model.__mapper__
+        names = fields or [attr.key for attr in mapper.column_attrs]
+
+        self.names = []
+        self.columns = []
+        self._numeric = []
+        for index, name in enumerate(names):
+            column = mapper.column_attrs[name].columns[0]
+            self.names.append(name)
+            self.columns.append(getattr(model, name))
+            # Numeric llega como Decimal -> float; datetime se deja al codificador
+            if isinstance(column.type, Numeric):
+                self._numeric.append(index)
+
+        self._defaults = [(self.names.index(name), value) for name, value in self.defaults.items()]
+
+    def project(self, fields, always=('id',)):
+        """
+        Serializador restringido a las columnas de un parámetro fields=
+
+        Args:
+            fields (str): Nombres separados por coma; vacío = todas las columnas
+            always (tuple): Columnas que se incluyen siempre (id, cursor de paginación)
+
+        Returns:
+            ModelSerializer: Proyección (se reutiliza entre peticiones)
+
+        Raises:
+            InvalidFields: Si se pide una columna inexistente
+        """
+        requested = {name.strip() for name in (fields or '').split(',') if name.strip()}
+        if not requested:
+            return self
+
+        unknown = sorted(requested - set(self.names))
+        if unknown:
+            raise InvalidFields(f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(self.names)}")
+
+        # Orden del modelo: misma proyección para cualquier orden en fields=
+        names = tuple(name for name in self.names if name in requested or name in always)
+        serializer = self._projections.get(names)
+        if serializer is None:
+            if len(self._projections) >= MAX_PROJECTIONS:
+                self._projections.clear()
+            defaults = {name: value for name, value in self.defaults.items() if name in names}
+            serializer = ModelSerializer(self.model, list(names), defaults)
+            self._projections[names] = serializer
+        return serializer
+
+    def query(self):
+        """Consulta de solo columnas sobre el modelo (admite filter/order_by/limit)"""
+        return self.model.query.with_entities(*self.columns)
+
+    def dicts(self, rows):
+        """Filas (tuplas) -> lista de dicts listos para codificar"""
+        names = self.names
+        numeric = self._numeric
+        defaults = self._defaults
+        if not numeric and not defaults:
+            return [dict(zip(names, row)) for row in rows]
+
+        result = []
+        for row in rows:
+            values = list(row)
+            for i in numeric:
+                value = values[i]
+                if value is not None:
+                    values[i] = float(value)
+            for i, default in defaults:
+                if values[i] is None:
+                    values[i] = default
+            result.append(dict(zip(names, values)))
+        return result
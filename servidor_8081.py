@@ -8,13 +8,14 @@ import sys
 import http.server
 import socketserver
 from pathlib import Path
+from compression import CompressedStaticHandler
 
 os.chdir(Path(__file__).parent)
 
 HOST = '0.0.0.0'
 PORT = 8000
 
-class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+class MyHTTPRequestHandler(CompressedStaticHandler, http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/' or self.path == '':
             self.path = '/index.html'
@@ -10,6 +10,7 @@ import http.server
 import socketserver
 import ssl
 from pathlib import Path
+from compression import CompressedStaticHandler
 import threading
 
 # Cambiar al directorio raíz de promotorapalmera para servir todos los archivos
@@ -20,7 +21,7 @@ HOST = '0.0.0.0'
 PORT_HTTP = 8081
 PORT_HTTPS = 8444  # Puerto alternativo para HTTPS
 
-class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+class MyHTTPRequestHandler(CompressedStaticHandler, http.server.SimpleHTTPRequestHandler):
     """Handler personalizado con soporte CORS"""
     
     def do_GET(self):
@@ -9,6 +9,7 @@ import http.server
 import socketserver
 import ssl
 from pathlib import Path
+from compression import CompressedStaticHandler
 import threading
 import time
 import socket
@@ -20,7 +21,7 @@ os.chdir(SERVIDOR_DIR)
 HOST = '0.0.0.0'
 PORT_HTTPS = 8082
 
-class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+class MyHTTPRequestHandler(CompressedStaticHandler, http.server.SimpleHTTPRequestHandler):
     """Handler personalizado con timeout aumentado"""
     
     timeout = 300  # 5 minutos de timeout
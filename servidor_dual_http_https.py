@@ -9,6 +9,7 @@ import http.server
 import socketserver
 import ssl
 from pathlib import Path
+from compression import CompressedStaticHandler
 import threading
 
 # Servir desde el directorio raíz de promotorapalmera
@@ -18,7 +19,7 @@ os.chdir(SERVIDOR_DIR)
 HOST = '0.0.0.0'
 PORT_HTTPS = 8082  # Puerto HTTPS (para móviles que fuerzan SSL)
 
-class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+class MyHTTPRequestHandler(CompressedStaticHandler, http.server.SimpleHTTPRequestHandler):
     """Handler personalizado con soporte CORS"""
     
     def do_GET(self):
@@ -9,6 +9,7 @@ import http.server
 import socketserver
 import threading
 from pathlib import Path
+from compression import CompressedStaticHandler
 
 # Cambiar al directorio del proyecto
 os.chdir(Path(__file__).parent)
@@ -16,7 +17,7 @@ os.chdir(Path(__file__).parent)
 PUERTOS = [9000, 8081]
 HOST = '0.0.0.0'
 
-class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+class MyHTTPRequestHandler(CompressedStaticHandler, http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         # Servir index.html por defecto
         if self.path == '/' or self.path == '':
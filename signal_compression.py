@@ -0,0 +1,319 @@
+"""
+Compresión de Series en la Ingesta (banda muerta + puerta oscilante)
+Proyecto de grado
+
+Los dispositivos reportan nivel, apertura y variables meteorológicas cada
+10-30 s aunque nada cambie, y cada muestra era una fila. Esta etapa
+opcional (INGEST_COMPRESSION_ENABLED) guarda solo las filas necesarias para
+reconstruir la serie, interpolando linealmente entre filas guardadas,
+dentro de la tolerancia de cada señal.
+
+Por señal (INGEST_COMPRESSION_SIGNALS, por tabla y columna):
+- Banda muerta (deadband, deadband_rel): cambios menores que
+  max(deadband, deadband_rel * |valor|) respecto al último valor aceptado se
+  consideran ruido y la señal no se mueve.
+- Puerta oscilante (tolerance, tolerance_rel): desde la última fila guardada
+  se mantiene el abanico de pendientes que pasan a menos de
+  max(tolerance, tolerance_rel * |valor|) de todas las muestras intermedias.
+  Una muestra solo queda retenida si la recta desde la última fila guardada
+  hasta ella cae dentro del abanico; si no, se guarda la anterior (la
+  retenida) y la puerta se reabre desde ella.
+
+Error máximo de reconstrucción por señal (interpolando entre filas
+guardadas): tolerance + deadband.
+
+Una fila se guarda si cualquiera de sus señales lo requiere. Además:
+- Columnas sin tolerancia (estado, tendencia, modo...): un cambio guarda la
+  fila retenida y la nueva.
+- Precipitación (precipitacion_mm): toda muestra distinta de cero se guarda,
+  así las sumas de lluvia no cambian.
+- Latido: al menos una fila cada INGEST_COMPRESSION_MAX_INTERVAL_S segundos
+  (tiempo de muestra); un flujo que deja de reportar guarda su retenida en la
+  siguiente escritura pasado ese tiempo.
+- Muestras tardías (anteriores a la última recibida) se guardan sin comprimir.
+
+La caché de últimos valores (latest_values.py) recibe todas las muestras
+antes de comprimir: el estado actual no depende de la fila retenida.
+
+El estado del algoritmo vive en el proceso: cada flujo debe llegar siempre
+al mismo proceso (gateway SQLite con un worker, o mqtt_bridge.py con
+--partition). Con varios workers HTTP recibiendo la misma estación, dejar
+la compresión desactivada.
+"""
+
+import time
+import threading
+from datetime import datetime
+from database import GateStatus, WaterLevel, MeteorologicalData
+from latest_values import latest_values
+
+# Tablas comprimibles y columnas que identifican cada flujo
+COMPRESSIBLE_MODELS = {model.__tablename__: model for model in (GateStatus, WaterLevel, MeteorologicalData)}
+STREAM_KEYS = {
+    GateStatus.__tablename__: ('estacion_id', 'numero_compuerta'),
+    WaterLevel.__tablename__: ('estacion_id',),
+    MeteorologicalData.__tablename__: ('estacion_id',),
+}
+
+# Columnas que no fuerzan el guardado (metadatos de la muestra)
+IGNORED_COLUMNS = {'fecha_hora', 'dispositivo_origen'}
+
+# Señales por intervalo cuya suma importa: nunca se descarta un valor distinto de cero
+ADDITIVE_SIGNALS = ('precipitacion_mm',)
+
+# Tolerancias por defecto (unidades de cada columna)
+DEFAULT_SIGNALS = {
+    'iot_nivel_agua': {
+        'nivel_m': {'deadband': 0.002, 'tolerance': 0.005},
+        'volumen_m3': {'tolerance_rel': 0.005},
+    },
+    'iot_estado_compuerta': {
+        'apertura_porcentaje': {'deadband': 0.2, 'tolerance': 0.5},
+        'valor_sensor_posicion': {'deadband': 0.2, 'tolerance': 0.5},
+        'caudal_m3s': {'deadband': 0.002, 'tolerance': 0.005, 'tolerance_rel': 0.01},
+    },
+    'iot_datos_meteorologicos': {
+        'temperatura_c': {'deadband': 0.1, 'tolerance': 0.2},
+        'humedad_porcentaje': {'deadband': 0.5, 'tolerance': 1.0},
+        'velocidad_viento_kmh': {'deadband': 0.5, 'tolerance': 1.0},
+        'direccion_viento_grados': {'deadband': 5, 'tolerance': 10},
+        'presion_atmosferica_hpa': {'deadband': 0.1, 'tolerance': 0.3},
+        'radiacion_solar_wm2': {'deadband': 5, 'tolerance': 10, 'tolerance_rel': 0.02},
+    },
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_seconds(when):
+    """Segundos desde 1970 (fechas sin zona se toman tal cual)"""
+    if when.tzinfo is not None:
+        return when.timestamp()
+    return (when - EPOCH).total_seconds()
+
+
+def merge_signals(base, overrides):
+    """Copia de `base` con las tolerancias de `overrides` (por tabla y columna)"""
+    merged = {table: dict(columns) for table, columns in base.items()}
+    for table, columns in (overrides or {}).items():
+        merged.setdefault(table, {}).update(columns)
+    return merged
+
+
+class SwingingDoor:
+    """Banda muerta + puerta oscilante de una señal"""
+
+    __slots__ = ('deadband', 'deadband_rel', 'tolerance', 'tolerance_rel',
+                 'accepted', 't0', 'v0', 'slope_min', 'slope_max')
+
+    def __init__(self, deadband=0.0, deadband_rel=0.0, tolerance=0.0, tolerance_rel=0.0):
+        self.deadband = deadband
+        self.deadband_rel = deadband_rel
+        self.tolerance = tolerance
+        self.tolerance_rel = tolerance_rel
+        self.accepted = None     # último valor que superó la banda muerta
+        self.t0 = None           # origen de la puerta (último punto guardado, valor real)
+        self.v0 = None
+        self.slope_min = float('-inf')
+        self.slope_max = float('inf')
+
+    def filter(self, value):
+        """Aplica la banda muerta; retorna el valor que ve la puerta"""
+        if value is None:
+            return None
+        value = float(value)
+        if self.accepted is not None:
+            band = max(self.deadband, self.deadband_rel * abs(self.accepted))
+            if abs(value - self.accepted) <= band:
+                return self.accepted
+        self.accepted = value
+        return value
+
+    def _bounds(self, t, value):
+        dt = t - self.t0
+        tolerance = max(self.tolerance, self.tolerance_rel * abs(value))
+        return (value - tolerance - self.v0) / dt, (value + tolerance - self.v0) / dt
+
+    def admits(self, t, value):
+        """True si la recta desde el origen hasta la muestra (valor real) cae en el abanico"""
+        if value is None or self.v0 is None or t <= self.t0:
+            return True
+        slope = (value - self.v0) / (t - self.t0)
+        return self.slope_min <= slope <= self.slope_max
+
+    def advance(self, t, value):
+        """Estrecha el abanico con una muestra (ya filtrada) que pasa a ser intermedia"""
+        if value is None or self.v0 is None or t <= self.t0:
+            return
+        low, high = self._bounds(t, value)
+        self.slope_min = max(self.slope_min, low)
+        self.slope_max = min(self.slope_max, high)
+
+    def restart(self, t, value):
+        """Reabre la puerta desde un punto guardado"""
+        self.t0 = t
+        self.v0 = value
+        self.slope_min = float('-inf')
+        self.slope_max = float('inf')
+
+
+class SignalStream:
+    """Estado de un flujo (tabla + estación/compuerta)"""
+
+    __slots__ = ('doors', 'held', 'held_t', 'held_values', 'archived_t', 'last_exact', 'last_seen', 'touched')
+
+    def __init__(self, signals):
+        self.doors = {name: SwingingDoor(**params) for name, params in signals.items()}
+        self.held = None           # última muestra recibida y no guardada
+        self.held_t = None
+        self.held_values = None    # sus valores reales (origen si se guarda)
+        self.archived_t = None     # instante de la última fila guardada
+        self.last_exact = None     # columnas sin tolerancia de la última muestra
+        self.last_seen = None      # fecha_hora de la última muestra
+        self.touched = time.monotonic()
+
+    def archive(self, t, values):
+        """Marca (t, values) como último punto guardado"""
+        for name, door in self.doors.items():
+            door.restart(t, values[name])
+        self.archived_t = t
+        self.held = None
+        self.held_t = None
+        self.held_values = None
+
+
+class IngestCompressor:
+    """Selecciona las filas a guardar por flujo con banda muerta + puerta oscilante"""
+
+    def __init__(self, signals=None, max_interval_s=900):
+        """
+        Args:
+            signals (dict): Tabla -> {columna: tolerancias} (por defecto DEFAULT_SIGNALS)
+            max_interval_s (float): Máximo entre filas guardadas de un flujo
+        """
+        self.enabled = False
+        self.signals = signals if signals is not None else DEFAULT_SIGNALS
+        self.max_interval_s = max_interval_s
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.stats = {'received': 0, 'stored': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('INGEST_COMPRESSION_ENABLED', self.enabled)
+        self.signals = merge_signals(self.signals, app.config.get('INGEST_COMPRESSION_SIGNALS'))
+        self.max_interval_s = app.config.get('INGEST_COMPRESSION_MAX_INTERVAL_S', self.max_interval_s)
+        if self.enabled:
+            app.logger.info(f"Compresión en la ingesta activa (latido {self.max_interval_s}s)")
+
+    def compress_groups(self, groups):
+        """
+        Reduce [(Modelo, filas)] a las filas que hay que guardar
+
+        Todas las filas pasan antes por la caché de últimos valores. Las tablas
+        sin señales configuradas (telemetría de bomba) pasan completas. Se
+        agregan las filas retenidas de flujos sin muestras por más de
+        max_interval_s.
+        """
+        result = []
+        with self._lock:
+            for model, rows in groups:
+                table = model.__tablename__
+                latest_values.update_rows(table, rows)
+                self.stats['received'] += len(rows)
+                if table in self.signals and table in STREAM_KEYS:
+                    kept = []
+                    for row in rows:
+                        kept.extend(self._process(table, row))
+                else:
+                    kept = list(rows)
+                self.stats['stored'] += len(kept)
+                result.append((model, kept))
+            result.extend(self._release_where(
+                lambda stream, now: now - stream.touched >= self.max_interval_s))
+        return result
+
+    def drain(self):
+        """Filas retenidas de todos los flujos (al detener el proceso)"""
+        with self._lock:
+            return self._release_where(lambda stream, now: True)
+
+    def release_idle(self):
+        """Filas retenidas de flujos sin muestras por más de max_interval_s"""
+        with self._lock:
+            return self._release_where(lambda stream, now: now - stream.touched >= self.max_interval_s)
+
+    def ratio(self):
+        """Muestras recibidas por fila guardada"""
+        stored = self.stats['stored']
+        return round(self.stats['received'] / stored, 2) if stored else None
+
+    def reset(self):
+        with self._lock:
+            self._streams.clear()
+            self.stats = {'received': 0, 'stored': 0}
+
+    def _process(self, table, row):
+        """Filas a guardar al recibir `row`: ninguna, la retenida, la actual o ambas"""
+        key = (table,) + tuple(row.get(column) for column in STREAM_KEYS[table])
+        stream = self._streams.get(key)
+        when = row['fecha_hora']
+        if when.tzinfo is not None:
+            when = when.replace(tzinfo=None)
+
+        if stream is None:
+            stream = self._streams[key] = SignalStream(self.signals[table])
+        elif stream.last_seen is not None and when <= stream.last_seen:
+            # Tardía o repetida: se guarda tal cual, sin alterar el flujo
+            return [row]
+        stream.touched = time.monotonic()
+        stream.last_seen = when
+
+        t = epoch_seconds(when)
+        # Reales: extremos de la recta guardada; filtrados: límites del abanico
+        values = {name: None if row.get(name) is None else float(row[name]) for name in stream.doors}
+        filtered = {name: door.filter(values[name]) for name, door in stream.doors.items()}
+        # Columnas sin tolerancia y presencia de cada señal (None <-> valor también fuerza)
+        exact = tuple((column, value) for column, value in row.items()
+                      if column not in stream.doors and column not in IGNORED_COLUMNS)
+        exact += tuple(value is None for value in values.values())
+
+        force = (stream.archived_t is None
+                 or exact != stream.last_exact
+                 or any(row.get(name) for name in ADDITIVE_SIGNALS)
+                 or t - stream.archived_t >= self.max_interval_s)
+        stream.last_exact = exact
+
+        if force:
+            stored = [stream.held] if stream.held is not None else []
+            stream.archive(t, values)
+            stored.append(row)
+            return stored
+
+        # Retener la muestra solo si la recta hasta ella respeta a todas las
+        # intermedias; si no, se guarda la retenida (que sí las respeta)
+        stored = []
+        if stream.held is not None and not all(door.admits(t, values[name]) for name, door in stream.doors.items()):
+            stored.append(stream.held)
+            stream.archive(stream.held_t, stream.held_values)
+        for name, door in stream.doors.items():
+            door.advance(t, filtered[name])
+        stream.held = row
+        stream.held_t = t
+        stream.held_values = values
+        return stored
+
+    def _release_where(self, condition):
+        """Guarda las retenidas de los flujos que cumplen condition(stream, now)"""
+        now = time.monotonic()
+        released = {}
+        for key, stream in self._streams.items():
+            if stream.held is not None and condition(stream, now):
+                released.setdefault(key[0], []).append(stream.held)
+                stream.archive(stream.held_t, stream.held_values)
+        groups = [(COMPRESSIBLE_MODELS[table], rows) for table, rows in released.items()]
+        self.stats['stored'] += sum(len(rows) for _, rows in groups)
+        return groups
+
+
+# Instancia global (ruta HTTP); mqtt_bridge.py crea la suya por proceso
+ingest_compressor = IngestCompressor()
@@ -4,17 +4,19 @@ Simulador ESP32 - Estación de Bombeo y Meteorológica
 Genera datos realistas de sensores y los inyecta en la API
 """
 
-import requests
 import time
 import random
 import math
 from datetime import datetime
+from store_forward import StoreForwardClient
 
 class ESP32Simulator:
     """Simula sensores de ESP32 para estación de bombeo y meteorología"""
     
-    def __init__(self, api_base="http://localhost:9000"):
+    def __init__(self, api_base="http://localhost:9000", spool_dir="spool/esp32"):
         self.api_base = api_base
+        # Spool en disco con reintentos: las muestras sobreviven a cortes de la API
+        self.client = StoreForwardClient(api_base, spool_dir)
         self.station_ids = [1, 2, 3, 4]
         self.station_states = {}
         for station_id in self.station_ids:
@@ -132,12 +134,11 @@ class ESP32Simulator:
         """Envía datos meteorológicos a la API"""
         try:
             data = self.simulate_meteorology(station_id)
-            url = f"{self.api_base}/api/meteorology"
-            response = requests.post(url, json=data, timeout=5)
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Meteorología: {response.status_code} - "
+            queued = self.client.send('/api/meteorology', data)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Meteorología: encolado - "
                   f"Est={station_id} T={data['temperatura_c']}°C, H={data['humedad_porcentaje']}%, "
                   f"V={data['velocidad_viento_ms']}m/s")
-            return response.status_code == 200
+            return queued
         except Exception as e:
             print(f"ERROR Meteorología: {e}")
             return False
@@ -146,13 +147,12 @@ class ESP32Simulator:
         """Envía datos de bombeo a la API"""
         try:
             data = self.simulate_pumping(station_id)
-            url = f"{self.api_base}/api/data"
-            response = requests.post(url, json=data, timeout=5)
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Bombeo: {response.status_code} - "
+            queued = self.client.send('/api/data', data)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Bombeo: encolado - "
                   f"Est={station_id} Compuerta={data['apertura_porcentaje']}%, "
                   f"Nivel={data['nivel_m']}m, "
                   f"Caudal={data['caudal_m3s']}m³/s")
-            return response.status_code == 200
+            return queued
         except Exception as e:
             print(f"ERROR Bombeo: {e}")
             return False
@@ -161,13 +161,12 @@ class ESP32Simulator:
         """Envía telemetria de bomba a la API"""
         try:
             data = self.simulate_pump_telemetry(station_id)
-            url = f"{self.api_base}/api/pump/telemetry"
-            response = requests.post(url, json=data, timeout=5)
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Telemetria Bomba: {response.status_code} - "
+            queued = self.client.send('/api/pump/telemetry', data)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Telemetria Bomba: encolado - "
                   f"Est={station_id} Estado={data['estado']}, "
                   f"Caudal={data['caudal_m3h']}m³/h, "
                   f"Temp={data['temperatura_motor_c']}°C")
-            return response.status_code == 200
+            return queued
         except Exception as e:
             print(f"ERROR Telemetria Bomba: {e}")
             return False
@@ -179,11 +178,13 @@ class ESP32Simulator:
         print("="*60)
         print(f"API Base: {self.api_base}")
         print(f"Intervalo: {interval} segundos")
+        print(f"Spool: {self.client.spool.directory}")
         print("\nIniciando simulación...")
         print("Presione Ctrl+C para detener")
         print("="*60)
         print()
         
+        self.client.start()
         iteration = 0
         while True:
             try:
@@ -196,11 +197,15 @@ class ESP32Simulator:
                     self.send_pump_telemetry(station_id)
                     time.sleep(0.2)
                 
+                status = self.client.get_status()
+                print(f"Enviados={status['sent']} Pendientes={status['pending_bytes']}B "
+                      f"Fallos consecutivos={status['consecutive_failures']}")
                 print(f"Esperando {interval} segundos...")
                 time.sleep(interval)
                 
             except KeyboardInterrupt:
                 print("\n\nSimulación detenida")
+                self.client.stop()
                 break
             except Exception as e:
                 print(f"Error en simulación: {e}")
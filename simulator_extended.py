@@ -10,21 +10,24 @@ Fecha: 20 de febrero de 2026
 
 import random
 import time
-import requests
 from datetime import datetime
 import json
+from store_forward import StoreForwardClient
 
 # Configuración
 API_BASE_URL = "http://localhost:5000/api"
 STATION_ID = 1
 PUMP_ID = 1
 UPDATE_INTERVAL = 10  # segundos
+SPOOL_DIR = "spool/simulator_extended"
 
 class ExtendedSensorSimulator:
     def __init__(self):
         self.pump_running = False
         self.running_hours = 0.0
         self.last_rainfall = 0.0
+        # Spool en disco: los datos se reenvían cuando el servidor vuelve
+        self.client = StoreForwardClient(API_BASE_URL, SPOOL_DIR)
     
     def generate_meteorological_data(self):
         """Generar datos meteorológicos sintéticos"""
@@ -129,21 +132,11 @@ class ExtendedSensorSimulator:
         }
     
     def send_data(self, endpoint, data):
-        """Enviar datos al API"""
+        """Encolar datos para el API (store-and-forward)"""
         try:
-            url = f"{API_BASE_URL}/{endpoint}"
-            response = requests.post(url, json=data, timeout=5)
-            
-            if response.status_code == 200:
-                print(f"✅ {endpoint}: {response.json().get('message', 'OK')}")
-                return True
-            else:
-                print(f"❌ {endpoint}: Error {response.status_code} - {response.text}")
-                return False
-        
-        except requests.exceptions.ConnectionError:
-            print(f"❌ {endpoint}: No se pudo conectar al servidor")
-            return False
+            self.client.send(f"/{endpoint}", data)
+            print(f"📥 {endpoint}: encolado")
+            return True
         except Exception as e:
             print(f"❌ {endpoint}: {str(e)}")
             return False
@@ -160,6 +153,7 @@ class ExtendedSensorSimulator:
         print("💡 Presiona Ctrl+C para detener\n")
         
         cycle = 0
+        self.client.start()
         
         try:
             while True:
@@ -190,6 +184,7 @@ class ExtendedSensorSimulator:
             print("\n\n⏹️  Simulador detenido por el usuario")
             print(f"📊 Total de ciclos ejecutados: {cycle}")
             print(f"⏱️  Horas de bomba simuladas: {self.running_hours:.2f}h\n")
+            self.client.stop()
 
 
 class OneTimeBatchSimulator:
@@ -204,6 +199,7 @@ class OneTimeBatchSimulator:
         
         total_records = hours * (60 // interval_minutes)
         simulator = ExtendedSensorSimulator()
+        simulator.client.start()
         success_count = 0
         
         for i in range(total_records):
@@ -229,7 +225,11 @@ class OneTimeBatchSimulator:
             if (i + 1) % 10 == 0:
                 print(f"Progreso: {i+1}/{total_records} registros ({(i+1)/total_records*100:.1f}%)")
         
-        print(f"\n✅ Generación completada: {success_count} registros enviados")
+        # Esperar a que el spool se vacíe (lo pendiente se envía en la próxima ejecución)
+        simulator.client.stop(drain_timeout=60)
+        status = simulator.client.get_status()
+        print(f"\n✅ Generación completada: {success_count} registros encolados, "
+              f"{status['sent']} enviados, {status['pending_bytes']} bytes pendientes")
 
 
 if __name__ == '__main__':
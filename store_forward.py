@@ -0,0 +1,402 @@
+"""
+Cliente Store-and-Forward para Simuladores y Dispositivos
+Proyecto de grado
+
+Evita la pérdida de muestras cuando la API está lenta o caída:
+- Cada muestra se agrega primero a un spool en disco (archivos JSONL de solo anexado)
+- Un hilo de envío lee el spool en orden y lo entrega a la API
+- Las lecturas de compuerta/nivel se agrupan y se suben a /api/data/batch
+- Reintentos con espera exponencial + jitter (y respeto de Retry-After)
+- El cursor de lectura solo avanza tras una entrega confirmada (al menos una vez)
+- Solo los registros rechazados por validación (400/413/422) pasan a un
+  archivo de descarte; cualquier otro error (5xx, caída de la base) se reintenta
+
+Uso:
+    client = StoreForwardClient('http://localhost:9000', 'spool/esp32')
+    client.start()
+    client.send('/api/data', {...})
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+import requests
+from http_transport import get_session, post_json, GZIP_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Endpoints que aceptan lotes: endpoint individual -> endpoint de lote
+BATCH_ENDPOINTS = {
+    '/api/data': '/api/data/batch'
+}
+
+# Códigos HTTP que indican que el registro es inválido (se descarta). Cualquier
+# otro error, incluidos los 500 por una base caída, es transitorio y se reintenta.
+REJECTED_STATUS = {400, 413, 422}
+
+
+class DiskSpool:
+    """
+    Cola persistente de solo anexado en disco
+
+    Los registros se escriben en segmentos 'spool-NNNNNNNN.jsonl'. El archivo
+    'cursor.json' guarda el segmento y la posición (bytes) del siguiente
+    registro por entregar. Los segmentos ya entregados se eliminan.
+    """
+
+    def __init__(self, directory, max_segment_bytes=4 * 1024 * 1024,
+                 max_total_bytes=512 * 1024 * 1024, fsync=False):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_total_bytes = max_total_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self.dropped_segments = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.cursor_path = os.path.join(directory, 'cursor.json')
+        self.dead_letter_path = os.path.join(directory, 'descartados.jsonl')
+
+        segments = self._segments()
+        self._write_segment = segments[-1] if segments else 1
+        self._write_file = None
+        self.cursor = self._load_cursor(segments)
+
+    # ------------------------------------------------------------------
+    # Segmentos y cursor
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'spool-{number:08d}.jsonl')
+
+    def _segments(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('spool-') and name.endswith('.jsonl'):
+                try:
+                    numbers.append(int(name[6:-6]))
+                except ValueError:
+                    continue
+        return sorted(numbers)
+
+    def _load_cursor(self, segments):
+        try:
+            with open(self.cursor_path, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+            return int(cursor['segment']), int(cursor['offset'])
+        except (OSError, ValueError, KeyError):
+            return (segments[0] if segments else 1), 0
+
+    def _save_cursor(self, cursor):
+        tmp_path = self.cursor_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'segment': cursor[0], 'offset': cursor[1]}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.cursor_path)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def append(self, endpoint, payload):
+        """Agrega un registro al final del spool"""
+        line = json.dumps({'e': endpoint, 'p': payload}, separators=(',', ':'), default=str) + '\n'
+        data = line.encode('utf-8')
+
+        with self._lock:
+            if self._write_file is None:
+                self._write_file = open(self._segment_path(self._write_segment), 'ab')
+
+            if self._write_file.tell() + len(data) > self.max_segment_bytes and self._write_file.tell() > 0:
+                self._write_file.close()
+                self._write_segment += 1
+                self._write_file = open(self._segment_path(self._write_segment), 'ab')
+                self._enforce_size_limit()
+
+            self._write_file.write(data)
+            self._write_file.flush()
+            if self.fsync:
+                os.fsync(self._write_file.fileno())
+
+    def _enforce_size_limit(self):
+        """Descarta los segmentos más antiguos si el spool excede el tamaño máximo"""
+        segments = self._segments()
+        total = sum(os.path.getsize(self._segment_path(n)) for n in segments)
+
+        while total > self.max_total_bytes and len(segments) > 1:
+            oldest = segments.pop(0)
+            size = os.path.getsize(self._segment_path(oldest))
+            os.remove(self._segment_path(oldest))
+            total -= size
+            self.dropped_segments += 1
+            if self.cursor[0] <= oldest:
+                self.cursor = (segments[0], 0)
+                self._save_cursor(self.cursor)
+            logger.warning(f"Spool lleno: segmento {oldest} descartado ({size} bytes)")
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def read(self, max_records):
+        """
+        Lee registros pendientes a partir del cursor sin consumirlos
+
+        Returns:
+            list: Tuplas (cursor_siguiente, endpoint, payload) en orden
+        """
+        records = []
+        with self._lock:
+            if self._write_file is not None:
+                self._write_file.flush()
+            segment, offset = self.cursor
+            last_segment = self._write_segment
+
+        while len(records) < max_records and segment <= last_segment:
+            path = self._segment_path(segment)
+            if not os.path.exists(path):
+                segment, offset = segment + 1, 0
+                continue
+
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                while len(records) < max_records:
+                    line = f.readline()
+                    # Línea incompleta: escritura en curso o corte de energía
+                    if not line or not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Registro corrupto omitido en segmento {segment}")
+                        continue
+                    records.append(((segment, offset), record['e'], record['p']))
+
+            if len(records) >= max_records or segment == last_segment:
+                break
+            segment, offset = segment + 1, 0
+
+        return records
+
+    def commit(self, cursor):
+        """Marca como entregado todo lo anterior al cursor"""
+        with self._lock:
+            self.cursor = cursor
+            self._save_cursor(cursor)
+            for number in self._segments():
+                if number < cursor[0]:
+                    os.remove(self._segment_path(number))
+
+    def dead_letter(self, endpoint, payload, reason):
+        """Guarda un registro rechazado permanentemente"""
+        entry = {'e': endpoint, 'p': payload, 'error': reason, 'fecha': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with self._lock:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+
+    def pending_bytes(self):
+        """Bytes pendientes de entrega (aproximado)"""
+        total = 0
+        for number in self._segments():
+            if number >= self.cursor[0]:
+                total += os.path.getsize(self._segment_path(number))
+        return max(0, total - self.cursor[1])
+
+    def close(self):
+        with self._lock:
+            if self._write_file is not None:
+                self._write_file.close()
+                self._write_file = None
+
+
+class DeliveryError(Exception):
+    """Error transitorio de entrega (se reintentará)"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class StoreForwardClient:
+    """Cliente HTTP con spool en disco, reintentos y subida en lotes"""
+
+    def __init__(self, api_base, spool_dir, batch_size=200, flush_interval=2.0,
+                 min_backoff=1.0, max_backoff=300.0, timeout=10, session=None,
+                 batch_endpoints=None, fsync=False, gzip_body=GZIP_REQUESTS):
+        self.api_base = api_base.rstrip('/')
+        self.spool = DiskSpool(spool_dir, fsync=fsync)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # Sesión compartida con keep-alive (ver http_transport.py)
+        self.session = session or get_session()
+        self.gzip_body = gzip_body
+        self.batch_endpoints = BATCH_ENDPOINTS if batch_endpoints is None else batch_endpoints
+        # Cursores de registros ya entregados o descartados que aún no se pueden
+        # confirmar en el spool (hay un registro anterior pendiente)
+        self._settled = set()
+
+        self.running = False
+        self.thread = None
+        self._wakeup = threading.Event()
+        self.failures = 0
+        self.stats = {'sent': 0, 'requests': 0, 'retries': 0, 'dead_letter': 0}
+
+    def send(self, endpoint, payload):
+        """Encola una muestra en el spool (nunca bloquea por la red)"""
+        self.spool.append(endpoint, payload)
+        if self.running:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        """Inicia el hilo de envío en segundo plano"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='store-forward', daemon=True)
+        self.thread.start()
+
+    def stop(self, drain_timeout=5.0):
+        """Detiene el hilo intentando entregar lo pendiente"""
+        if not self.running:
+            return
+        deadline = time.time() + drain_timeout
+        while time.time() < deadline and self.failures == 0 and self.spool.read(1):
+            self._wakeup.set()
+            time.sleep(0.1)
+        self.running = False
+        self._wakeup.set()
+        self.thread.join(timeout=drain_timeout)
+        self.spool.close()
+
+    def _run(self):
+        while self.running:
+            try:
+                delivered = self.flush_once()
+                self.failures = 0
+                if delivered >= self.batch_size:
+                    continue  # quedan más registros: seguir drenando
+                wait = self.flush_interval
+            except DeliveryError as e:
+                self.failures += 1
+                self.stats['retries'] += 1
+                backoff = min(self.max_backoff, self.min_backoff * (2 ** min(self.failures, 16)))
+                wait = e.retry_after if e.retry_after else backoff * random.uniform(0.5, 1.0)
+                logger.warning(f"Entrega fallida ({e}); reintento en {wait:.1f}s")
+            except Exception as e:
+                logger.error(f"Error en store-and-forward: {e}")
+                wait = self.flush_interval
+
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def flush_once(self):
+        """
+        Entrega un bloque de registros pendientes
+
+        Los registros se agrupan por endpoint (orden preservado dentro de cada
+        uno) para que las lecturas intercaladas también viajen en lote.
+
+        Returns:
+            int: Registros entregados (o descartados)
+
+        Raises:
+            DeliveryError: Si la API no está disponible; el cursor queda en el
+                último registro confirmado
+        """
+        records = self.spool.read(self.batch_size)
+        if not records:
+            return 0
+
+        # Agrupar por endpoint conservando el orden dentro de cada endpoint;
+        # los registros ya entregados en un intento anterior no se reenvían
+        groups = {}
+        for record in records:
+            if record[0] not in self._settled:
+                groups.setdefault(record[1], []).append(record)
+
+        try:
+            for endpoint, group in groups.items():
+                self._deliver_group(endpoint, group)
+        except DeliveryError:
+            # Confirmar el prefijo ya entregado; el resto queda en el spool y lo
+            # entregado fuera del prefijo se recuerda en _settled
+            prefix = 0
+            for record in records:
+                if record[0] not in self._settled:
+                    break
+                prefix += 1
+            if prefix:
+                self.spool.commit(records[prefix - 1][0])
+                self._settled.difference_update(record[0] for record in records[:prefix])
+            raise
+
+        self.spool.commit(records[-1][0])
+        self._settled.clear()
+        return len(records)
+
+    def _deliver_group(self, endpoint, group):
+        batch_endpoint = self.batch_endpoints.get(endpoint)
+
+        if batch_endpoint and len(group) > 1:
+            payloads = [payload for _, _, payload in group]
+            status = self._post(batch_endpoint, {'records': payloads})
+            if status < 400:
+                self.stats['sent'] += len(group)
+                self._settled.update(cursor for cursor, _, _ in group)
+                return
+            # Lote rechazado: enviar uno a uno para aislar el registro inválido
+
+        for cursor, _, payload in group:
+            status = self._post(endpoint, payload)
+            if status < 400:
+                self.stats['sent'] += 1
+            else:
+                self.spool.dead_letter(endpoint, payload, f'HTTP {status}')
+                self.stats['dead_letter'] += 1
+                logger.warning(f"Registro descartado por {endpoint}: HTTP {status}")
+            # Entregado o descartado: no se vuelve a enviar si falla uno posterior
+            self._settled.add(cursor)
+
+    def _post(self, endpoint, body):
+        """
+        POST con clasificación de errores
+
+        Returns:
+            int: Código HTTP si se aceptó (< 400) o se rechazó por validación (REJECTED_STATUS)
+
+        Raises:
+            DeliveryError: Cualquier otro error (conexión, 5xx, 401/403/404...)
+        """
+        try:
+            response = post_json(self.session, f"{self.api_base}{endpoint}", body, self.timeout, self.gzip_body)
+        except requests.exceptions.RequestException as e:
+            raise DeliveryError(f"conexión: {e}")
+
+        self.stats['requests'] += 1
+        if response.status_code >= 400 and response.status_code not in REJECTED_STATUS:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise DeliveryError(f"HTTP {response.status_code}", retry_after)
+
+        return response.status_code
+
+    def get_status(self):
+        """Estado del cliente para mostrar en consola"""
+        return {
+            **self.stats,
+            'pending_bytes': self.spool.pending_bytes(),
+            'consecutive_failures': self.failures
+        }
@@ -0,0 +1,19 @@
+"""
+Configuración común de las pruebas
+
+Las pruebas usan la aplicación en modo gateway (SQLite local en un archivo
+temporal), así que no necesitan MySQL. Las variables se fijan antes de
+importar config.py.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+TEST_DIR = tempfile.mkdtemp(prefix='estacion_pruebas_')
+os.environ['DB_MODE'] = 'sqlite'
+os.environ['SQLITE_LOCAL_PATH'] = os.path.join(TEST_DIR, 'estacion_pruebas.db')
@@ -0,0 +1,223 @@
+"""
+Pruebas del repositorio de consultas (repository.py)
+
+Cada función se ejecuta contra una base SQLite con filas sembradas y su
+resultado se compara con la consulta Model.query que reemplazó.
+"""
+
+import io
+import contextlib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import desc, func
+
+import repository
+from database import (
+    db, GateStatus, WaterLevel, MeteorologicalData, PumpTelemetry,
+    AlertThreshold, AutomaticControlLog, MonitoringStation, NotificationContact
+)
+
+BASE = datetime(2024, 3, 1, 8, 0, 0)
+
+
+def ids(records):
+    return [record.id for record in records]
+
+
+@pytest.fixture(scope='module')
+def app_context():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app
+    with app.app_context():
+        db.create_all()
+        seed()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def seed():
+    """Dos estaciones y dos bombas con filas insertadas fuera de orden"""
+    minutes = [30, 5, 50, 15, 40, 0, 25, 55, 10, 45, 20, 35]
+    for station_id in (1, 2):
+        for index, minute in enumerate(minutes):
+            when = BASE + timedelta(minutes=minute + station_id)
+            db.session.add(GateStatus(estacion_id=station_id, numero_compuerta=1, estado='ABIERTA',
+                                      apertura_porcentaje=index * 5, caudal_m3s=index * 0.1, fecha_hora=when))
+            db.session.add(WaterLevel(estacion_id=station_id, nivel_m=1 + index * 0.05, fecha_hora=when))
+            db.session.add(MeteorologicalData(estacion_id=station_id, temperatura_c=20 + index,
+                                              precipitacion_mm=(index % 3) * 0.5, fecha_hora=when))
+    for bomba_id in (1, 2):
+        for index, minute in enumerate(minutes):
+            when = BASE + timedelta(minutes=minute, seconds=bomba_id)
+            db.session.add(PumpTelemetry(bomba_id=bomba_id, estado='ENCENDIDA' if index % 2 else 'APAGADO',
+                                         fecha_hora=when))
+            db.session.add(AutomaticControlLog(bomba_id=bomba_id, estacion_id=bomba_id, accion='ENCENDER',
+                                               estado_ejecucion='EXITOSO', fecha_hora=when))
+
+    db.session.add_all([
+        AlertThreshold(nombre_parametro='nivel_agua', valor_maximo=3, nivel_alerta='HIGH', activo=True),
+        AlertThreshold(nombre_parametro='nivel_agua', valor_minimo=0.5, nivel_alerta='MEDIUM', activo=True),
+        AlertThreshold(nombre_parametro='nivel_agua', valor_maximo=5, nivel_alerta='CRITICAL', activo=False),
+        AlertThreshold(nombre_parametro='precipitacion', valor_maximo=50, nivel_alerta='HIGH', activo=True),
+        MonitoringStation(nombre='Estación A', activo=True, control_automatico_habilitado=True),
+        MonitoringStation(nombre='Estación B', activo=True, control_automatico_habilitado=False),
+        MonitoringStation(nombre='Estación C', activo=False, control_automatico_habilitado=True),
+        MonitoringStation(nombre='Estación D', activo=True, control_automatico_habilitado=True),
+        NotificationContact(nombre='Operador', recibir_critico=True, recibir_alto=True,
+                            recibir_medio=False, recibir_bajo=False, activo=True),
+        NotificationContact(nombre='Supervisor', recibir_critico=True, recibir_alto=False,
+                            recibir_medio=True, recibir_bajo=True, activo=True),
+        NotificationContact(nombre='Retirado', recibir_critico=True, recibir_alto=True,
+                            recibir_medio=True, recibir_bajo=True, activo=False),
+    ])
+    db.session.commit()
+
+
+# =====================================================================
+# ÚLTIMA LECTURA POR ESTACIÓN / BOMBA
+# =====================================================================
+
+@pytest.mark.parametrize('station_id', [1, 2, 99])
+def test_latest_gate_status(app_context, station_id):
+    expected = GateStatus.query.filter_by(estacion_id=station_id).order_by(desc(GateStatus.fecha_hora)).first()
+    assert repository.latest_gate_status(station_id) == expected
+
+
+@pytest.mark.parametrize('minutes', [0, 12, 33, 120])
+def test_gate_status_before(app_context, minutes):
+    when = BASE + timedelta(minutes=minutes)
+    expected = GateStatus.query.filter(
+        GateStatus.estacion_id == 1,
+        GateStatus.fecha_hora < when
+    ).order_by(desc(GateStatus.fecha_hora)).first()
+    assert repository.gate_status_before(1, when) == expected
+
+
+@pytest.mark.parametrize('station_id', [1, 2, 99])
+def test_latest_water_level(app_context, station_id):
+    expected = WaterLevel.query.filter_by(estacion_id=station_id).order_by(desc(WaterLevel.fecha_hora)).first()
+    assert repository.latest_water_level(station_id) == expected
+    if station_id != 99:
+        assert expected is not None
+
+
+@pytest.mark.parametrize('bomba_id', [1, 2, 99])
+def test_latest_pump_telemetry(app_context, bomba_id):
+    expected = PumpTelemetry.query.filter_by(bomba_id=bomba_id).order_by(desc(PumpTelemetry.fecha_hora)).first()
+    assert repository.latest_pump_telemetry(bomba_id) == expected
+
+
+@pytest.mark.parametrize('bomba_id', [1, 2, 99])
+def test_latest_control_log(app_context, bomba_id):
+    expected = AutomaticControlLog.query.filter_by(
+        bomba_id=bomba_id
+    ).order_by(desc(AutomaticControlLog.fecha_hora)).first()
+    assert repository.latest_control_log(bomba_id) == expected
+
+
+# =====================================================================
+# RANGOS POR FECHA
+# =====================================================================
+
+@pytest.mark.parametrize('minutes', [0, 20, 60])
+def test_water_levels_since(app_context, minutes):
+    start = BASE + timedelta(minutes=minutes)
+    expected = WaterLevel.query.filter(
+        WaterLevel.estacion_id == 1,
+        WaterLevel.fecha_hora >= start
+    ).order_by(WaterLevel.fecha_hora).all()
+    assert ids(repository.water_levels_since(1, start)) == ids(expected)
+
+
+def test_water_levels_since_after_id(app_context):
+    start = BASE + timedelta(minutes=10)
+    after_id = sorted(ids(WaterLevel.query.filter_by(estacion_id=1).all()))[5]
+    expected = WaterLevel.query.filter(
+        WaterLevel.estacion_id == 1,
+        WaterLevel.fecha_hora >= start,
+        WaterLevel.id > after_id
+    ).order_by(WaterLevel.fecha_hora).all()
+    result = repository.water_levels_since(1, start, after_id=after_id)
+    assert ids(result) == ids(expected)
+    assert 0 < len(result) < len(repository.water_levels_since(1, start))
+
+
+def test_gate_statuses_between(app_context):
+    start = BASE + timedelta(minutes=10)
+    end = BASE + timedelta(minutes=41)
+    expected = GateStatus.query.filter(
+        GateStatus.estacion_id == 2,
+        GateStatus.fecha_hora >= start,
+        GateStatus.fecha_hora <= end
+    ).order_by(GateStatus.fecha_hora).all()
+    assert ids(repository.gate_statuses_between(2, start, end)) == ids(expected)
+
+
+def test_gate_statuses_between_open_end(app_context):
+    start = BASE + timedelta(minutes=10)
+    expected = GateStatus.query.filter(
+        GateStatus.estacion_id == 2,
+        GateStatus.fecha_hora >= start
+    ).order_by(GateStatus.fecha_hora).all()
+    assert ids(repository.gate_statuses_between(2, start)) == ids(expected)
+
+
+def test_meteorology_between(app_context):
+    start = BASE + timedelta(minutes=5)
+    end = BASE + timedelta(minutes=36)
+    expected = MeteorologicalData.query.filter(
+        MeteorologicalData.estacion_id == 1,
+        MeteorologicalData.fecha_hora >= start,
+        MeteorologicalData.fecha_hora <= end
+    ).all()
+    assert sorted(ids(repository.meteorology_between(1, start, end))) == sorted(ids(expected))
+
+
+@pytest.mark.parametrize('station_id, minutes', [(1, 0), (1, 30), (2, 15), (1, 120), (99, 0)])
+def test_rainfall_total(app_context, station_id, minutes):
+    since = BASE + timedelta(minutes=minutes)
+    result = db.session.query(func.sum(MeteorologicalData.precipitacion_mm)).filter(
+        MeteorologicalData.estacion_id == station_id,
+        MeteorologicalData.fecha_hora >= since
+    ).scalar()
+    expected = float(result) if result else 0.0
+    assert repository.rainfall_total(station_id, since) == pytest.approx(expected)
+
+
+# =====================================================================
+# CONFIGURACIÓN (UMBRALES, ESTACIONES, CONTACTOS)
+# =====================================================================
+
+def test_active_thresholds(app_context):
+    expected = AlertThreshold.query.filter_by(activo=True).all()
+    assert sorted(ids(repository.active_thresholds())) == sorted(ids(expected))
+    assert len(expected) == 3
+
+
+@pytest.mark.parametrize('parameter', ['nivel_agua', 'precipitacion', 'caudal'])
+def test_thresholds_for_parameter(app_context, parameter):
+    expected = AlertThreshold.query.filter_by(nombre_parametro=parameter, activo=True).all()
+    assert sorted(ids(repository.thresholds_for_parameter(parameter))) == sorted(ids(expected))
+
+
+def test_auto_control_stations(app_context):
+    expected = MonitoringStation.query.filter_by(control_automatico_habilitado=True, activo=True).all()
+    assert sorted(ids(repository.auto_control_stations())) == sorted(ids(expected))
+    assert len(expected) == 2
+
+
+@pytest.mark.parametrize('severity, flag', [
+    ('CRITICAL', 'recibir_critico'),
+    ('HIGH', 'recibir_alto'),
+    ('MEDIUM', 'recibir_medio'),
+    ('LOW', 'recibir_bajo'),
+    ('UNKNOWN', None),
+])
+def test_notification_recipients(app_context, severity, flag):
+    query = NotificationContact.query.filter_by(activo=True)
+    if flag:
+        query = query.filter_by(**{flag: True})
+    expected = query.all()
+    assert sorted(ids(repository.notification_recipients(severity))) == sorted(ids(expected))
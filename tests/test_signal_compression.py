@@ -0,0 +1,93 @@
+"""
+Pruebas de la compresión en la ingesta (signal_compression.py)
+
+Verifican la cota de error de reconstrucción: al interpolar linealmente
+entre las filas guardadas, ninguna muestra original queda a más de
+tolerance + deadband.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import WaterLevel
+from signal_compression import IngestCompressor, DEFAULT_SIGNALS, epoch_seconds
+
+
+def random_walk(samples, sigma, seed, start=2.0, interval_s=10):
+    """Filas de iot_nivel_agua con un paseo aleatorio gaussiano"""
+    rng = random.Random(seed)
+    when = datetime(2024, 1, 1)
+    level = start
+    rows = []
+    for _ in range(samples):
+        rows.append({'estacion_id': 1, 'fecha_hora': when, 'nivel_m': level})
+        level += rng.gauss(0, sigma)
+        when += timedelta(seconds=interval_s)
+    return rows
+
+
+def compress(rows, signals, max_interval_s=900):
+    compressor = IngestCompressor(signals=signals, max_interval_s=max_interval_s)
+    stored = []
+    for start in range(0, len(rows), 50):
+        for _, kept in compressor.compress_groups([(WaterLevel, rows[start:start + 50])]):
+            stored.extend(kept)
+    for _, kept in compressor.drain():
+        stored.extend(kept)
+    return stored
+
+
+def max_reconstruction_error(rows, stored):
+    """Mayor distancia entre cada muestra y la interpolación de las guardadas"""
+    points = sorted((epoch_seconds(row['fecha_hora']), row['nivel_m']) for row in stored)
+    worst = 0.0
+    index = 0
+    for row in rows:
+        t = epoch_seconds(row['fecha_hora'])
+        while index + 1 < len(points) and points[index + 1][0] < t:
+            index += 1
+        t0, v0 = points[index]
+        t1, v1 = points[min(index + 1, len(points) - 1)]
+        estimate = v0 if t1 == t0 else v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+        worst = max(worst, abs(estimate - row['nivel_m']))
+    return worst
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('sigma', [0.001, 0.003, 0.01])
+def test_tolerance_only_bound(seed, sigma):
+    rows = random_walk(5000, sigma, seed)
+    signals = {'iot_nivel_agua': {'nivel_m': {'deadband': 0.0, 'tolerance': 0.005}}}
+
+    stored = compress(rows, signals)
+
+    assert stored[0] is rows[0] and stored[-1] is rows[-1]
+    assert max_reconstruction_error(rows, stored) <= 0.005 + 1e-9
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('sigma', [0.001, 0.003, 0.01])
+def test_default_signals_bound(seed, sigma):
+    rows = random_walk(5000, sigma, seed)
+    params = DEFAULT_SIGNALS['iot_nivel_agua']['nivel_m']
+    signals = {'iot_nivel_agua': {'nivel_m': params}}
+
+    stored = compress(rows, signals)
+
+    bound = params['tolerance'] + params['deadband']
+    assert max_reconstruction_error(rows, stored) <= bound + 1e-9
+    assert len(stored) < len(rows)
+
+
+def test_constant_signal_keeps_heartbeat_only():
+    rows = random_walk(1000, 0.0, seed=0)
+    signals = {'iot_nivel_agua': {'nivel_m': {'deadband': 0.002, 'tolerance': 0.005}}}
+
+    stored = compress(rows, signals, max_interval_s=900)
+
+    # 1000 muestras cada 10 s: en cada latido (900 s) se guardan la retenida
+    # y la actual, más la primera y la última
+    assert len(stored) <= 2 * (1000 * 10 // 900) + 2
+    assert max_reconstruction_error(rows, stored) == 0.0
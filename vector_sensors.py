@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Simulación Vectorizada de Sensores - Río León (estructura de arreglos)
+Proyecto de grado
+
+Núcleo de simulación alternativo a los sensores por objeto de sensores_rio_leon.py:
+- Todos los sensores de un mismo tipo avanzan un paso juntos con NumPy
+- Estado en arreglos (valor, objetivo, modo, calidad...) en lugar de un objeto por sensor
+- Ruido, deriva, filtros de retraso y calidad vectorizados
+- Generador aleatorio con semilla (numpy.random.Generator): resultados reproducibles
+- Factores estacionales/diarios calculados una vez por paso a partir del tiempo simulado
+
+Las ecuaciones son las mismas de FreaticsLevelSensor, RiverLevelSensor,
+FlowVelocitySensor y GatePositionSensor.
+
+Uso:
+    sim = VectorRioLeonSimulator.from_fleet(sensors=100000, stations=50, seed=42)
+    sim.step(datetime(2024, 10, 1, 15, 0))
+    python vector_sensors.py --sensors 250000 --steps 4
+"""
+
+import math
+import time
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+
+from config_chigorodo import ChigodoHydrologicalModel, CHIGORODO_CLIMATE, RIO_LEON
+
+# Códigos de calidad (arreglo int8)
+QUALITY_GOOD, QUALITY_UNCERTAIN, QUALITY_BAD = 0, 1, 2
+QUALITY_NAMES = ['GOOD', 'UNCERTAIN', 'BAD']
+
+# Modos de operación de compuerta (arreglo int8)
+MODE_AUTO, MODE_MANUAL, MODE_EMERGENCY = 0, 1, 2
+MODE_NAMES = ['AUTO', 'MANUAL', 'EMERGENCY']
+
+# Inicio de operación usado por la deriva por envejecimiento
+DRIFT_EPOCH = datetime(2024, 1, 1)
+
+
+class StepContext:
+    """Factores comunes de un paso de simulación (se calculan una sola vez)"""
+
+    def __init__(self, when, model):
+        self.when = when
+        self.t = when.timestamp()
+        self.hour = when.hour
+        self.seasonal = model.get_seasonal_factor(when.month)
+        self.daily = model.get_daily_variation_factor(when.hour)
+        self.days_operating = (when - DRIFT_EPOCH).days
+
+        # Precipitación: base según época del año por franja horaria
+        if when.month in CHIGORODO_CLIMATE.dry_season_months:
+            base_precipitation = 0.3
+        elif when.month in CHIGORODO_CLIMATE.wet_season_months:
+            base_precipitation = 1.8
+        else:
+            base_precipitation = 1.0
+        daily_rain = 1.5 if 14 <= when.hour <= 20 else 1.0
+        self.precipitation_base = base_precipitation * daily_rain
+
+
+class VectorSensorGroup:
+    """Sensores de un mismo tipo almacenados como arreglos paralelos"""
+
+    sensor_type = None
+
+    def __init__(self, configs, rng):
+        self.rng = rng
+        self.size = len(configs)
+        self.sensor_ids = np.array([c.sensor_id for c in configs], dtype=np.int64)
+        self.station_ids = np.array([c.station_id for c in configs], dtype=np.int32)
+        self.min_value = np.array([c.min_value for c in configs], dtype=np.float64)
+        self.max_value = np.array([c.max_value for c in configs], dtype=np.float64)
+        self.precision = np.array([c.precision for c in configs], dtype=np.float64)
+        self.noise_factor = np.array([c.noise_factor for c in configs], dtype=np.float64)
+        self.seasonal_mask = np.array([c.seasonal_influence for c in configs], dtype=bool)
+        self.tidal_mask = np.array([c.tidal_influence for c in configs], dtype=bool)
+
+        self.values = rng.uniform(self.min_value, self.max_value)
+        self.quality = np.zeros(self.size, dtype=np.int8)
+
+    # ------------------------------------------------------------------
+    # Componentes comunes (equivalentes a los métodos de RioLeonSensor)
+    # ------------------------------------------------------------------
+
+    def seasonal(self, ctx):
+        """Factor estacional por sensor (1.0 si el sensor no tiene influencia estacional)"""
+        return np.where(self.seasonal_mask, ctx.seasonal, 1.0)
+
+    def precipitation(self, ctx):
+        """Factor de precipitación por sensor con variabilidad aleatoria"""
+        return ctx.precipitation_base * self.rng.uniform(0.5, 2.0, self.size)
+
+    def drift(self, ctx):
+        """Deriva por temperatura, humedad y envejecimiento"""
+        temperature_drift = math.sin(ctx.t / 86400) * 0.001
+        humidity_drift = self.rng.uniform(-0.0005, 0.0005, self.size)
+        return temperature_drift + humidity_drift + ctx.days_operating * 0.00001
+
+    def add_noise(self, values):
+        """Ruido gaussiano proporcional + ambiental + de instrumento"""
+        base_noise = self.rng.normal(0.0, 1.0, self.size) * (self.noise_factor * np.abs(values))
+        environmental_noise = self.rng.uniform(-0.005, 0.005, self.size)
+        instrument_noise = self.rng.uniform(-1.0, 1.0, self.size) * self.precision
+        return values + base_noise + environmental_noise + instrument_noise
+
+    def clip(self, values):
+        return np.minimum(self.max_value, np.maximum(self.min_value, values))
+
+    def update_quality(self):
+        """2% UNCERTAIN, luego 0.5% BAD, el resto GOOD"""
+        uncertain = self.rng.random(self.size) < 0.02
+        bad = self.rng.random(self.size) < 0.005
+        self.quality = np.where(uncertain, QUALITY_UNCERTAIN,
+                                np.where(bad, QUALITY_BAD, QUALITY_GOOD)).astype(np.int8)
+
+    def step(self, ctx):
+        raise NotImplementedError
+
+
+class FreaticGroup(VectorSensorGroup):
+    """Nivel freático (FreaticsLevelSensor)"""
+
+    sensor_type = 'freatic_level'
+    LAG_FACTOR = 0.95
+
+    def step(self, ctx):
+        seasonal = self.seasonal(ctx)
+        precipitation = self.precipitation(ctx)
+
+        river_base_level = 2.5 + math.sin(ctx.t / 43200) * 1.0
+        freatic_level = np.clip(
+            river_base_level * ctx.seasonal * ctx.daily * precipitation * 0.85 * 0.92,
+            0.2, RIO_LEON.critical_level_m
+        )
+
+        # Filtro de retraso de infiltración
+        values = self.values * self.LAG_FACTOR + freatic_level * (1 - self.LAG_FACTOR)
+        values *= seasonal * ctx.daily
+        values += math.sin(ctx.t / 3600) * 0.1
+        values += self.drift(ctx)
+
+        self.values = self.clip(self.add_noise(values))
+        self.update_quality()
+
+
+class RiverGroup(VectorSensorGroup):
+    """Nivel del río (RiverLevelSensor)"""
+
+    sensor_type = 'river_level'
+
+    def __init__(self, configs, rng):
+        super().__init__(configs, rng)
+        self.base_level = (self.min_value + self.max_value) / 2
+
+    def step(self, ctx):
+        seasonal = self.seasonal(ctx)
+        precipitation = self.precipitation(ctx)
+
+        hour_factor = math.sin((ctx.hour / 24) * 2 * math.pi) * 0.3
+        base_variation = math.sin(ctx.t / 7200) * 0.5
+        target = (self.base_level + hour_factor + base_variation) * seasonal * ctx.daily
+
+        target = np.where(precipitation > 1.5, target + (precipitation - 1.0) * 0.8, target)
+        tidal = math.sin(ctx.t / (12.5 * 3600)) * 0.05
+        target = np.where(self.tidal_mask, target + tidal, target)
+
+        values = self.values + (target - self.values) * 0.1
+        values += self.drift(ctx)
+
+        self.values = self.clip(self.add_noise(values))
+        self.update_quality()
+
+
+class FlowGroup(VectorSensorGroup):
+    """Velocidad de flujo (FlowVelocitySensor)"""
+
+    sensor_type = 'flow'
+
+    def step(self, ctx):
+        seasonal = self.seasonal(ctx)
+        precipitation = self.precipitation(ctx)
+
+        base_velocity = 1.2 * seasonal
+        base_velocity = np.where(precipitation > 1.3,
+                                 base_velocity + (precipitation - 1.0) * 0.6, base_velocity)
+        if ctx.hour >= 22 or ctx.hour <= 6:
+            base_velocity = base_velocity * 0.85
+        elif 10 <= ctx.hour <= 16:
+            base_velocity = base_velocity * 1.1
+        base_velocity = base_velocity + self.rng.uniform(-0.1, 0.1, self.size)
+
+        values = self.values + (base_velocity - self.values) * 0.15
+        values += self.drift(ctx)
+
+        self.values = self.clip(self.add_noise(values))
+        self.update_quality()
+
+
+class GateGroup(VectorSensorGroup):
+    """Posición de compuerta (GatePositionSensor)"""
+
+    sensor_type = 'gate'
+
+    def __init__(self, configs, rng):
+        super().__init__(configs, rng)
+        self.mode = np.full(self.size, MODE_AUTO, dtype=np.int8)
+        self.target = self.values.copy()
+        self.speed = rng.uniform(0.5, 2.0, self.size)
+
+    def step(self, ctx):
+        seasonal = self.seasonal(ctx)
+        precipitation = self.precipitation(ctx)
+
+        # Cambio ocasional de modo (5%)
+        change = self.rng.random(self.size) < 0.05
+        new_modes = self.rng.integers(0, 3, self.size, dtype=np.int8)
+        self.mode = np.where(change, new_modes, self.mode).astype(np.int8)
+
+        auto = self.mode == MODE_AUTO
+        emergency = self.mode == MODE_EMERGENCY
+        manual = self.mode == MODE_MANUAL
+
+        auto_target = np.select(
+            [precipitation > 1.8, precipitation > 1.3, seasonal < 0.7],
+            [np.minimum(95, self.values + 20), np.minimum(80, self.values + 10),
+             np.maximum(20, self.values - 5)],
+            default=45 + seasonal * 30
+        )
+        manual_nudge = np.where(self.rng.random(self.size) < 0.1,
+                                self.rng.uniform(-5, 5, self.size), 0.0)
+
+        self.target = np.where(auto, auto_target, self.target)
+        self.target = np.where(emergency, 100.0, self.target)
+        self.target = np.where(manual, self.target + manual_nudge, self.target)
+        self.speed = np.where(emergency, 3.0, self.speed)
+
+        # Movimiento gradual hacia el objetivo
+        difference = self.target - self.values
+        move = np.sign(difference) * np.minimum(np.abs(difference), self.speed)
+        values = np.where(np.abs(difference) > 0.5, self.values + move, self.values)
+
+        self.values = self.add_noise(np.clip(values, 0, 100))
+        self.update_quality()
+
+
+GROUP_CLASSES = {cls.sensor_type: cls for cls in (FreaticGroup, RiverGroup, FlowGroup, GateGroup)}
+
+
+class VectorRioLeonSimulator:
+    """Simulador de sensores del río León en estructura de arreglos"""
+
+    def __init__(self, configs, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.model = ChigodoHydrologicalModel()
+
+        by_type = {}
+        for config in configs:
+            if config.sensor_type not in GROUP_CLASSES:
+                raise ValueError(f"Tipo de sensor no soportado: {config.sensor_type}")
+            by_type.setdefault(config.sensor_type, []).append(config)
+
+        self.groups = {
+            sensor_type: GROUP_CLASSES[sensor_type](type_configs, self.rng)
+            for sensor_type, type_configs in by_type.items()
+        }
+        self.size = sum(group.size for group in self.groups.values())
+        self.steps = 0
+
+    @classmethod
+    def from_manager(cls, manager, seed=None):
+        """Crea el simulador con los sensores de un ChigorodSensorManager"""
+        return cls([sensor.config for sensor in manager.sensors.values()], seed=seed)
+
+    @classmethod
+    def from_fleet(cls, sensors, stations=20, seed=None):
+        """Crea una flota sintética repartida entre tipos y estaciones"""
+        return cls(generate_fleet_configs(sensors, stations), seed=seed)
+
+    def step(self, when=None):
+        """Avanza un paso todos los sensores (when: tiempo simulado)"""
+        ctx = StepContext(when or datetime.now(), self.model)
+        for group in self.groups.values():
+            group.step(ctx)
+        self.steps += 1
+        return ctx
+
+    def run(self, steps, start, interval_s):
+        """Ejecuta varios pasos a intervalos fijos de tiempo simulado"""
+        when = start
+        for _ in range(steps):
+            self.step(when)
+            when += timedelta(seconds=interval_s)
+        return when
+
+    def snapshot(self):
+        """Estado actual por tipo: ids, estación, valor y calidad (arreglos)"""
+        return {
+            sensor_type: {
+                'sensor_id': group.sensor_ids,
+                'station_id': group.station_ids,
+                'value': group.values.copy(),
+                'quality': group.quality.copy()
+            }
+            for sensor_type, group in self.groups.items()
+        }
+
+    def station_means(self, sensor_type):
+        """Promedio del valor por estación para un tipo de sensor"""
+        group = self.groups[sensor_type]
+        stations, inverse = np.unique(group.station_ids, return_inverse=True)
+        sums = np.bincount(inverse, weights=group.values)
+        counts = np.bincount(inverse)
+        return dict(zip(stations.tolist(), (sums / counts).tolist()))
+
+
+def generate_fleet_configs(sensors, stations=20):
+    """Genera configuraciones de sensores repartidas por tipo y estación"""
+    from sensores_rio_leon import SensorChigorodaConfig
+
+    templates = [
+        ('freatic_level', 0.5, 6.0, 0.002, 'metros'),
+        ('river_level', 0.2, 8.0, 0.001, 'metros'),
+        ('flow', 0.1, 4.5, 0.01, 'm/s'),
+        ('gate', 0.0, 100.0, 0.1, '%'),
+    ]
+    configs = []
+    for i in range(sensors):
+        sensor_type, min_value, max_value, precision, unit = templates[i % len(templates)]
+        station_id = i % stations + 1
+        configs.append(SensorChigorodaConfig(
+            sensor_id=10000 + i, sensor_type=sensor_type,
+            name=f'{sensor_type} {10000 + i}', location=f'Estación {station_id}',
+            station_id=station_id, coordinates={'lat': 7.6652, 'lon': -76.6841},
+            min_value=min_value, max_value=max_value, precision=precision, unit=unit,
+            tidal_influence=(sensor_type == 'river_level' and i % 3 == 0)
+        ))
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulación vectorizada de sensores del río León')
+    parser.add_argument('--sensors', type=int, default=250000, help='Número de sensores')
+    parser.add_argument('--stations', type=int, default=50, help='Número de estaciones')
+    parser.add_argument('--steps', type=int, default=4, help='Pasos a simular')
+    parser.add_argument('--interval', type=float, default=20.0, help='Segundos simulados por paso')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla aleatoria')
+    args = parser.parse_args()
+
+    simulator = VectorRioLeonSimulator.from_fleet(args.sensors, args.stations, seed=args.seed)
+    start = datetime(2024, 10, 1, 15, 0)
+
+    started = time.perf_counter()
+    simulator.run(args.steps, start, args.interval)
+    elapsed = time.perf_counter() - started
+
+    sensor_steps = args.sensors * args.steps
+    print(f"✅ {sensor_steps:,} pasos-sensor en {elapsed:.3f}s "
+          f"({sensor_steps / elapsed:,.0f} pasos-sensor/s)")
+    for sensor_type, group in simulator.groups.items():
+        print(f"   {sensor_type:14s} n={group.size:7d} media={group.values.mean():8.3f} "
+              f"min={group.values.min():8.3f} max={group.values.max():8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,13 +7,13 @@ Genera datos realistas de apertura de compuertas, niveles de agua y flujos
 import time
 import json
 import random
-import requests
 import threading
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from typing import Dict, List
 import math
 import logging
+from store_forward import StoreForwardClient
 
 # Configurar logging
 logging.basicConfig(
@@ -152,11 +152,13 @@ class WaterLevelSensor(VirtualSensor):
 class VirtualSensorManager:
     """Gestor de sensores virtuales"""
     
-    def __init__(self, api_url: str = "http://localhost:5000"):
+    def __init__(self, api_url: str = "http://localhost:5000", spool_dir: str = "spool/virtual_sensors"):
         self.api_url = api_url
         self.sensors: Dict[int, VirtualSensor] = {}
         self.running = False
         self.threads = []
+        # Las muestras pasan por un spool en disco: no se pierden si la API cae
+        self.client = StoreForwardClient(api_url, spool_dir)
         
     def add_sensor(self, config: SensorConfig):
         """Añade un sensor virtual"""
@@ -173,6 +175,7 @@ class VirtualSensorManager:
     def start_simulation(self):
         """Inicia la simulación de todos los sensores"""
         self.running = True
+        self.client.start()
         logger.info("Iniciando simulación de sensores virtuales...")
         
         for sensor_id, sensor in self.sensors.items():
@@ -187,6 +190,7 @@ class VirtualSensorManager:
     def stop_simulation(self):
         """Detiene la simulación"""
         self.running = False
+        self.client.stop()
         logger.info("Deteniendo simulación de sensores virtuales...")
         
     def _sensor_loop(self, sensor: VirtualSensor):
@@ -241,21 +245,9 @@ class VirtualSensorManager:
             }
             
     def _send_data(self, data: dict):
-        """Envía datos a la API"""
-        try:
-            response = requests.post(
-                f"{self.api_url}/api/data",
-                json=data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                logger.debug(f"Datos enviados exitosamente: {data['gate_id']}")
-            else:
-                logger.warning(f"Error al enviar datos: {response.status_code}")
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error de conexión: {e}")
+        """Encola datos para envío a la API (store-and-forward)"""
+        self.client.send('/api/data', data)
+        logger.debug(f"Datos encolados: {data['gate_id']}")
             
     def get_status(self) -> dict:
         """Obtiene el estado de todos los sensores"""
@@ -54,6 +54,53 @@ const unsigned long SEND_INTERVAL = 10000;  // Enviar datos cada 10 segundos
 int stationID = 1;
 int pumpID = 1;
 
+// Protocolo binario compacto (POST /api/data/bin, ver binary_protocol.py)
+// 1 = tramas empaquetadas de ~30 bytes; 0 = JSON (compatibilidad)
+#define USE_BINARY_PROTOCOL 0
+const uint16_t DEVICE_ID = 1;  // El servidor lo registra como ESP32_<DEVICE_ID>
+
+// Comandos del servidor (GET /api/control/commands/poll + POST .../ack)
+// wait=0 para no bloquear el loop (botones); una tarea FreeRTOS aparte podría usar wait=20
+unsigned long lastCommandPoll = 0;
+const unsigned long COMMAND_POLL_INTERVAL = 2000;
+
+// Estructuras empaquetadas little-endian (mismo orden que binary_protocol.SCHEMAS)
+struct __attribute__((packed)) FrameHeader {
+  char magic[2];        // 'E', 'B'
+  uint8_t version;      // 1
+  uint8_t schemaId;     // 1 = meteorología, 2 = bomba, 3 = compuerta
+  uint16_t count;       // registros en la trama
+  uint16_t deviceId;
+  uint32_t baseTs;      // epoch UTC; 0 = hora del servidor (sin NTP)
+};
+
+struct __attribute__((packed)) MeteoRecord {
+  uint16_t dt;                  // segundos desde baseTs
+  uint16_t estacionId;
+  int16_t temperaturaC_x100;
+  uint16_t humedad_x10;
+  uint16_t precipitacionMm_x10;
+  uint16_t vientoKmh_x10;
+  uint16_t direccionGrados;
+  uint16_t presionHpa_x10;
+  uint16_t radiacionWm2;
+};
+
+struct __attribute__((packed)) PumpRecord {
+  uint16_t dt;
+  uint16_t bombaId;
+  uint8_t estado;               // 0 = APAGADO, 1 = ENCENDIDO
+  uint8_t modo;                 // 0 = AUTO, 1 = MANUAL
+  uint16_t caudalM3h_x10;
+  uint16_t presionEntradaBar_x100;
+  uint16_t presionSalidaBar_x100;
+  uint16_t consumoKw_x10;
+  int16_t temperaturaMotorC_x10;
+  uint8_t vibracion;
+  uint8_t reservado;
+  uint32_t horasOperacion_x10;
+};
+
 // ===========================
 // FUNCIONES DE SENSORES
 // ===========================
@@ -236,6 +283,67 @@ void sendPumpTelemetry() {
   http.end();
 }
 
+// Envía una trama binaria (cabecera + un registro) a /api/data/bin
+bool postBinaryFrame(uint8_t schemaId, const void* record, size_t recordSize) {
+  uint8_t frame[sizeof(FrameHeader) + sizeof(PumpRecord)];
+  FrameHeader header = {{'E', 'B'}, 1, schemaId, 1, DEVICE_ID, 0};
+  memcpy(frame, &header, sizeof(header));
+  memcpy(frame + sizeof(header), record, recordSize);
+
+  HTTPClient http;
+  http.begin(String(serverURL) + "/data/bin");
+  http.addHeader("Content-Type", "application/x-estacion-bin");
+  int httpCode = http.POST(frame, sizeof(header) + recordSize);
+  http.end();
+
+  if (httpCode != 200) {
+    Serial.printf("❌ Error enviando trama binaria %d (HTTP %d)\n", schemaId, httpCode);
+    return false;
+  }
+  return true;
+}
+
+void sendBinaryTelemetry() {
+  if (WiFi.status() != WL_CONNECTED) {
+    Serial.println("⚠️  WiFi desconectado");
+    return;
+  }
+
+  MeteoRecord meteo = {
+    0,
+    (uint16_t)stationID,
+    (int16_t)(readTemperature() * 100),
+    (uint16_t)(readHumidity() * 10),
+    (uint16_t)(simulateRainfall() * 10),
+    (uint16_t)(simulateWindSpeed() * 10),
+    (uint16_t)random(0, 360),
+    (uint16_t)(random(1000, 1020) * 10),
+    (uint16_t)random(200, 1000)
+  };
+
+  PumpRecord pump = {
+    0,
+    (uint16_t)pumpID,
+    (uint8_t)(pumpRunning ? 1 : 0),
+    (uint8_t)(autoMode ? 0 : 1),
+    (uint16_t)(readFlowRate() * 10),
+    (uint16_t)(readPressure(JOYSTICK_VERT) * 100),
+    (uint16_t)(readPressure(JOYSTICK_HORZ) * 100),
+    (uint16_t)(pumpRunning ? random(80, 120) : 0),
+    (int16_t)((pumpRunning ? random(55, 85) : random(25, 35)) * 10),
+    (uint8_t)(pumpRunning ? random(1, 8) : 0),
+    0,
+    (uint32_t)random(1000, 5000) * 10
+  };
+
+  bool ok = postBinaryFrame(1, &meteo, sizeof(meteo));
+  ok = postBinaryFrame(2, &pump, sizeof(pump)) && ok;
+  if (ok) {
+    Serial.printf("✅ Telemetría binaria enviada (%d + %d bytes)\n",
+                  (int)(sizeof(FrameHeader) + sizeof(meteo)), (int)(sizeof(FrameHeader) + sizeof(pump)));
+  }
+}
+
 void updatePumpStatus(bool shouldRun) {
   if (pumpRunning != shouldRun) {
     pumpRunning = shouldRun;
@@ -266,6 +374,49 @@ void updatePumpStatus(bool shouldRun) {
   }
 }
 
+// ===========================
+// COMANDOS DEL SERVIDOR
+// ===========================
+
+void acknowledgeCommand(long commandId, bool success) {
+  HTTPClient http;
+  http.begin(String(serverURL) + "/control/commands/" + String(commandId) + "/ack");
+  http.addHeader("Content-Type", "application/json");
+  http.POST(success ? "{\"success\":true}" : "{\"success\":false,\"error\":\"Comando desconocido\"}");
+  http.end();
+}
+
+void pollServerCommands() {
+  if (WiFi.status() != WL_CONNECTED) return;
+
+  HTTPClient http;
+  http.begin(String(serverURL) + "/control/commands/poll?bomba_id=" + String(pumpID) + "&wait=0");
+  int httpCode = http.GET();
+  if (httpCode != 200) {
+    http.end();
+    return;
+  }
+
+  StaticJsonDocument<1024> doc;
+  DeserializationError err = deserializeJson(doc, http.getString());
+  http.end();
+  if (err) return;
+
+  for (JsonObject command : doc["commands"].as<JsonArray>()) {
+    long commandId = command["id"];
+    const char* action = command["comando"];
+    bool known = strcmp(action, "INICIAR") == 0 || strcmp(action, "DETENER") == 0;
+
+    if (known) {
+      Serial.printf("📥 Comando %ld del servidor: %s\n", commandId, action);
+      autoMode = false;
+      updatePumpStatus(strcmp(action, "INICIAR") == 0);
+    }
+    // El ACK cierra el lazo: el servidor mide la latencia decisión→actuación
+    acknowledgeCommand(commandId, known);
+  }
+}
+
 // ===========================
 // CONTROL AUTOMÁTICO
 // ===========================
@@ -397,6 +548,12 @@ void loop() {
     delay(500);  // Debounce
   }
   
+  // Comandos pendientes del servidor (control automático central o manual)
+  if (currentTime - lastCommandPoll >= COMMAND_POLL_INTERVAL) {
+    pollServerCommands();
+    lastCommandPoll = currentTime;
+  }
+  
   // Ejecutar control automático
   checkAutomaticControl();
   
@@ -412,8 +569,12 @@ void loop() {
     Serial.printf("   ⚙️  Bomba: %s\n", pumpRunning ? "ON" : "OFF");
     Serial.printf("   🔄 Caudal: %.1f m³/h\n", readFlowRate());
     
+#if USE_BINARY_PROTOCOL
+    sendBinaryTelemetry();
+#else
     sendMeteorologicalData();
     sendPumpTelemetry();
+#endif
     
     lastSendTime = currentTime;
     Serial.println("");